@@ -0,0 +1,82 @@
+import asyncio
+import statistics
+import tracemalloc
+from time import perf_counter
+from typing import Callable, Dict
+
+
+def measure(fn: Callable, number: int, repeat: int = 5, setup: Callable = None) -> Dict[str, float]:
+    if setup is not None:
+        setup()
+    fn()
+
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((perf_counter() - start) / number)
+
+    return _summary(timings, number)
+
+
+def measure_async(fn: Callable, number: int, repeat: int = 5, concurrency: int = 1) -> Dict[str, float]:
+    async def run():
+        await fn()
+
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            for _ in range(number // concurrency):
+                await asyncio.gather(*(fn() for _ in range(concurrency)))
+            timings.append((perf_counter() - start) / number)
+        return timings
+
+    return _summary(asyncio.run(run()), number)
+
+
+def measure_allocations(fn: Callable, number: int = 5) -> Dict[str, float]:
+    fn()
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(number):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'peak_kib': statistics.median(peaks) / 1024,
+        'number': number,
+    }
+
+
+def _summary(timings, number) -> Dict[str, float]:
+    median = statistics.median(timings)
+    return {
+        'median_us': median * 1e6,
+        'min_us': min(timings) * 1e6,
+        'max_us': max(timings) * 1e6,
+        'ops_per_sec': 1 / median if median else 0.0,
+        'number': number,
+        'repeat': len(timings),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> Dict[str, dict]:
+    regressions = {}
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference or 'median_us' not in result:
+            continue
+        ratio = result['median_us'] / reference['median_us']
+        result['baseline_ratio'] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions[name] = {'baseline_us': reference['median_us'], 'current_us': result['median_us'],
+                                 'ratio': round(ratio, 3)}
+    return regressions
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+
+from benchmarks import harness
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def _configure_environment(database: str):
+    os.environ['DATABASE_URL'] = 'sqlite:///{}'.format(database)
+    os.environ.setdefault('API_URL', 'http://localhost:8000')
+    os.environ['JOB_WORKER_ENABLED'] = 'false'
+    os.environ['DATABASE_ECHO'] = 'false'
+    os.environ['SLOW_QUERY_MS'] = '60000'
+
+
+def _prepare_database(args, database: str):
+    from sqlalchemy import create_engine
+    import seed_database
+
+    if args.reseed and os.path.exists(database):
+        os.unlink(database)
+    if not os.path.exists(database):
+        engine = create_engine('sqlite:///{}'.format(database))
+        seed_database.seed(engine, seed_database.SeedConfig(users=args.users, receitas=args.receitas, seed=args.seed))
+        engine.dispose()
+
+
+def run_benchmarks(args) -> dict:
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session, selectinload, joinedload
+
+    import models
+    import orm
+    from orm.db import EngineSingleton
+    from repositories import receita_repository, user_repository
+    from services import receita_service, user_service
+
+    engine = EngineSingleton.get_engine()
+    results = {}
+
+    def listar():
+        with Session(engine) as session:
+            receita_repository.listar_receitas(session)
+
+    def listar_orm():
+        with Session(engine) as session:
+            stmt = select(orm.Receita).options(
+                selectinload(orm.Receita.ingredientes), joinedload(orm.Receita.criador)
+            ).order_by(orm.Receita.id.desc())
+            [receita.to_dto() for receita in session.execute(stmt).scalars()]
+
+    def listar_json():
+        with Session(engine) as session:
+            receita_repository.listar_receitas_json(session)
+
+    def listar_documentos():
+        with Session(engine) as session:
+            receita_repository.listar_documentos(session)
+
+    def listar_resumo():
+        with Session(engine) as session:
+            receita_repository.listar_receitas(session, models.RESUMO_RECEITA)
+
+    def listar_resumo_json():
+        with Session(engine) as session:
+            receita_repository.listar_receitas_json(session, models.RESUMO_RECEITA)
+
+    def serializar(formato):
+        def run():
+            with Session(engine) as session:
+                receita_service._serializar_lista(session, None, formato)
+        return run
+
+    def buscar():
+        with Session(engine) as session:
+            receita_repository.buscar_receita_por_id(session, 1)
+
+    results['listar_receitas'] = harness.measure(listar, number=args.scale(3))
+    results['listar_receitas_orm'] = harness.measure(listar_orm, number=args.scale(3))
+    results['listar_receitas_json'] = harness.measure(listar_json, number=args.scale(3))
+    results['listar_receitas_documentos'] = harness.measure(listar_documentos, number=args.scale(3))
+    results['listar_receitas_resumo'] = harness.measure(listar_resumo, number=args.scale(3))
+    results['listar_receitas_resumo_json'] = harness.measure(listar_resumo_json, number=args.scale(3))
+    for formato in receita_service.FORMATOS_LISTA:
+        nome = 'serializar_lista_{}'.format(formato.replace('-', '_'))
+        results[nome] = harness.measure(serializar(formato), number=args.scale(3))
+    results.update(_payload_sizes(engine))
+    results.update(_encoding_benchmarks(engine, args))
+    results['listar_receitas_alloc'] = harness.measure_allocations(listar, number=3)
+    results['listar_receitas_json_alloc'] = harness.measure_allocations(listar_json, number=3)
+    results['listar_receitas_orm_alloc'] = harness.measure_allocations(listar_orm, number=3)
+    results['buscar_receita_por_id'] = harness.measure(buscar, number=args.scale(200))
+
+    session = Session(engine)
+    receita = session.query(orm.Receita).options(
+        selectinload(orm.Receita.ingredientes), selectinload(orm.Receita.criador)
+    ).filter(orm.Receita.id == 1).one()
+    results['receita_to_dto'] = harness.measure(receita.to_dto, number=args.scale(5000))
+
+    user = user_repository.get_user_by_id(session, 1)
+    session.close()
+    results['hash_password'] = harness.measure(lambda: user_service._hash_password('senha-secreta'),
+                                               number=args.scale(5), repeat=3)
+    results['generate_token'] = harness.measure(lambda: user_service._generate_token(user), number=args.scale(2000))
+    token = user_service._generate_token(user)
+
+    def validate():
+        with Session(engine) as session:
+            user_service._validate_token(token, session)
+
+    results['validate_token'] = harness.measure(validate, number=args.scale(500))
+
+    nova_receita = models.CriarReceita(
+        nome='Receita de benchmark',
+        tipo='Doce',
+        ingredientes=[models.Ingrediente(nome='Farinha', quantidade='1 xícara') for _ in range(8)],
+        modo_de_preparo='# Modo de preparo\n\nMisture tudo.',
+        imagem='https://cdn.panela.test/imagem.jpg',
+    ).assign_criador_id(1)
+
+    def criar():
+        with Session(engine) as session:
+            receita_repository.criar_receita(session, nova_receita)
+
+    results.update(_http_benchmarks(args))
+    results['criar_receita'] = harness.measure(criar, number=args.scale(100))
+    return results
+
+
+def _payload_sizes(engine) -> dict:
+    import gzip
+
+    from sqlalchemy.orm import Session
+
+    import models
+    from services import receita_service
+
+    variantes = {
+        'completo': (None, 'full'),
+        'resumo': (models.RESUMO_RECEITA, 'full'),
+        'compacto': (None, 'compact'),
+        'compacto_internado': (None, 'compact-interned'),
+    }
+    results = {}
+    with Session(engine) as session:
+        for nome, (campos, formato) in variantes.items():
+            corpo = receita_service._serializar_lista(session, campos, formato)
+            results['payload_' + nome] = {'bytes': len(corpo), 'gzip_bytes': len(gzip.compress(corpo, 6))}
+    return results
+
+
+def _encoding_benchmarks(engine, args) -> dict:
+    import gzip
+    import json
+
+    from sqlalchemy.orm import Session
+
+    from middlewares.content_negotiation import CODECS, _to_json
+    from services import receita_service
+
+    with Session(engine) as session:
+        corpo = receita_service._serializar_lista(session, None)
+    documento = json.loads(corpo)
+
+    results = {'encode_json': harness.measure(lambda: _to_json(documento), number=args.scale(3))}
+    for nome, media_type in (('msgpack', 'application/msgpack'), ('cbor', 'application/cbor')):
+        codec = CODECS.get(media_type)
+        if codec is None:
+            continue
+        codificado = codec.encode(documento)
+        results['encode_' + nome] = harness.measure(lambda: codec.encode(documento), number=args.scale(3))
+        # Custo real na API: o corpo sai do cache de páginas em JSON e é transcodificado
+        results['transcode_' + nome] = harness.measure(lambda: codec.encode(json.loads(corpo)), number=args.scale(3))
+        results['decode_' + nome] = harness.measure(lambda: codec.decode(codificado), number=args.scale(3))
+        results['payload_' + nome] = {'bytes': len(codificado), 'gzip_bytes': len(gzip.compress(codificado, 6))}
+    results['decode_json'] = harness.measure(lambda: json.loads(corpo), number=args.scale(3))
+    return results
+
+
+def _http_benchmarks(args) -> dict:
+    import httpx
+
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+
+    async def get(url):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            response = await client.get(url)
+            assert response.status_code == 200, response.status_code
+
+    results['http_get_receitas'] = harness.measure_async(lambda: get('/receitas'), number=args.scale(3))
+    results['http_get_receita'] = harness.measure_async(lambda: get('/receitas/1'), number=args.scale(200))
+    results['http_get_receita_concurrent'] = harness.measure_async(
+        lambda: get('/receitas/1'), number=args.scale(200), concurrency=10
+    )
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks dos caminhos críticos de receitas')
+    parser.add_argument('--database', help='Arquivo SQLite (criado e populado se não existir)')
+    parser.add_argument('--reseed', action='store_true', help='Recria o banco de benchmark')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--receitas', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--quick', action='store_true', help='Reduz o número de iterações')
+    parser.add_argument('--output', help='Grava os resultados em JSON neste arquivo')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='Regressão tolerada (0.25 = 25%%)')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+    args.scale = (lambda n: max(1, n // 10)) if args.quick else (lambda n: n)
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='panela-bench-'), 'bench.sqlite')
+    _configure_environment(database)
+    _prepare_database(args, database)
+
+    results = run_benchmarks(args)
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'dataset': {'users': args.users, 'receitas': args.receitas, 'seed': args.seed},
+        'results': results,
+    }
+
+    regressions = {}
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = harness.compare(results, json.load(f)['results'], args.threshold)
+    report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+    for name, regression in regressions.items():
+        print('REGRESSION {}: {:.1f}us -> {:.1f}us ({}x)'.format(
+            name, regression['baseline_us'], regression['current_us'], regression['ratio']), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from benchmarks import harness
+
+
+class TestHarness(TestCase):
+    def test_measure(self):
+        calls = []
+
+        result = harness.measure(lambda: calls.append(1), number=10, repeat=3)
+
+        self.assertEqual(len(calls), 31)
+        self.assertEqual(result['number'], 10)
+        self.assertEqual(result['repeat'], 3)
+        self.assertLessEqual(result['min_us'], result['median_us'])
+        self.assertLessEqual(result['median_us'], result['max_us'])
+
+    def test_measure_async(self):
+        calls = []
+
+        async def fn():
+            calls.append(1)
+
+        harness.measure_async(fn, number=10, repeat=2, concurrency=5)
+
+        self.assertEqual(len(calls), 21)
+
+    def test_measure_allocations(self):
+        small = harness.measure_allocations(lambda: [0] * 10, number=3)
+        large = harness.measure_allocations(lambda: [0] * 100000, number=3)
+
+        self.assertEqual(large['number'], 3)
+        self.assertGreater(large['peak_kib'], small['peak_kib'])
+        self.assertGreater(large['peak_kib'], 700)
+
+    def test_compare(self):
+        results = {'a': {'median_us': 130.0}, 'b': {'median_us': 100.0}, 'c': {'median_us': 1.0}}
+        baseline = {'a': {'median_us': 100.0}, 'b': {'median_us': 100.0}}
+
+        regressions = harness.compare(results, baseline, threshold=0.25)
+
+        self.assertEqual(regressions, {'a': {'baseline_us': 100.0, 'current_us': 130.0, 'ratio': 1.3}})
+        self.assertEqual(results['b']['baseline_ratio'], 1.0)
+        self.assertNotIn('baseline_ratio', results['c'])
@@ -0,0 +1,28 @@
+from functools import lru_cache
+
+from .base import *
+from .memory import *
+from .pages import *
+from .resp import RespBackend
+from .shared import SharedMemoryBackend
+from .singleflight import SingleFlight
+
+
+def get_backend(config) -> CacheBackend:
+    if config.cache_backend == 'memory':
+        return MemoryBackend(config.cache_max_entries)
+    if config.cache_backend == 'shared':
+        return SharedMemoryBackend(config.cache_shm_path, config.cache_shm_slots, config.cache_shm_slot_bytes)
+    if config.cache_backend == 'redis':
+        return RespBackend(config.cache_url, timeout=config.cache_timeout, pool_size=config.cache_pool_size)
+    if config.cache_backend == 'none':
+        return NullBackend()
+    raise ValueError('Backend de cache desconhecido: {}'.format(config.cache_backend))
+
+
+@lru_cache
+def get_cache() -> Cache:
+    from settings import settings
+
+    config = settings()
+    return Cache(get_backend(config), prefix=config.cache_prefix, default_ttl=config.cache_ttl_seconds or None)
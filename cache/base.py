@@ -0,0 +1,123 @@
+import json
+import logging
+import struct
+from typing import Any, Optional, Protocol, Type
+
+from pydantic import BaseModel
+
+from observability.metrics import Counter
+
+from .pages import Page
+
+logger = logging.getLogger('panela_magica.cache')
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Leituras do cache', ('backend', 'result'))
+CACHE_WRITES = Counter('cache_writes_total', 'Escritas no cache', ('backend', 'result'))
+
+# Nada de pickle: um valor forjado no Redis não pode virar execução de código no servidor
+_RAW = b'b'
+_JSON = b'j'
+_PAGE = b'g'
+_PAGE_HEADER = struct.Struct('>?I')
+
+
+class CacheError(Exception):
+    pass
+
+
+class CacheBackend(Protocol):
+    NAME: str
+    SHARED: bool
+
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    def set(self, key: str, data: bytes, ttl: Optional[float] = None) -> bool:
+        ...
+
+    def delete(self, key: str):
+        ...
+
+
+def dumps(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return _RAW + value
+    if isinstance(value, Page):
+        return _PAGE + _PAGE_HEADER.pack(value.gzip is not None, len(value.body)) + value.body + (value.gzip or b'')
+    if isinstance(value, BaseModel):
+        return _JSON + value.model_dump_json().encode('utf-8')
+    return _JSON + json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def _loads_page(data: bytes) -> Page:
+    has_gzip, length = _PAGE_HEADER.unpack_from(data)
+    body = data[_PAGE_HEADER.size:_PAGE_HEADER.size + length]
+    if len(body) != length:
+        raise CacheError('Página truncada')
+    rest = data[_PAGE_HEADER.size + length:]
+    if not has_gzip and rest:
+        raise CacheError('Página com bytes sobrando')
+    return Page(body, rest if has_gzip else None)
+
+
+def loads(data: bytes) -> Any:
+    # Qualquer valor que não decodifica vira CacheError, e o Cache trata como miss
+    tag, payload = data[:1], data[1:]
+    try:
+        if tag == _RAW:
+            return payload
+        if tag == _PAGE:
+            return _loads_page(payload)
+        if tag == _JSON:
+            return json.loads(payload)
+    except CacheError:
+        raise
+    except Exception as e:
+        raise CacheError('Valor corrompido no cache: {}'.format(e)) from e
+    raise CacheError('Formato de valor desconhecido: {!r}'.format(tag))
+
+
+class Cache:
+    def __init__(self, backend: CacheBackend, prefix: str = '', default_ttl: Optional[float] = None):
+        self.backend = backend
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.SHARED
+
+    def get(self, key: str, default: Any = None, model: Optional[Type[BaseModel]] = None) -> Any:
+        try:
+            data = self.backend.get(self.prefix + key)
+            value = loads(data) if data is not None else None
+            if model is not None and data is not None:
+                value = model.model_validate(value)
+        except (CacheError, OSError, ValueError) as e:
+            logger.warning('Falha ao ler %s do cache %s: %s', key, self.backend.NAME, e)
+            CACHE_REQUESTS.inc(backend=self.backend.NAME, result='error')
+            return default
+
+        if data is None:
+            CACHE_REQUESTS.inc(backend=self.backend.NAME, result='miss')
+            return default
+        CACHE_REQUESTS.inc(backend=self.backend.NAME, result='hit')
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        try:
+            stored = self.backend.set(self.prefix + key, dumps(value), ttl if ttl is not None else self.default_ttl)
+        except (CacheError, OSError) as e:
+            logger.warning('Falha ao gravar %s no cache %s: %s', key, self.backend.NAME, e)
+            CACHE_WRITES.inc(backend=self.backend.NAME, result='error')
+            return False
+
+        CACHE_WRITES.inc(backend=self.backend.NAME, result='ok' if stored else 'skipped')
+        return stored
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(self.prefix + key)
+        except (CacheError, OSError) as e:
+            logger.warning('Falha ao remover %s do cache %s: %s', key, self.backend.NAME, e)
+            CACHE_WRITES.inc(backend=self.backend.NAME, result='error')
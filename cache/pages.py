@@ -0,0 +1,46 @@
+import threading
+from typing import NamedTuple, Optional, Hashable
+
+
+class Page(NamedTuple):
+    body: bytes
+    gzip: Optional[bytes] = None
+
+
+class PageCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._version = None
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def __len__(self):
+        return len(self._pages)
+
+    def get(self, version: int, key: Hashable) -> Optional[Page]:
+        if version != self._version:
+            return None
+        return self._pages.get(key)
+
+    def put(self, version: int, key: Hashable, page: Page):
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            if version != self._version:
+                if self._version is not None and version < self._version:
+                    return
+                self._pages = {}
+                self._version = version
+            if key not in self._pages and len(self._pages) >= self.max_entries:
+                del self._pages[next(iter(self._pages))]
+            self._pages[key] = page
+
+    def clear(self):
+        with self._lock:
+            self._pages = {}
+            self._version = None
@@ -0,0 +1,140 @@
+import queue
+import socket
+from typing import Optional
+from urllib.parse import urlparse
+
+from cache.base import CacheError
+
+
+class RespError(CacheError):
+    pass
+
+
+def encode_command(*args) -> bytes:
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode('utf-8')
+        elif isinstance(arg, int):
+            arg = str(arg).encode('ascii')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def _parse_int(rest: bytes) -> int:
+    try:
+        return int(rest)
+    except ValueError:
+        raise CacheError('Inteiro RESP inválido: {!r}'.format(rest)) from None
+
+
+def read_reply(reader):
+    line = reader.readline()
+    if not line.endswith(b'\r\n'):
+        raise CacheError('Conexão encerrada pelo servidor')
+
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode('utf-8', 'replace')
+    if kind == b'-':
+        raise RespError(rest.decode('utf-8', 'replace'))
+    if kind == b':':
+        return _parse_int(rest)
+    if kind == b'$':
+        length = _parse_int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise CacheError('Resposta incompleta')
+        return data[:-2]
+    if kind == b'*':
+        count = _parse_int(rest)
+        return None if count < 0 else [read_reply(reader) for _ in range(count)]
+    raise CacheError('Resposta RESP inválida: {!r}'.format(line))
+
+
+class RespConnection:
+    def __init__(self, host: str, port: int, timeout: float):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile('rb')
+
+    def command(self, *args):
+        self._socket.sendall(encode_command(*args))
+        return read_reply(self._reader)
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+
+class RespBackend:
+    NAME = 'redis'
+    SHARED = True
+
+    def __init__(self, url: str, timeout: float = 0.05, pool_size: int = 8):
+        parsed = urlparse(url)
+        if parsed.scheme != 'redis':
+            raise ValueError('URL de cache inválida: {}'.format(url))
+
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self) -> RespConnection:
+        connection = RespConnection(self.host, self.port, self.timeout)
+        try:
+            if self.password:
+                connection.command('AUTH', self.password)
+            if self.db:
+                connection.command('SELECT', self.db)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _command(self, *args):
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+
+        try:
+            reply = connection.command(*args)
+        except RespError:
+            self._release(connection)
+            raise
+        except (CacheError, OSError):
+            connection.close()
+            raise
+
+        self._release(connection)
+        return reply
+
+    def _release(self, connection: RespConnection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._command('GET', key)
+
+    def set(self, key: str, data: bytes, ttl: Optional[float] = None) -> bool:
+        if ttl:
+            return self._command('SET', key, data, 'PX', max(1, int(ttl * 1000))) == 'OK'
+        return self._command('SET', key, data) == 'OK'
+
+    def delete(self, key: str):
+        self._command('DEL', key)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,95 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+_HEADER = struct.Struct('<IQdIH')
+_HEADER_SIZE = 32
+_SEQ = struct.Struct('<I')
+
+
+def _key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+
+
+# Tabela hash de slots fixos num arquivo mapeado em memória, compartilhada pelos workers do host. Cada slot
+# guarda uma entrada (colisões sobrescrevem). Escritores travam o slot com fcntl e deixam a sequência ímpar
+# durante a escrita; leitores descartam cópias feitas enquanto a sequência mudava.
+class SharedMemoryBackend:
+    NAME = 'shared'
+    SHARED = True
+
+    def __init__(self, path: str, slots: int = 128, slot_bytes: int = 1024 * 1024):
+        if slots <= 0 or slot_bytes <= _HEADER_SIZE:
+            raise ValueError('Configuração inválida para o cache compartilhado')
+
+        self.path = path
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        size = slots * slot_bytes
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def _slot(self, key_hash: int) -> int:
+        return (key_hash % self.slots) * self.slot_bytes
+
+    def get(self, key: str) -> Optional[bytes]:
+        encoded = key.encode('utf-8')
+        key_hash = _key_hash(encoded)
+        offset = self._slot(key_hash)
+
+        seq, stored_hash, expires_at, length, key_length = _HEADER.unpack_from(self._map, offset)
+        if seq & 1 or stored_hash != key_hash or key_length != len(encoded):
+            return None
+
+        start = offset + _HEADER_SIZE
+        payload = self._map[start:start + key_length + length]
+        if _SEQ.unpack_from(self._map, offset)[0] != seq:
+            return None
+        if payload[:key_length] != encoded:
+            return None
+        if expires_at and expires_at <= time.time():
+            return None
+        return payload[key_length:]
+
+    def _write(self, offset: int, key_hash: int, expires_at: float, key: bytes, data: bytes):
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.slot_bytes, offset)
+            try:
+                seq = _SEQ.unpack_from(self._map, offset)[0]
+                _SEQ.pack_into(self._map, offset, (seq + 1) & 0xFFFFFFFF | 1)
+                start = offset + _HEADER_SIZE
+                self._map[start:start + len(key) + len(data)] = key + data
+                _HEADER.pack_into(self._map, offset, (seq + 1) & 0xFFFFFFFF | 1, key_hash, expires_at, len(data),
+                                  len(key))
+                _SEQ.pack_into(self._map, offset, (seq + 2) & 0xFFFFFFFE)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.slot_bytes, offset)
+
+    def set(self, key: str, data: bytes, ttl: Optional[float] = None) -> bool:
+        encoded = key.encode('utf-8')
+        if _HEADER_SIZE + len(encoded) + len(data) > self.slot_bytes or len(encoded) > 0xFFFF:
+            return False
+
+        key_hash = _key_hash(encoded)
+        self._write(self._slot(key_hash), key_hash, time.time() + ttl if ttl else 0.0, encoded, data)
+        return True
+
+    def delete(self, key: str):
+        encoded = key.encode('utf-8')
+        key_hash = _key_hash(encoded)
+        offset = self._slot(key_hash)
+        if _HEADER.unpack_from(self._map, offset)[1] == key_hash:
+            self._write(offset, 0, 0.0, b'', b'')
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+
+from observability.metrics import Counter
+
+COALESCED = Counter('singleflight_coalesced_total', 'Requisições que aguardaram uma carga já em andamento', ('name',))
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable, *args) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            # A carga não pertence a quem chegou primeiro: se ele for cancelado, os demais continuam esperando.
+            # Por isso fn não deve usar recursos da requisição (como a sessão), que são liberados ao cancelar
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            COALESCED.inc(name=self.name)
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
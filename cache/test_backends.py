@@ -0,0 +1,218 @@
+import io
+import multiprocessing
+import pickle
+import os
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import Mock
+
+from pydantic import BaseModel
+
+from cache import Cache, MemoryBackend, NullBackend, RespBackend, SharedMemoryBackend, Page, get_backend
+from cache.base import CACHE_REQUESTS, CacheError, dumps, loads
+from cache.resp import read_reply
+from cache.shared import _key_hash
+from cache.testing import RespServer
+
+
+class BackendContract:
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend = self.make_backend()
+        self.cache = Cache(self.backend, prefix='teste:')
+
+    def test_get_set_delete(self):
+        self.assertIsNone(self.cache.get('chave'))
+
+        self.assertTrue(self.cache.set('chave', b'valor'))
+        self.assertEqual(self.cache.get('chave'), b'valor')
+
+        self.cache.delete('chave')
+        self.assertIsNone(self.cache.get('chave'))
+
+    def test_serializa_objetos(self):
+        page = Page(b'[]', b'gz')
+        self.cache.set('pagina', page)
+        self.cache.set('dict', {'id': 1, 'nome': 'Bolo'})
+
+        self.assertEqual(self.cache.get('pagina'), page)
+        self.assertEqual(self.cache.get('dict'), {'id': 1, 'nome': 'Bolo'})
+
+    def test_ttl(self):
+        self.cache.set('curta', b'1', ttl=0.05)
+        self.cache.set('longa', b'2', ttl=60)
+
+        time.sleep(0.1)
+
+        self.assertIsNone(self.cache.get('curta'))
+        self.assertEqual(self.cache.get('longa'), b'2')
+
+    def test_default_ttl(self):
+        cache = Cache(self.backend, prefix='ttl:', default_ttl=0.05)
+        cache.set('chave', b'1')
+
+        time.sleep(0.1)
+
+        self.assertIsNone(cache.get('chave'))
+
+    def test_metricas(self):
+        name = self.backend.NAME
+        hits = CACHE_REQUESTS.values().get((name, 'hit'), 0)
+        misses = CACHE_REQUESTS.values().get((name, 'miss'), 0)
+
+        self.cache.set('chave', b'1')
+        self.cache.get('chave')
+        self.cache.get('outra')
+
+        self.assertEqual(CACHE_REQUESTS.values()[(name, 'hit')], hits + 1)
+        self.assertEqual(CACHE_REQUESTS.values()[(name, 'miss')], misses + 1)
+
+
+class TestMemoryBackend(BackendContract, TestCase):
+    def make_backend(self):
+        return MemoryBackend(max_entries=16)
+
+    def test_lru(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set('a', b'1')
+        backend.set('b', b'2')
+        backend.get('a')
+        backend.set('c', b'3')
+
+        self.assertEqual(backend.get('a'), b'1')
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(len(backend), 2)
+
+
+def _escrever_em_outro_processo(path, slots, slot_bytes):
+    backend = SharedMemoryBackend(path, slots, slot_bytes)
+    Cache(backend, prefix='teste:').set('outro-processo', b'ola')
+    backend.close()
+
+
+class TestSharedMemoryBackend(BackendContract, TestCase):
+    def make_backend(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'cache.mmap')
+        backend = SharedMemoryBackend(self.path, slots=64, slot_bytes=4096)
+        self.addCleanup(backend.close)
+        return backend
+
+    def test_compartilhado_entre_instancias(self):
+        outro = SharedMemoryBackend(self.path, slots=64, slot_bytes=4096)
+        self.addCleanup(outro.close)
+
+        self.cache.set('chave', b'valor')
+
+        self.assertEqual(Cache(outro, prefix='teste:').get('chave'), b'valor')
+
+    def test_compartilhado_entre_processos(self):
+        processo = multiprocessing.get_context('fork').Process(
+            target=_escrever_em_outro_processo, args=(self.path, 64, 4096))
+        processo.start()
+        processo.join(10)
+
+        self.assertEqual(processo.exitcode, 0)
+        self.assertEqual(self.cache.get('outro-processo'), b'ola')
+
+    def test_valor_maior_que_o_slot_nao_e_gravado(self):
+        self.assertFalse(self.cache.set('grande', b'x' * 5000))
+        self.assertIsNone(self.cache.get('grande'))
+
+    def test_colisao_nao_devolve_valor_de_outra_chave(self):
+        backend = SharedMemoryBackend(os.path.join(self.tmp.name, 'um-slot.mmap'), slots=1, slot_bytes=1024)
+        self.addCleanup(backend.close)
+
+        backend.set('a', b'1')
+        backend.set('b', b'2')
+
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual(backend.get('b'), b'2')
+
+    def test_leitura_durante_escrita_e_miss(self):
+        self.cache.set('chave', b'valor')
+        offset = self.backend._slot(_key_hash(b'teste:chave'))
+        self.backend._map[offset] |= 1
+
+        self.assertIsNone(self.cache.get('chave'))
+
+
+class TestRespBackend(BackendContract, TestCase):
+    def make_backend(self):
+        self.server = RespServer(password='segredo').__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        backend = RespBackend(self.server.url, timeout=1)
+        self.addCleanup(backend.close)
+        return backend
+
+    def test_autentica_e_reutiliza_conexoes(self):
+        for i in range(5):
+            self.cache.set('chave', b'valor')
+            self.cache.get('chave')
+
+        self.assertEqual(self.server.commands.count('AUTH'), 1)
+
+    def test_servidor_indisponivel_vira_miss(self):
+        self.server.__exit__(None, None, None)
+        backend = RespBackend('redis://127.0.0.1:{}/0'.format(self.server.server_address[1]), timeout=0.2)
+        cache = Cache(backend)
+
+        self.assertIsNone(cache.get('chave'))
+        self.assertEqual(cache.get('chave', default=b'padrao'), b'padrao')
+        self.assertFalse(cache.set('chave', b'valor'))
+        self.assertGreater(CACHE_REQUESTS.values()[('redis', 'error')], 0)
+
+
+class Usuario(BaseModel):
+    id: int
+    nome: str
+
+
+class TestSerializacao(TestCase):
+    def setUp(self):
+        self.backend = MemoryBackend()
+        self.cache = Cache(self.backend)
+
+    def test_ida_e_volta(self):
+        for valor in (b'', b'bytes', Page(b'[]'), Page(b'[]', b''), Page(b'[1]', b'gz'), 'abc', {'a': [1, None]}):
+            self.assertEqual(loads(dumps(valor)), valor)
+
+    def test_modelos_sao_validados_na_leitura(self):
+        self.cache.set('usuario', Usuario(id=1, nome='Ana'))
+        self.cache.set('outro', {'id': 'x'})
+
+        self.assertEqual(self.cache.get('usuario', model=Usuario), Usuario(id=1, nome='Ana'))
+        self.assertIsNone(self.cache.get('outro', model=Usuario))
+
+    def test_valor_corrompido_vira_miss(self):
+        erros = CACHE_REQUESTS.values().get(('memory', 'error'), 0)
+        for chave, dado in (('pickle', b'p' + pickle.dumps({'a': 1})), ('json', b'j{'), ('pagina', b'g\x00\x00'),
+                            ('truncada', b'g\x00\x00\x00\x00\x09[]'), ('vazio', b'')):
+            self.backend.set(chave, dado)
+            self.assertEqual(self.cache.get(chave, default='padrao'), 'padrao')
+
+        self.assertEqual(CACHE_REQUESTS.values()[('memory', 'error')] - erros, 5)
+
+    def test_resposta_resp_invalida_e_erro_de_cache(self):
+        for linha in (b':abc\r\n', b'$x\r\n', b'*1a\r\n'):
+            with self.assertRaises(CacheError):
+                read_reply(io.BytesIO(linha))
+
+
+class TestGetBackend(TestCase):
+    def _config(self, backend, **kwargs):
+        return Mock(cache_backend=backend, **kwargs)
+
+    def test_backends(self):
+        self.assertIsInstance(get_backend(self._config('memory', cache_max_entries=10)), MemoryBackend)
+        self.assertIsInstance(get_backend(self._config('none')), NullBackend)
+        self.assertIsInstance(get_backend(self._config('redis', cache_url='redis://localhost:6379/1',
+                                                       cache_timeout=0.1, cache_pool_size=2)), RespBackend)
+
+    def test_backend_desconhecido(self):
+        with self.assertRaises(ValueError):
+            get_backend(self._config('memcached'))
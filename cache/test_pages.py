@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from cache import Page, PageCache
+
+
+class TestPageCache(TestCase):
+    def test_get_put(self):
+        cache = PageCache(max_entries=4)
+
+        self.assertIsNone(cache.get(1, ''))
+        cache.put(1, '', Page(b'[]'))
+
+        self.assertEqual(cache.get(1, ''), Page(b'[]'))
+        self.assertIsNone(cache.get(1, 'fields=nome'))
+
+    def test_nova_versao_descarta_paginas_antigas(self):
+        cache = PageCache(max_entries=4)
+        cache.put(1, '', Page(b'[1]'))
+        cache.put(1, 'a=1', Page(b'[1]'))
+
+        self.assertIsNone(cache.get(2, ''))
+        cache.put(2, '', Page(b'[2]'))
+
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.version, 2)
+        self.assertIsNone(cache.get(1, 'a=1'))
+
+    def test_ignora_pagina_de_versao_anterior(self):
+        cache = PageCache(max_entries=4)
+        cache.put(2, '', Page(b'[2]'))
+
+        cache.put(1, '', Page(b'[1]'))
+
+        self.assertEqual(cache.get(2, ''), Page(b'[2]'))
+
+    def test_limite_de_entradas(self):
+        cache = PageCache(max_entries=2)
+        for i in range(3):
+            cache.put(1, str(i), Page(b'[]'))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(1, '0'))
+
+    def test_desabilitado(self):
+        cache = PageCache(max_entries=0)
+        cache.put(1, '', Page(b'[]'))
+
+        self.assertIsNone(cache.get(1, ''))
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+from unittest import IsolatedAsyncioTestCase
+
+from cache.singleflight import SingleFlight, COALESCED
+
+
+class TestSingleFlight(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.flight = SingleFlight('teste')
+        self.liberar = threading.Event()
+        self.chamadas = 0
+
+    def _carga(self, valor):
+        self.chamadas += 1
+        self.liberar.wait(5)
+        if isinstance(valor, Exception):
+            raise valor
+        return valor
+
+    def _coalescidas(self) -> float:
+        return COALESCED.values().get(('teste',), 0)
+
+    async def _aguardar(self, *tarefas):
+        await asyncio.sleep(0.01)
+        self.liberar.set()
+        return await asyncio.gather(*tarefas, return_exceptions=True)
+
+    async def test_chamadas_simultaneas_compartilham_a_carga(self):
+        antes = self._coalescidas()
+
+        resultados = await self._aguardar(*[self.flight.do('chave', self._carga, 42) for _ in range(10)])
+
+        self.assertEqual(resultados, [42] * 10)
+        self.assertEqual(self.chamadas, 1)
+        self.assertEqual(self._coalescidas() - antes, 9)
+        self.assertEqual(len(self.flight), 0)
+
+    async def test_chaves_diferentes_nao_compartilham(self):
+        resultados = await self._aguardar(self.flight.do(1, self._carga, 'a'), self.flight.do(2, self._carga, 'b'))
+
+        self.assertEqual(resultados, ['a', 'b'])
+        self.assertEqual(self.chamadas, 2)
+
+    async def test_erro_propagado_para_todos(self):
+        erro = ValueError('falhou')
+
+        resultados = await self._aguardar(*[self.flight.do('chave', self._carga, erro) for _ in range(3)])
+
+        self.assertEqual(resultados, [erro] * 3)
+        self.assertEqual(len(self.flight), 0)
+
+        self.liberar.set()
+        self.assertEqual(await self.flight.do('chave', self._carga, 1), 1)
+
+    async def test_cancelar_o_primeiro_nao_cancela_os_demais(self):
+        primeiro = asyncio.ensure_future(self.flight.do('chave', self._carga, 7))
+        await asyncio.sleep(0)
+        segundo = asyncio.ensure_future(self.flight.do('chave', self._carga, 7))
+        await asyncio.sleep(0)
+        primeiro.cancel()
+
+        resultados = await self._aguardar(primeiro, segundo)
+
+        self.assertIsInstance(resultados[0], asyncio.CancelledError)
+        self.assertEqual(resultados[1], 7)
+        self.assertEqual(self.chamadas, 1)
@@ -0,0 +1,91 @@
+import socketserver
+import threading
+import time
+
+from cache.resp import read_reply
+
+
+def _bulk(value) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except Exception:
+                return
+            if not isinstance(command, list) or not command:
+                return
+            self.wfile.write(self.server.execute([part if isinstance(part, bytes) else str(part).encode()
+                                                  for part in command]))
+
+
+# Servidor em processo com o subconjunto do protocolo Redis usado por RespBackend, para os testes.
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password: str = None):
+        super().__init__(('127.0.0.1', 0), _RespHandler)
+        self.password = password
+        self.data = {}
+        self.commands = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        auth = ':{}@'.format(self.password) if self.password else ''
+        return 'redis://{}{}:{}/0'.format(auth, host, port)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def execute(self, command) -> bytes:
+        name, args = command[0].upper().decode(), command[1:]
+        with self._lock:
+            self.commands.append(name)
+            if name == 'PING':
+                return b'+PONG\r\n'
+            if name == 'AUTH':
+                return b'+OK\r\n' if args[-1].decode() == self.password else b'-WRONGPASS invalid password\r\n'
+            if name == 'SELECT':
+                return b'+OK\r\n'
+            if name == 'GET':
+                return _bulk(self._get(args[0]))
+            if name == 'SET':
+                expires_at = None
+                if len(args) >= 4 and args[2].upper() == b'PX':
+                    expires_at = time.monotonic() + int(args[3]) / 1000
+                elif len(args) >= 4 and args[2].upper() == b'EX':
+                    expires_at = time.monotonic() + int(args[3])
+                self.data[args[0]] = (args[1], expires_at)
+                return b'+OK\r\n'
+            if name == 'DEL':
+                removed = sum(1 for key in args if self.data.pop(key, None) is not None)
+                return b':%d\r\n' % removed
+            if name == 'FLUSHDB':
+                self.data.clear()
+                return b'+OK\r\n'
+            return b"-ERR unknown command '%s'\r\n" % name.encode()
@@ -0,0 +1,68 @@
+import hashlib
+import os
+import posixpath
+import shutil
+import tempfile
+from typing import BinaryIO, Tuple
+
+NAME = 'local'
+
+
+def _root() -> str:
+    from settings import settings
+
+    return os.path.abspath(settings().storage_path)
+
+
+def _normalize_key(key: str) -> str:
+    normalized = posixpath.normpath(key.replace('\\', '/')).lstrip('/')
+    if not normalized or normalized == '.' or normalized.split('/')[0] == '..':
+        raise ValueError("Chave inválida: {}".format(key))
+    return normalized
+
+
+def path_for(key: str) -> str:
+    key = _normalize_key(key)
+    directory, name = posixpath.split(key)
+    shard = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    parts = directory.split('/') if directory else []
+    return os.path.join(_root(), *parts, shard[:2], shard[2:4], name)
+
+
+def upload_file(file: BinaryIO, key: str, public=True, mime_type=None) -> str:
+    path = path_for(key)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            shutil.copyfileobj(file, tmp, 1024 * 1024)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException as e:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise e
+
+    return file_url(key)
+
+
+def file_exists(key: str) -> bool:
+    return os.path.isfile(path_for(key))
+
+
+def file_url(key: str) -> str:
+    from settings import settings
+
+    return "{}/storage/{}".format(settings().api_url.rstrip('/'), _normalize_key(key))
+
+
+def stat_file(key: str) -> Tuple[str, os.stat_result]:
+    path = path_for(key)
+    stat = os.stat(path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    return path, stat
@@ -1,5 +1,7 @@
 from typing import BinaryIO
 
+NAME = 's3'
+
 
 class S3Client:
     __instance = None
@@ -29,6 +31,16 @@ class S3Client:
     def upload_fileobj(self, body: BinaryIO, bucket: str, key: str, **kwargs):
         self.__client.upload_fileobj(body, bucket, key, **kwargs)
 
+    def object_exists(self, bucket: str, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.__client.head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise e
+
     @classmethod
     def __destroy__(cls):
         cls.__instance = None
@@ -46,4 +58,17 @@ def upload_file(file: BinaryIO, key: str, public=True, mime_type=None) -> str:
     }
 
     s3.upload_fileobj(file, settings().s3_bucket, key, ExtraArgs=metadata)
+    return file_url(key)
+
+
+def file_exists(key: str) -> bool:
+    from settings import settings
+
+    s3 = S3Client.get_instance()
+    return s3.object_exists(settings().s3_bucket, key)
+
+
+def file_url(key: str) -> str:
+    from settings import settings
+
     return "{}/{}".format(settings().s3_cdn_url, key)
@@ -0,0 +1,46 @@
+from typing import BinaryIO, Protocol
+
+from observability.metrics import Histogram, timed
+
+UPLOAD_SECONDS = Histogram('storage_upload_duration_seconds', 'Duração dos uploads de arquivos', ('backend',))
+
+
+class StorageBackend(Protocol):
+    NAME: str
+
+    def upload_file(self, file: BinaryIO, key: str, public=True, mime_type=None) -> str:
+        ...
+
+    def file_exists(self, key: str) -> bool:
+        ...
+
+    def file_url(self, key: str) -> str:
+        ...
+
+
+def get_backend() -> StorageBackend:
+    from settings import settings
+
+    backend = settings().storage_backend
+    if backend == 's3':
+        from clients import s3_client
+        return s3_client
+    if backend == 'local':
+        from clients import local_storage_client
+        return local_storage_client
+
+    raise ValueError("Storage backend inválido: {}".format(backend))
+
+
+def upload_file(file: BinaryIO, key: str, public=True, mime_type=None) -> str:
+    backend = get_backend()
+    with timed(UPLOAD_SECONDS, backend=backend.NAME):
+        return backend.upload_file(file=file, key=key, public=public, mime_type=mime_type)
+
+
+def file_exists(key: str) -> bool:
+    return get_backend().file_exists(key)
+
+
+def file_url(key: str) -> str:
+    return get_backend().file_url(key)
@@ -0,0 +1,68 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from clients import local_storage_client
+
+
+class TestLocalStorageClient(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch('settings.settings')
+        self.mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_settings.return_value.storage_path = self.tmp.name
+        self.mock_settings.return_value.api_url = 'http://localhost:8000/'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_path_for_usa_diretorios_particionados(self):
+        path = local_storage_client.path_for('imagens-receitas/abc.jpg')
+
+        relative = os.path.relpath(path, self.tmp.name).split(os.sep)
+        self.assertEqual(relative[0], 'imagens-receitas')
+        self.assertEqual(len(relative[1]), 2)
+        self.assertEqual(len(relative[2]), 2)
+        self.assertEqual(relative[3], 'abc.jpg')
+
+    def test_path_for_rejeita_chave_fora_da_raiz(self):
+        with self.assertRaises(ValueError):
+            local_storage_client.path_for('../etc/passwd')
+        with self.assertRaises(ValueError):
+            local_storage_client.path_for('')
+
+    def test_upload_file(self):
+        url = local_storage_client.upload_file(io.BytesIO(b'conteudo'), 'imagens-receitas/abc.jpg')
+
+        self.assertEqual(url, 'http://localhost:8000/storage/imagens-receitas/abc.jpg')
+        self.assertTrue(local_storage_client.file_exists('imagens-receitas/abc.jpg'))
+        with open(local_storage_client.path_for('imagens-receitas/abc.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), b'conteudo')
+        directory = os.path.dirname(local_storage_client.path_for('imagens-receitas/abc.jpg'))
+        self.assertEqual(os.listdir(directory), ['abc.jpg'])
+
+    def test_upload_file_falha_nao_deixa_temporario(self):
+        arquivo = io.BytesIO(b'conteudo')
+        arquivo.read = lambda *args: (_ for _ in ()).throw(IOError('Erro'))
+
+        with self.assertRaises(IOError):
+            local_storage_client.upload_file(arquivo, 'imagens-receitas/abc.jpg')
+
+        directory = os.path.dirname(local_storage_client.path_for('imagens-receitas/abc.jpg'))
+        self.assertEqual(os.listdir(directory), [])
+        self.assertFalse(local_storage_client.file_exists('imagens-receitas/abc.jpg'))
+
+    def test_stat_file(self):
+        local_storage_client.upload_file(io.BytesIO(b'conteudo'), 'imagens-receitas/abc.jpg')
+
+        path, stat = local_storage_client.stat_file('imagens-receitas/abc.jpg')
+
+        self.assertEqual(path, local_storage_client.path_for('imagens-receitas/abc.jpg'))
+        self.assertEqual(stat.st_size, len(b'conteudo'))
+
+    def test_stat_file_inexistente(self):
+        with self.assertRaises(FileNotFoundError):
+            local_storage_client.stat_file('imagens-receitas/nao-existe.jpg')
@@ -1,6 +1,8 @@
 from unittest import TestCase
 from unittest.mock import Mock, patch
 
+from botocore.exceptions import ClientError
+
 from clients import s3_client
 
 base_mock_settings = Mock()
@@ -9,6 +11,7 @@ base_mock_settings.s3_endpoint = 'http://localhost:9000'
 base_mock_settings.s3_access_key = 's3-access-key'
 base_mock_settings.s3_secret_key = 's3-secret-key'
 base_mock_settings.s3_bucket = 's3-bucket'
+base_mock_settings.s3_cdn_url = 'http://cdn.localhost'
 
 
 class TestS3Client(TestCase):
@@ -109,3 +112,49 @@ class TestS3Client(TestCase):
             s3_client.upload_file(b'conteudo', 'key')
 
         self.assertEqual(str(context.exception), 'Erro ao fazer upload')
+
+    @patch('boto3.session.Session')
+    @patch('settings.settings', return_value=base_mock_settings)
+    def test_object_exists(self, mock_settings, mock_session):
+        mock_client = Mock()
+        mock_session.return_value.client.return_value = mock_client
+
+        s3 = s3_client.S3Client.get_instance()
+
+        self.assertTrue(s3.object_exists('bucket', 'key'))
+        mock_client.head_object.assert_called_once_with(Bucket='bucket', Key='key')
+
+    @patch('boto3.session.Session')
+    @patch('settings.settings', return_value=base_mock_settings)
+    def test_object_exists_not_found(self, mock_settings, mock_session):
+        mock_client = Mock()
+        mock_client.head_object.side_effect = ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        mock_session.return_value.client.return_value = mock_client
+
+        s3 = s3_client.S3Client.get_instance()
+
+        self.assertFalse(s3.object_exists('bucket', 'key'))
+
+    @patch('boto3.session.Session')
+    @patch('settings.settings', return_value=base_mock_settings)
+    def test_object_exists_throw_exception(self, mock_settings, mock_session):
+        mock_client = Mock()
+        mock_client.head_object.side_effect = ClientError({'Error': {'Code': '403'}}, 'HeadObject')
+        mock_session.return_value.client.return_value = mock_client
+
+        s3 = s3_client.S3Client.get_instance()
+
+        with self.assertRaises(ClientError):
+            s3.object_exists('bucket', 'key')
+
+    @patch('clients.s3_client.S3Client.get_instance')
+    @patch('settings.settings', return_value=base_mock_settings)
+    def test_file_exists(self, mock_settings, mock_get_instance):
+        mock_get_instance.return_value.object_exists.return_value = True
+
+        self.assertTrue(s3_client.file_exists('key'))
+        mock_get_instance.return_value.object_exists.assert_called_once_with(base_mock_settings.s3_bucket, 'key')
+
+    @patch('settings.settings', return_value=base_mock_settings)
+    def test_file_url(self, mock_settings):
+        self.assertEqual(s3_client.file_url('key'), 'http://cdn.localhost/key')
@@ -0,0 +1,45 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from clients import storage, s3_client, local_storage_client
+
+
+class TestStorage(TestCase):
+    @patch('settings.settings')
+    def test_get_backend_s3(self, mock_settings):
+        mock_settings.return_value.storage_backend = 's3'
+        self.assertIs(storage.get_backend(), s3_client)
+
+    @patch('settings.settings')
+    def test_get_backend_local(self, mock_settings):
+        mock_settings.return_value.storage_backend = 'local'
+        self.assertIs(storage.get_backend(), local_storage_client)
+
+    @patch('settings.settings')
+    def test_get_backend_invalido(self, mock_settings):
+        mock_settings.return_value.storage_backend = 'ftp'
+        with self.assertRaises(ValueError):
+            storage.get_backend()
+
+    @patch('clients.storage.get_backend')
+    def test_upload_file(self, mock_get_backend):
+        mock_get_backend.return_value.upload_file.return_value = 'http://cdn/key'
+
+        url = storage.upload_file(b'conteudo', 'key', mime_type='image/png')
+
+        self.assertEqual(url, 'http://cdn/key')
+        mock_get_backend.return_value.upload_file.assert_called_once_with(
+            file=b'conteudo', key='key', public=True, mime_type='image/png'
+        )
+
+    @patch('clients.storage.get_backend')
+    def test_file_exists_e_file_url(self, mock_get_backend):
+        backend = Mock()
+        backend.file_exists.return_value = True
+        backend.file_url.return_value = 'http://cdn/key'
+        mock_get_backend.return_value = backend
+
+        self.assertTrue(storage.file_exists('key'))
+        self.assertEqual(storage.file_url('key'), 'http://cdn/key')
+        backend.file_exists.assert_called_once_with('key')
+        backend.file_url.assert_called_once_with('key')
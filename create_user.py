@@ -1,20 +1,103 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
 from getpass import getpass
+from typing import Iterable, Iterator, List, NamedTuple, TextIO, Tuple
 
 from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from models import CreateUserRequest, CreateUserResponse
 from orm.base import get_db
+from repositories import user_repository
 from services import user_service, UserAlreadyExistsError
 
 
+class Rejected(NamedTuple):
+    line: int
+    reason: str
+
+
 def create_user(session: Session, request: CreateUserRequest) -> CreateUserResponse:
     return user_service.create_user(request, session)
 
 
-if __name__ == '__main__':
-    session = next(get_db(echo=False))
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def validate(rows: Iterable[Tuple[int, object]]) -> Tuple[List[Tuple[int, CreateUserRequest]], List[Rejected]]:
+    valid, rejected = [], []
+    emails, usernames = set(), set()
+    for line, row in rows:
+        if not isinstance(row, dict):
+            rejected.append(Rejected(line, 'not a JSON object'))
+            continue
+        try:
+            request = CreateUserRequest.model_validate(row)
+        except ValidationError as e:
+            rejected.append(Rejected(line, '; '.join('{}: {}'.format('.'.join(map(str, error['loc'])), error['msg'])
+                                                     for error in e.errors())))
+            continue
+        if request.email.lower() in emails or request.username.lower() in usernames:
+            rejected.append(Rejected(line, 'duplicated in file'))
+            continue
+        emails.add(request.email.lower())
+        usernames.add(request.username.lower())
+        valid.append((line, request))
+    return valid, rejected
+
+
+def provision(session: Session, requests: List[Tuple[int, CreateUserRequest]], batch_size: int = 500,
+              workers: int = None) -> Tuple[int, List[Rejected]]:
+    # Uma consulta por lote de e-mails/usernames em vez de duas consultas por usuário
+    taken_emails, taken_usernames = user_repository.find_conflicts(
+        session, [request.email for _, request in requests], [request.username for _, request in requests])
+
+    rejected, pending = [], []
+    for line, request in requests:
+        if request.email.lower() in taken_emails or request.username.lower() in taken_usernames:
+            rejected.append(Rejected(line, 'user already exists'))
+        else:
+            pending.append((line, request))
+
+    hashes = user_service.hash_passwords([request.password for _, request in pending], workers)
+
+    created = 0
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        users = [dict(name=request.name, username=request.username, email=request.email, hashed_password=hashed)
+                 for (_, request), hashed in zip(batch, hashes[start:start + batch_size])]
+        try:
+            created += user_repository.create_users(session, users)
+        except IntegrityError:
+            # Alguém criou um usuário conflitante depois de find_conflicts: o lote já foi desfeito, então refaz linha
+            # a linha e rejeita só as que conflitam
+            for (line, _), user in zip(batch, users):
+                try:
+                    created += user_repository.create_users(session, [user])
+                except IntegrityError:
+                    rejected.append(Rejected(line, 'user already exists (created concurrently)'))
+    return created, sorted(rejected)
 
+
+def _interactive(session: Session):
     try:
         request = CreateUserRequest(
             name=input('Name: '),
@@ -30,3 +113,42 @@ if __name__ == '__main__':
             print(error['loc'], error['msg'])
     except UserAlreadyExistsError:
         print("User already exists")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Creates users interactively or in batch from a CSV/NDJSON file')
+    parser.add_argument('file', nargs='?', help="CSV or NDJSON file ('-' for stdin); omit for interactive mode")
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help='Default: inferred from the file extension')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Password hashing processes')
+    parser.add_argument('--database-url', help='Default: DATABASE_URL from settings')
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        from sqlalchemy import create_engine
+        session = Session(create_engine(args.database_url))
+    else:
+        session = next(get_db(echo=False))
+
+    if args.file is None:
+        _interactive(session)
+        return 0
+
+    fmt = args.format or ('csv' if args.file.lower().endswith('.csv') else 'ndjson')
+    start = time.perf_counter()
+    if args.file == '-':
+        valid, rejected = validate(read_rows(sys.stdin, fmt))
+    else:
+        with open(args.file, newline='', encoding='utf-8') as stream:
+            valid, rejected = validate(read_rows(stream, fmt))
+
+    created, conflicts = provision(session, valid, batch_size=args.batch_size, workers=args.workers)
+    rejected = sorted(rejected + conflicts)
+    for line, reason in rejected:
+        print('line {}: {}'.format(line, reason), file=sys.stderr)
+    print('Created {} users, rejected {} in {:.1f}s'.format(created, len(rejected), time.perf_counter() - start))
+    return 1 if rejected else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
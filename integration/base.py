@@ -0,0 +1,170 @@
+import asyncio
+import gc
+import os
+import tempfile
+from contextlib import contextmanager
+from time import perf_counter
+from unittest import TestCase
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import orm
+from integration.budgets import BUDGETS
+from orm.db import EngineSingleton
+from repositories import receita_repository, invalidation_repository, user_repository
+
+TEST_PASSWORD = 'senha-secreta'
+TIME_FACTOR = float(os.environ.get('INTEGRATION_TIME_FACTOR', '1'))
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+class IntegrationTestCase(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        env = patch.dict(os.environ, {
+            'DATABASE_URL': 'sqlite://',
+            'API_URL': 'http://testserver',
+            'STORAGE_BACKEND': 'local',
+            'STORAGE_PATH': self.tmp.name,
+            'JOB_WORKER_ENABLED': 'false',
+            'CACHE_INVALIDATION_ENABLED': 'false',
+            'PDKDF2_ROUNDS': '1000',
+        })
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        orm.create_schema(self.engine)
+        with Session(self.engine) as session:
+            # Banco já migrado por migrate_user_indexes.py
+            user_repository.create_case_insensitive_indexes(session)
+        self.queries = QueryCounter()
+        event.listen(self.engine, 'before_cursor_execute', self.queries)
+
+        engine = patch.object(EngineSingleton, '_engine', self.engine)
+        engine.start()
+        self.addCleanup(engine.stop)
+
+        # A versão do catálogo é global ao processo: cada teste começa do zero
+        versao = patch.object(receita_repository, '_versao_catalogo', 0)
+        versao.start()
+        self.addCleanup(versao.stop)
+
+        from cache import get_cache
+        from services import receita_service
+        for cached in (receita_service._modo_leitura, receita_service._paginas, receita_service._comprimir_paginas,
+                       get_cache):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+
+        import main
+        self.app = main.app
+        self.client = TestClient(main.app)
+        self.client.get('/health')
+
+    def session(self) -> Session:
+        return Session(self.engine)
+
+    def create_user(self, username='cozinheiro', name='Cozinheiro', email=None) -> orm.User:
+        from services.user_service import _hash_password
+
+        with self.session() as session:
+            user = orm.User(
+                name=name,
+                username=username,
+                email=email or '{}@panela.test'.format(username),
+                hashed_password=_hash_password(TEST_PASSWORD),
+                is_active=True,
+            )
+            session.add(user)
+            session.commit()
+            session.refresh(user)
+            session.expunge(user)
+            return user
+
+    def create_receita(self, criador_id: int, nome='Bolo', ingredientes=3) -> orm.Receita:
+        with self.session() as session:
+            receita = orm.Receita(
+                nome=nome,
+                tipo='Doce',
+                criador_id=criador_id,
+                imagem='https://cdn.panela.test/bolo.jpg',
+                modo_de_preparo='# Modo de preparo\n\nMisture tudo.',
+                ingredientes=[orm.Ingrediente(nome='Ingrediente {}'.format(i), quantidade='1 xícara')
+                              for i in range(ingredientes)],
+            )
+            session.add(receita)
+            session.flush()
+            invalidation_repository.publish(session, 'receita', receita.id)
+            session.commit()
+            receita_repository.registrar_escrita(receita.id)
+            return receita.id
+
+    @contextmanager
+    def read_mode(self, modo: str):
+        from services import receita_service
+
+        with patch.dict(os.environ, {'RECEITAS_READ_MODE': modo}):
+            receita_service._modo_leitura.cache_clear()
+            receita_service._paginas().clear()
+            yield
+        receita_service._modo_leitura.cache_clear()
+        receita_service._paginas().clear()
+
+    def run_jobs(self) -> int:
+        # O worker fica desligado nos testes (JOB_WORKER_ENABLED=false): cada teste drena a fila quando precisa
+        from services import job_service
+
+        async def run():
+            worker = job_service.JobWorker()
+            executed = await worker.run_once()
+            while worker._tasks:
+                await asyncio.gather(*worker._tasks)
+            return executed
+
+        return asyncio.run(run())
+
+    def auth_headers(self, username='cozinheiro') -> dict:
+        response = self.client.post('/users/sign-in', json={'username': username, 'password': TEST_PASSWORD})
+        self.assertEqual(response.status_code, 200, response.text)
+        return {'X-Authorization': 'Bearer {}'.format(response.json()['token'])}
+
+    @contextmanager
+    def assertMaxQueries(self, max_queries: int):
+        start = self.queries.count
+        yield
+        executed = self.queries.statements[start:]
+        self.assertLessEqual(
+            len(executed), max_queries,
+            'Executou {} consultas (máximo {}):\n{}'.format(len(executed), max_queries, '\n'.join(executed)),
+        )
+
+    @contextmanager
+    def assertMaxDuration(self, max_ms: float):
+        max_ms *= TIME_FACTOR
+        start = perf_counter()
+        yield
+        elapsed_ms = (perf_counter() - start) * 1000
+        self.assertLessEqual(elapsed_ms, max_ms, 'Levou {:.1f}ms (máximo {}ms)'.format(elapsed_ms, max_ms))
+
+    def request_within_budget(self, method: str, route: str, url: str, **kwargs):
+        budget = BUDGETS[(method, route)]
+        gc.collect()
+        with self.assertMaxQueries(budget.max_queries), self.assertMaxDuration(budget.max_ms):
+            response = self.client.request(method, url, **kwargs)
+        return response
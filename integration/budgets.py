@@ -0,0 +1,23 @@
+class Budget:
+    def __init__(self, max_queries: int, max_ms: float):
+        self.max_queries = max_queries
+        self.max_ms = max_ms
+
+    def __repr__(self):
+        return f'<Budget {self.max_queries} queries, {self.max_ms}ms>'
+
+
+# Orçamentos de escrita consideram o payload de teste (2 ingredientes): cada ingrediente é um INSERT.
+BUDGETS = {
+    ('GET', '/health'): Budget(max_queries=0, max_ms=100),
+    ('GET', '/metrics'): Budget(max_queries=1, max_ms=100),
+    ('GET', '/receitas'): Budget(max_queries=2, max_ms=250),
+    ('GET', '/receitas/{id_receita}'): Budget(max_queries=2, max_ms=150),
+    ('POST', '/receitas'): Budget(max_queries=9, max_ms=100),
+    ('POST', '/receitas/imagem'): Budget(max_queries=1, max_ms=100),
+    ('PUT', '/receitas/{id_receita}'): Budget(max_queries=13, max_ms=100),
+    ('DELETE', '/receitas/{id_receita}'): Budget(max_queries=5, max_ms=100),
+    ('POST', '/users/sign-in'): Budget(max_queries=1, max_ms=250),
+    ('GET', '/users/me'): Budget(max_queries=1, max_ms=100),
+    ('GET', '/storage/{key:path}'): Budget(max_queries=0, max_ms=250),
+}
@@ -0,0 +1,407 @@
+import io
+import os
+from unittest.mock import patch
+
+from integration.base import IntegrationTestCase
+from repositories import receita_repository
+from services import receita_service
+
+NOVA_RECEITA = {
+    'nome': 'Bolo de cenoura',
+    'tipo': 'Doce',
+    'ingredientes': [{'nome': 'Cenoura', 'quantidade': '3 unidades'}, {'nome': 'Ovo', 'quantidade': '4 unidades'}],
+    'modo_de_preparo': '# Modo de preparo\n\nBata tudo e asse.',
+    'imagem': 'https://cdn.panela.test/bolo.jpg',
+}
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+class TestReceitasApi(IntegrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+
+    def test_get_receitas(self):
+        for i in range(20):
+            self.create_receita(self.user.id, nome='Receita {}'.format(i))
+
+        response = self.request_within_budget('GET', '/receitas', '/receitas')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 20)
+        self.assertEqual(response.json()[0]['nome'], 'Receita 19')
+        self.assertEqual(response.json()[0]['criador'], {'id': self.user.id, 'nome': 'Cozinheiro'})
+        self.assertEqual(len(response.json()[0]['ingredientes']), 3)
+
+    def test_get_receitas_nao_cresce_com_o_numero_de_receitas(self):
+        outro = self.create_user(username='confeiteiro')
+        for i in range(50):
+            self.create_receita(self.user.id if i % 2 else outro.id)
+
+        response = self.request_within_budget('GET', '/receitas', '/receitas')
+
+        self.assertEqual(len(response.json()), 50)
+
+    def test_get_receitas_servido_do_cache_ate_a_proxima_escrita(self):
+        self.create_receita(self.user.id)
+        self.assertEqual(len(self.client.get('/receitas').json()), 1)
+
+        with self.assertMaxQueries(0):
+            self.assertEqual(len(self.client.get('/receitas').json()), 1)
+
+        self.client.post('/receitas', json=NOVA_RECEITA, headers=self.auth_headers())
+
+        self.assertEqual(len(self.client.get('/receitas').json()), 2)
+
+    def test_parametros_extras_nao_criam_paginas_novas(self):
+        self.create_receita(self.user.id)
+        self.client.get('/receitas?fields=nome')
+
+        with self.assertMaxQueries(0):
+            for i in range(3):
+                self.assertEqual(len(self.client.get('/receitas?x={}&fields=nome,id'.format(i)).json()), 1)
+        self.assertEqual(len(receita_service._paginas()), 1)
+
+    def test_get_receitas_comprimido(self):
+        for i in range(20):
+            self.create_receita(self.user.id, nome='Receita {}'.format(i))
+        lista = self.client.get('/receitas').json()
+
+        with patch.dict(os.environ, {'RECEITAS_PAGE_CACHE_GZIP': 'true'}):
+            receita_service._comprimir_paginas.cache_clear()
+            receita_service._paginas().clear()
+            response = self.client.get('/receitas', headers={'Accept-Encoding': 'gzip'})
+            identidade = self.client.get('/receitas', headers={'Accept-Encoding': 'identity'})
+
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(response.headers['vary'], 'Accept-Encoding, Accept')
+        self.assertEqual(response.json(), lista)
+        self.assertNotIn('content-encoding', identidade.headers)
+        self.assertEqual(identidade.json(), lista)
+
+    def test_cache_compartilhado(self):
+        from cache import get_cache
+        from cache.testing import RespServer
+
+        receita_id = self.create_receita(self.user.id)
+        headers = self.auth_headers()
+
+        with RespServer() as server, patch.dict(os.environ, {'CACHE_BACKEND': 'redis', 'CACHE_URL': server.url}):
+            get_cache.cache_clear()
+            self.client.get('/receitas/{}'.format(receita_id))
+            self.client.get('/receitas')
+            receita_service._paginas().clear()
+
+            with self.assertMaxQueries(0):
+                self.assertEqual(self.client.get('/receitas/{}'.format(receita_id)).json()['nome'], 'Bolo')
+                self.assertEqual(len(self.client.get('/receitas').json()), 1)
+
+            self.client.put('/receitas/{}'.format(receita_id), json=dict(NOVA_RECEITA, nome='Bolo de fubá'),
+                            headers=headers)
+
+            self.assertEqual(self.client.get('/receitas/{}'.format(receita_id)).json()['nome'], 'Bolo de fubá')
+            self.assertEqual(self.client.get('/receitas').json()[0]['nome'], 'Bolo de fubá')
+            self.assertIn(b'panela-magica:auth:user:1', server.data)
+            get_cache.cache_clear()
+
+    def test_invalidacao_de_escrita_em_outro_no(self):
+        from sqlalchemy import update
+
+        import orm
+        from repositories import invalidation_repository
+        from services.invalidation_service import InvalidationListener
+
+        receita_id = self.create_receita(self.user.id)
+        listener = InvalidationListener(session_factory=self.session)
+        listener.poll_once()
+        self.client.get('/receitas/{}'.format(receita_id))
+        self.client.get('/receitas')
+
+        # Outro nó grava direto no banco: este nó só fica sabendo pelo barramento
+        with self.session() as session:
+            session.execute(update(orm.Receita).filter(orm.Receita.id == receita_id).values(nome='Bolo de fubá'))
+            invalidation_repository.publish(session, 'receita', receita_id)
+            session.commit()
+        self.assertEqual(self.client.get('/receitas/{}'.format(receita_id)).json()['nome'], 'Bolo')
+
+        self.assertEqual(listener.poll_once(), 1)
+        self.assertEqual(self.client.get('/receitas/{}'.format(receita_id)).json()['nome'], 'Bolo de fubá')
+        self.assertEqual(self.client.get('/receitas').json()[0]['nome'], 'Bolo de fubá')
+
+    def test_projecao_de_campos(self):
+        for i in range(3):
+            self.create_receita(self.user.id, nome='Receita {}'.format(i))
+        completa = self.client.get('/receitas').json()
+        resumo = [{campo: receita[campo] for campo in ('id', 'nome', 'tipo', 'criador', 'imagem')}
+                  for receita in completa]
+
+        for modo in ('rows', 'json', 'documents'):
+            with self.read_mode(modo), self.subTest(modo=modo):
+                inicio = len(self.queries.statements)
+                with self.assertMaxQueries(1):
+                    self.assertEqual(self.client.get('/receitas?fields=summary').json(), resumo)
+                self.assertNotIn('modo_de_preparo', ' '.join(self.queries.statements[inicio:]))
+
+                response = self.client.get('/receitas/{}?fields=ingredientes,nome'.format(completa[0]['id']))
+                esperado = {campo: completa[0][campo] for campo in ('id', 'nome', 'ingredientes')}
+                self.assertEqual(response.json(), esperado)
+
+        self.assertEqual(self.client.get('/receitas?fields=nome,senha').status_code, 400)
+        self.assertEqual(self.client.get('/receitas/1?fields=senha').status_code, 400)
+
+    def test_formato_compacto(self):
+        outro = self.create_user(username='confeiteira', name='Confeiteira')
+        for criador_id in (self.user.id, outro.id, self.user.id):
+            self.create_receita(criador_id)
+        completa = self.client.get('/receitas').json()
+
+        compacto = self.client.get('/receitas?shape=compact').json()
+        self.assertEqual(compacto['criadores'], {str(self.user.id): {'nome': 'Cozinheiro'},
+                                                 str(outro.id): {'nome': 'Confeiteira'}})
+        reconstruida = [
+            dict(receita, criador={'id': receita['criador_id'],
+                                   'nome': compacto['criadores'][str(receita['criador_id'])]['nome']})
+            for receita in compacto['receitas']
+        ]
+        for receita in reconstruida:
+            del receita['criador_id']
+        self.assertEqual(reconstruida, completa)
+
+        internado = self.client.get('/receitas?shape=compact-interned&fields=nome,ingredientes').json()
+        self.assertEqual(internado['nomes_ingredientes'], ['Ingrediente 0', 'Ingrediente 1', 'Ingrediente 2'])
+        self.assertNotIn('criadores', internado)
+        self.assertEqual(internado['receitas'][0]['ingredientes'][2], {'nome_id': 2, 'quantidade': '1 xícara'})
+        self.assertEqual(self.client.get('/receitas?shape=xml').status_code, 422)
+
+    def test_modo_json_devolve_o_mesmo_documento(self):
+        for i in range(5):
+            self.create_receita(self.user.id, nome='Receita {}'.format(i))
+        self.create_receita(self.user.id, ingredientes=0)
+        lista, receita = self.client.get('/receitas').json(), self.client.get('/receitas/1').json()
+
+        with self.read_mode('json'):
+            with self.assertMaxQueries(1):
+                response = self.request_within_budget('GET', '/receitas', '/receitas')
+            self.assertEqual(response.json(), lista)
+
+            response = self.request_within_budget('GET', '/receitas/{id_receita}', '/receitas/1')
+            self.assertEqual(response.json(), receita)
+            self.assertEqual(response.headers['content-type'], 'application/json')
+            self.assertEqual(self.client.get('/receitas/999').status_code, 404)
+
+    def test_data_de_criacao_independe_do_fuso_do_servidor(self):
+        import datetime
+        import time
+
+        import orm
+
+        receita_id = self.create_receita(self.user.id)
+        with self.session() as session:
+            session.get(orm.Receita, receita_id).data_de_criacao = datetime.datetime(2024, 1, 1, 12, 0, 0)
+            session.commit()
+            receita_repository.reconstruir_documentos(session)
+
+        with patch.dict(os.environ, {'TZ': 'America/Sao_Paulo'}):
+            time.tzset()
+            self.addCleanup(time.tzset)
+            with self.session() as session:
+                self.assertEqual(session.get(orm.Receita, receita_id).to_dto().data_de_criacao, 1704110400)
+            for modo in ('rows', 'json', 'documents'):
+                with self.subTest(modo=modo), self.read_mode(modo):
+                    self.assertEqual(self.client.get('/receitas').json()[0]['data_de_criacao'], 1704110400)
+                    self.assertEqual(self.client.get('/receitas?fields=data_de_criacao').json()[0]['data_de_criacao'],
+                                     1704110400)
+
+    def _documento(self, receita_id):
+        import json
+
+        import orm
+
+        with self.session() as session:
+            documento = session.get(orm.ReceitaDocumento, receita_id)
+            return json.loads(documento.documento) if documento else None
+
+    def test_documentos_acompanham_escritas(self):
+        headers = self.auth_headers()
+
+        criada = self.client.post('/receitas', json=NOVA_RECEITA, headers=headers).json()
+        self.assertIsNone(self._documento(criada['id']))
+        with self.read_mode('documents'):
+            self.assertEqual(self.client.get('/receitas/{}'.format(criada['id'])).json(), criada)
+
+        self.assertEqual(self.run_jobs(), 1)
+        self.assertEqual(self._documento(criada['id']), criada)
+
+        alterada = self.client.put('/receitas/{}'.format(criada['id']), json=dict(NOVA_RECEITA, nome='Bolo de milho'),
+                                   headers=headers).json()
+        self.assertIsNone(self._documento(criada['id']))
+        with self.read_mode('documents'):
+            self.assertEqual(self.client.get('/receitas/{}'.format(criada['id'])).json(), alterada)
+
+        self.assertEqual(self.run_jobs(), 1)
+        self.assertEqual(self._documento(criada['id']), alterada)
+
+        self.client.delete('/receitas/{}'.format(criada['id']), headers=headers)
+        self.assertIsNone(self._documento(criada['id']))
+
+    def test_documentos_acompanham_o_nome_do_criador(self):
+        from repositories import user_repository
+
+        receita_id = self.client.post('/receitas', json=NOVA_RECEITA, headers=self.auth_headers()).json()['id']
+
+        with self.session() as session:
+            user_repository.update_user_name(session, self.user.id, 'Chef Cozinheiro')
+
+        self.assertEqual(self._documento(receita_id)['criador'], {'id': self.user.id, 'nome': 'Chef Cozinheiro'})
+
+    def test_modo_documents_serve_documentos_materializados(self):
+        from repositories import receita_repository
+
+        for i in range(5):
+            self.create_receita(self.user.id, nome='Receita {}'.format(i))
+        lista = self.client.get('/receitas').json()
+
+        with self.read_mode('documents'):
+            with self.assertMaxQueries(1):
+                sem_documentos = self.client.get('/receitas').json()
+
+            with self.session() as session:
+                self.assertEqual(receita_repository.reconstruir_documentos(session, batch_size=2), 5)
+            with self.assertMaxQueries(1):
+                self.assertEqual(self.client.get('/receitas').json(), lista)
+
+            self.assertEqual(sem_documentos, lista)
+            self.assertEqual(self.client.get('/receitas/1').json(), lista[-1])
+            self.assertEqual(self.client.get('/receitas/999').status_code, 404)
+
+    def test_get_receita(self):
+        receita_id = self.create_receita(self.user.id)
+
+        response = self.request_within_budget('GET', '/receitas/{id_receita}', '/receitas/{}'.format(receita_id))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], receita_id)
+
+    def test_get_receita_inexistente(self):
+        response = self.request_within_budget('GET', '/receitas/{id_receita}', '/receitas/999')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_receita(self):
+        headers = self.auth_headers()
+
+        response = self.request_within_budget('POST', '/receitas', '/receitas', json=NOVA_RECEITA, headers=headers)
+
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()['nome'], 'Bolo de cenoura')
+        self.assertEqual(response.json()['criador']['id'], self.user.id)
+        self.assertEqual(len(response.json()['ingredientes']), 2)
+
+    def test_post_receita_msgpack(self):
+        import msgpack
+
+        headers = dict(self.auth_headers(), **{'Content-Type': 'application/msgpack', 'Accept': 'application/msgpack'})
+
+        response = self.client.post('/receitas', content=msgpack.packb(NOVA_RECEITA), headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['nome'], 'Bolo de cenoura')
+
+        lista = self.client.get('/receitas', headers={'Accept': 'application/msgpack'})
+        self.assertEqual(msgpack.unpackb(lista.content), self.client.get('/receitas').json())
+
+    def test_lista_msgpack_comprimida_sai_do_cache_de_paginas(self):
+        import msgpack
+
+        for i in range(20):
+            self.create_receita(self.user.id, nome='Receita {}'.format(i))
+        lista = self.client.get('/receitas').json()
+        headers = {'Accept': 'application/msgpack', 'Accept-Encoding': 'gzip'}
+
+        with patch.dict(os.environ, {'RECEITAS_PAGE_CACHE_GZIP': 'true'}):
+            receita_service._comprimir_paginas.cache_clear()
+            receita_service._paginas().clear()
+            self.client.get('/receitas', headers=headers)
+
+            with self.assertMaxQueries(0), patch('json.loads', side_effect=AssertionError('transcodificou de novo')):
+                response = self.client.get('/receitas', headers=headers)
+        receita_service._comprimir_paginas.cache_clear()
+
+        self.assertEqual(response.headers['content-type'], 'application/msgpack')
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(response.headers['vary'], 'Accept, Accept-Encoding')
+        self.assertEqual(msgpack.unpackb(response.content), lista)
+
+    def test_post_receita_idempotente(self):
+        from cache import get_cache
+
+        # As chaves ficam no banco: desligar o cache não desliga a idempotência
+        sem_cache = patch.dict(os.environ, {'CACHE_BACKEND': 'none'})
+        sem_cache.start()
+        self.addCleanup(sem_cache.stop)
+        get_cache.cache_clear()
+        headers = dict(self.auth_headers(), **{'Idempotency-Key': 'b4a1c0de'})
+
+        primeira = self.client.post('/receitas', json=NOVA_RECEITA, headers=headers)
+        segunda = self.client.post('/receitas', json=NOVA_RECEITA, headers=headers)
+
+        self.assertEqual(primeira.status_code, 200, primeira.text)
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(segunda.headers['idempotent-replayed'], 'true')
+        self.assertEqual(len(self.client.get('/receitas').json()), 1)
+
+        outra = self.client.post('/receitas', json=dict(NOVA_RECEITA, nome='Outro bolo'), headers=headers)
+        self.assertEqual(outra.status_code, 422)
+
+    def test_put_receita(self):
+        receita_id = self.create_receita(self.user.id)
+        headers = self.auth_headers()
+
+        response = self.request_within_budget('PUT', '/receitas/{id_receita}', '/receitas/{}'.format(receita_id),
+                                              json=NOVA_RECEITA, headers=headers)
+
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()['nome'], 'Bolo de cenoura')
+        self.assertEqual(len(response.json()['ingredientes']), 2)
+
+    def test_delete_receita(self):
+        receita_id = self.create_receita(self.user.id)
+        headers = self.auth_headers()
+
+        response = self.request_within_budget('DELETE', '/receitas/{id_receita}', '/receitas/{}'.format(receita_id),
+                                              headers=headers)
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get('/receitas/{}'.format(receita_id)).status_code, 404)
+
+    def test_post_imagem_e_get_storage(self):
+        headers = self.auth_headers()
+
+        response = self.request_within_budget('POST', '/receitas/imagem', '/receitas/imagem', headers=headers,
+                                              files={'imagem': ('bolo.png', io.BytesIO(PNG), 'image/png')})
+
+        self.assertEqual(response.status_code, 200, response.text)
+        url = response.json()
+        self.assertTrue(url.startswith('http://testserver/storage/imagens-receitas/'))
+
+        response = self.request_within_budget('GET', '/storage/{key:path}', url.replace('http://testserver', ''))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, PNG)
+
+    def test_post_imagem_idempotente(self):
+        headers = dict(self.auth_headers(), **{'Idempotency-Key': 'upload-1'})
+        files = {'imagem': ('bolo.png', io.BytesIO(PNG), 'image/png')}
+
+        with patch('clients.storage.upload_file', return_value='http://testserver/storage/x.png') as upload, \
+                patch('clients.storage.file_exists', return_value=False), \
+                patch.dict(receita_repository._imagens_conhecidas, clear=True):
+            primeira = self.client.post('/receitas/imagem', headers=headers, files=files)
+            files['imagem'][1].seek(0)
+            segunda = self.client.post('/receitas/imagem', headers=headers, files=files)
+
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(segunda.headers['idempotent-replayed'], 'true')
+        upload.assert_called_once()
@@ -0,0 +1,75 @@
+from integration.base import IntegrationTestCase, TEST_PASSWORD
+from integration.budgets import BUDGETS
+
+
+class TestUsersApi(IntegrationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+
+    def test_sign_in(self):
+        response = self.request_within_budget('POST', '/users/sign-in', '/users/sign-in',
+                                              json={'username': 'cozinheiro', 'password': TEST_PASSWORD})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.user.id)
+
+    def test_sign_in_ignora_caixa(self):
+        response = self.request_within_budget('POST', '/users/sign-in', '/users/sign-in',
+                                              json={'username': 'Cozinheiro@Panela.TEST', 'password': TEST_PASSWORD})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.user.id)
+
+    def test_cadastro_duplicado_pelo_indice_unico(self):
+        from models import CreateUserRequest
+        from services.user_service import create_user, UserAlreadyExistsError
+
+        for username, email in (('cozinheiro', 'novo@panela.test'), ('novocozinheiro', 'Cozinheiro@Panela.test')):
+            with self.subTest(username=username), self.session() as session:
+                request = CreateUserRequest.model_construct(name='Outro', username=username, email=email,
+                                                            password=TEST_PASSWORD)
+                with self.assertRaises(UserAlreadyExistsError):
+                    create_user(request, session=session)
+
+        with self.session() as session:
+            request = CreateUserRequest.model_construct(name='Outro', username='novocozinheiro',
+                                                        email='novo@panela.test', password=TEST_PASSWORD)
+            self.assertEqual(create_user(request, session=session).username, 'novocozinheiro')
+
+    def test_sign_in_senha_errada(self):
+        response = self.request_within_budget('POST', '/users/sign-in', '/users/sign-in',
+                                              json={'username': 'cozinheiro', 'password': 'errada'})
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_me(self):
+        headers = self.auth_headers()
+
+        response = self.request_within_budget('GET', '/users/me', '/users/me', headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'cozinheiro')
+
+
+class TestOperationalApi(IntegrationTestCase):
+    def test_health(self):
+        response = self.request_within_budget('GET', '/health', '/health')
+
+        self.assertEqual(response.json(), {'health': 'ok'})
+
+    def test_metrics(self):
+        response = self.request_within_budget('GET', '/metrics', '/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_requests_total', response.text)
+
+    def test_todas_as_rotas_tem_orcamento(self):
+        routes = {
+            (method, route.path)
+            for route in self.app.routes
+            if getattr(route, 'include_in_schema', False)
+            for method in route.methods
+        }
+
+        self.assertEqual(routes - set(BUDGETS), set())
@@ -1,17 +1,58 @@
 import json
-from typing import List
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, Literal, Optional
 
-from fastapi import FastAPI, File, UploadFile, Header, Depends, HTTPException
+from fastapi import FastAPI, File, UploadFile, Header, Depends, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import Response
+from starlette.responses import Response, FileResponse
 
 import models
 import repositories.receita_repository
 import services.user_service
-from orm import SessionDep
+from clients import local_storage_client
+from middlewares.admission import AdmissionControlMiddleware
+from middlewares.content_negotiation import ContentNegotiationMiddleware, negotiate
+from middlewares.metrics import MetricsMiddleware
+from middlewares.primary_pin import PrimaryPinMiddleware
+from middlewares.profiling import ProfilingMiddleware
+from middlewares.server_timing import ServerTimingMiddleware
+from observability import metrics
+from orm import SessionDep, create_schema, pinned_to_primary
+from orm.db import EngineSingleton, ReplicaHealthCheck
+from services import job_service, receita_service, invalidation_service, idempotency_service
+from settings import settings
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    create_schema()
+
+    replica_check = ReplicaHealthCheck()
+    await replica_check.start()
+
+    worker = job_service.JobWorker()
+    if settings().job_worker_enabled:
+        await worker.start()
+
+    invalidation_listener = invalidation_service.InvalidationListener()
+    if settings().cache_invalidation_enabled:
+        await invalidation_listener.start()
+
+    yield
+
+    await invalidation_listener.stop()
+    await worker.stop()
+    await replica_check.stop()
+    EngineSingleton.close_engine()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Os corpos msgpack/CBOR só são lidos (e decodificados) depois da admissão
+app.add_middleware(ContentNegotiationMiddleware)
+# Mais interno que o CORS para que os 503 saiam com os cabeçalhos de CORS
+app.add_middleware(AdmissionControlMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],
@@ -19,6 +60,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrimaryPinMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 def auth_middleware(
@@ -41,39 +86,107 @@ async def read_root():
     return {"health": "ok"}
 
 
+@app.get("/metrics")
+def get_metrics() -> Response:
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+CAMPOS_DESCRICAO = "Campos separados por vírgula (ex.: id,nome,imagem) ou 'summary'"
+FORMATO_DESCRICAO = ("'compact' devolve {receitas, criadores} com criador_id em cada receita; "
+                     "'compact-interned' também troca o nome dos ingredientes por índices em nomes_ingredientes")
+
+
 @app.get('/receitas')
-async def get_receitas(session: SessionDep) -> List[models.Receita]:
-    return repositories.receita_repository.listar_receitas(session)
+async def get_receitas(
+        request: Request,
+        fields: Optional[str] = Query(None, description=CAMPOS_DESCRICAO),
+        shape: Literal[receita_service.FORMATOS_LISTA] = Query('full', description=FORMATO_DESCRICAO),
+) -> List[models.Receita]:
+    try:
+        campos = receita_service.campos_da_consulta(fields)
+    except receita_service.CampoInvalidoError as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+    return await receita_service.listar_receitas(
+        aceita_gzip='gzip' in request.headers.get('accept-encoding', ''),
+        campos=campos,
+        formato=shape,
+        fixado_no_primario=partial(pinned_to_primary, request),
+        codec=negotiate(request.headers.get('accept', '')),
+    )
 
 
 @app.get('/receitas/{id_receita}')
-async def get_receita(session: SessionDep, id_receita: int) -> models.Receita or Response:
-    receita = repositories.receita_repository.buscar_receita_por_id(session, id_receita)
+async def get_receita(
+        request: Request,
+        id_receita: int,
+        fields: Optional[str] = Query(None, description=CAMPOS_DESCRICAO),
+) -> models.Receita or Response:
+    try:
+        campos = receita_service.campos_da_consulta(fields)
+    except receita_service.CampoInvalidoError as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+    receita = await receita_service.buscar_receita_por_id(id_receita, campos, partial(pinned_to_primary, request))
     if not receita:
         return Response(status_code=404)
 
     return receita
 
 
+IDEMPOTENCY_KEY_DESCRIPTION = "Repetições com a mesma chave devolvem a resposta da primeira execução"
+
+
+async def _idempotent(key, user_id: int, route: str, fingerprint: str, fn, session=None) -> Response:
+    if key is None:
+        return fn(session)
+    try:
+        return await idempotency_service.execute(key, user_id, route, fingerprint, fn)
+    except idempotency_service.InvalidIdempotencyKeyError as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    except idempotency_service.IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=422, detail=e.message)
+    except idempotency_service.IdempotencyKeyInProgressError as e:
+        raise HTTPException(status_code=409, detail=e.message, headers={'Retry-After': '1'})
+
+
 @app.post('/receitas')
 async def post_receita(
         session: SessionDep,
         request: models.CriarReceita,
-        auth=Depends(auth_middleware)
+        auth=Depends(auth_middleware),
+        idempotency_key: Optional[str] = Header(None, alias='Idempotency-Key', description=IDEMPOTENCY_KEY_DESCRIPTION),
 ) -> models.Receita:
     request.assign_criador_id(auth.id)
-    return repositories.receita_repository.criar_receita(session, request)
+
+    # Com Idempotency-Key a criação roda numa sessão aberta pelo serviço de idempotência, não na da requisição
+    def criar(criar_session) -> Response:
+        receita = repositories.receita_repository.criar_receita(criar_session, request)
+        job_service.notify()
+        return Response(content=receita.model_dump_json(), media_type='application/json')
+
+    fingerprint = ''
+    if idempotency_key is not None:
+        fingerprint = idempotency_service.fingerprint(request.model_dump_json())
+    return await _idempotent(idempotency_key, auth.id, 'POST /receitas', fingerprint, criar, session)
 
 
 @app.post('/receitas/imagem')
 async def post_imagem_receita(
         imagem: UploadFile = File(description="Imagem da receita (png, jpg, jpeg e até 2MB)"),
-        _=Depends(auth_middleware),
+        auth=Depends(auth_middleware),
+        idempotency_key: Optional[str] = Header(None, alias='Idempotency-Key', description=IDEMPOTENCY_KEY_DESCRIPTION),
 ) -> Response:
-    if not repositories.receita_repository.imagem_receita_e_valida(imagem.file):
-        return Response(status_code=400, content="Imagem inválida")
-    return Response(content=json.dumps(repositories.receita_repository.salvar_imagem_receita(imagem)),
-                    media_type="application/json")
+    def salvar(_session) -> Response:
+        if not repositories.receita_repository.imagem_receita_e_valida(imagem.file):
+            return Response(status_code=400, content="Imagem inválida")
+        return Response(content=json.dumps(repositories.receita_repository.salvar_imagem_receita(imagem)),
+                        media_type="application/json")
+
+    fingerprint = ''
+    if idempotency_key is not None:
+        fingerprint = idempotency_service.fingerprint(imagem.filename or '', imagem.content_type or '', imagem.file)
+    return await _idempotent(idempotency_key, auth.id, 'POST /receitas/imagem', fingerprint, salvar)
 
 
 @app.put('/receitas/{id_receita}')
@@ -83,7 +196,9 @@ async def put_receita(
         request: models.CriarReceita,
         _=Depends(auth_middleware),
 ) -> models.Receita:
-    return repositories.receita_repository.atualizar_receita(session, id_receita, request)
+    receita = repositories.receita_repository.atualizar_receita(session, id_receita, request)
+    job_service.notify()
+    return receita
 
 
 @app.delete('/receitas/{id_receita}')
@@ -106,3 +221,20 @@ async def sign_in(
 @app.get('/users/me')
 async def me(user=Depends(auth_middleware)) -> 'services.MeResponse':
     return user
+
+
+@app.get('/storage/{key:path}')
+async def get_storage(key: str) -> Response:
+    if settings().storage_backend != 'local':
+        return Response(status_code=404)
+
+    try:
+        path, stat = local_storage_client.stat_file(key)
+    except (FileNotFoundError, ValueError):
+        return Response(status_code=404)
+
+    return FileResponse(
+        path,
+        stat_result=stat,
+        headers={'Cache-Control': 'public, max-age=31536000, immutable'},
+    )
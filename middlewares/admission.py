@@ -0,0 +1,149 @@
+import asyncio
+import json
+from collections import deque
+from time import perf_counter
+from typing import Dict, Optional
+
+from starlette.types import ASGIApp, Scope, Receive, Send
+
+from observability.metrics import CallbackGauge, Counter, Gauge, Histogram
+
+ROUTE_CLASSES = ('read', 'write', 'sign_in', 'upload')
+EXEMPT_PATHS = ('/health', '/metrics')
+EXEMPT_PREFIXES = ('/storage/',)
+
+_limits: Dict[str, int] = {}
+
+ACTIVE = Gauge('admission_active_requests', 'Requisições admitidas em andamento', ('route_class',))
+QUEUED = Gauge('admission_queued_requests', 'Requisições aguardando admissão', ('route_class',))
+REJECTED = Counter('admission_rejected_total', 'Requisições recusadas pelo controle de admissão',
+                   ('route_class', 'reason'))
+WAIT = Histogram('admission_wait_seconds', 'Espera na fila de admissão', ('route_class',))
+LIMITS = CallbackGauge('admission_limit', 'Limite de concorrência por classe de rota',
+                       lambda: {(route_class,): limit for route_class, limit in _limits.items()}, ('route_class',))
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if method == 'OPTIONS' or path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if method == 'POST' and path == '/users/sign-in':
+        return 'sign_in'
+    if method == 'POST' and path == '/receitas/imagem':
+        return 'upload'
+    return 'read' if method in ('GET', 'HEAD') else 'write'
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(reason)
+
+
+class Limiter:
+    # Semáforo com fila FIFO limitada: quem não cabe na fila, ou espera demais, é recusado na hora
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters = deque()
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise Rejected('queue_full')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        QUEUED.inc(route_class=self.name)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            if not self._discard(waiter):
+                return
+            raise Rejected('timeout')
+        except asyncio.CancelledError:
+            if not self._discard(waiter):
+                self.release()
+            raise
+        finally:
+            QUEUED.dec(route_class=self.name)
+
+    def _discard(self, waiter: asyncio.Future) -> bool:
+        # False quando a vaga já foi repassada a este waiter e precisa ser usada (ou devolvida)
+        if waiter.done():
+            return False
+        waiter.cancel()
+        self._waiters.remove(waiter)
+        return True
+
+    def release(self):
+        # A vaga passa direto para o próximo da fila, sem voltar ao contador
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._limiters = None
+        self._retry_after = 1
+
+    def _limiter(self, name: str) -> Optional[Limiter]:
+        if self._limiters is None:
+            from settings import settings
+            config = settings()
+            self._retry_after = max(1, round(config.admission_retry_after_seconds))
+            self._limiters = {}
+            if config.admission_enabled:
+                for route_class_name in ROUTE_CLASSES:
+                    limit = getattr(config, 'admission_{}_limit'.format(route_class_name))
+                    if limit > 0:
+                        self._limiters[route_class_name] = Limiter(
+                            route_class_name, limit, getattr(config, 'admission_{}_queue'.format(route_class_name)),
+                            config.admission_queue_timeout_seconds)
+                        _limits[route_class_name] = limit
+        return self._limiters.get(name)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        name = route_class(scope['method'], scope['path']) if scope['type'] == 'http' else None
+        limiter = self._limiter(name) if name else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        try:
+            await limiter.acquire()
+        except Rejected as e:
+            REJECTED.inc(route_class=name, reason=e.reason)
+            await self._reject(send)
+            return
+        WAIT.observe(perf_counter() - start, route_class=name)
+
+        ACTIVE.inc(route_class=name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ACTIVE.dec(route_class=name)
+            limiter.release()
+
+    async def _reject(self, send: Send):
+        body = json.dumps({'detail': 'Servidor sobrecarregado, tente novamente'}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('latin-1')),
+                (b'retry-after', str(self._retry_after).encode('latin-1')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,203 @@
+import asyncio
+import gzip
+import json
+from typing import Callable, Dict, NamedTuple, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+JSON = 'application/json'
+
+
+class Codec(NamedTuple):
+    media_type: str
+    encode: Callable[[object], bytes]
+    decode: Callable[[bytes], object]
+
+
+CODECS: Dict[str, Codec] = {}
+if msgpack is not None:
+    _msgpack = Codec('application/msgpack', msgpack.packb, msgpack.unpackb)
+    for _media_type in ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack'):
+        CODECS[_media_type] = _msgpack
+if cbor2 is not None:
+    CODECS['application/cbor'] = Codec('application/cbor', cbor2.dumps, cbor2.loads)
+
+
+def _media_type(value: str) -> str:
+    return value.split(';', 1)[0].strip().lower()
+
+
+def negotiate(accept: str) -> Optional[Codec]:
+    # None significa JSON: só troca o formato quando um binário é preferido (empates ficam com o primeiro listado)
+    escolhido, melhor_q = None, 0.0
+    for item in accept.split(','):
+        media_type, *parametros = item.split(';')
+        media_type = media_type.strip().lower()
+        if media_type in (JSON, 'application/*', '*/*'):
+            candidato = None
+        elif media_type in CODECS:
+            candidato = CODECS[media_type]
+        else:
+            continue
+
+        q = 1.0
+        for parametro in parametros:
+            nome, _, valor = parametro.strip().partition('=')
+            if nome == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        if q > melhor_q:
+            escolhido, melhor_q = candidato, q
+    return escolhido
+
+
+def _to_json(documento) -> bytes:
+    return json.dumps(documento, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class ContentNegotiationMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._max_body = None
+
+    def _max_body_bytes(self) -> int:
+        if self._max_body is None:
+            from settings import settings
+            self._max_body = settings().content_max_body_bytes
+        return self._max_body
+
+    async def _read_body(self, headers: Headers, receive: Receive) -> bytes:
+        # O corpo binário é lido inteiro para virar JSON: sem limite, um cliente prende memória à vontade
+        limite = self._max_body_bytes()
+        try:
+            if int(headers.get('content-length', 0)) > limite:
+                raise _BodyTooLarge()
+        except ValueError:
+            pass
+
+        partes, tamanho = [], 0
+        while True:
+            message = await receive()
+            parte = message.get('body', b'')
+            tamanho += len(parte)
+            if tamanho > limite:
+                raise _BodyTooLarge()
+            partes.append(parte)
+            if not message.get('more_body', False):
+                return b''.join(partes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        entrada = CODECS.get(_media_type(headers.get('content-type', '')))
+        if entrada is not None:
+            try:
+                corpo = await self._read_body(headers, receive)
+            except _BodyTooLarge:
+                await JSONResponse({'detail': 'Corpo maior que {} bytes'.format(self._max_body_bytes())},
+                                   status_code=413)(scope, receive, send)
+                return
+            try:
+                corpo = _to_json(entrada.decode(corpo))
+            except Exception:
+                await JSONResponse({'detail': 'Corpo {} inválido'.format(entrada.media_type)}, status_code=400)(
+                    scope, receive, send)
+                return
+
+            scope = dict(scope)
+            scope['headers'] = [(nome, valor) for nome, valor in scope['headers']
+                                if nome not in (b'content-type', b'content-length')]
+            scope['headers'] += [(b'content-type', JSON.encode()), (b'content-length', str(len(corpo)).encode())]
+            receive = _replay(corpo, receive)
+
+        saida = negotiate(headers.get('accept', ''))
+        await self.app(scope, receive, _Transcoder(send, saida) if saida is not None else _vary(send))
+
+
+def _replay(corpo: bytes, receive: Receive) -> Receive:
+    enviado = False
+
+    async def replay() -> Message:
+        nonlocal enviado
+        if enviado:
+            return await receive()
+        enviado = True
+        return {'type': 'http.request', 'body': corpo, 'more_body': False}
+
+    return replay
+
+
+def _vary(send: Send) -> Send:
+    async def send_wrapper(message: Message):
+        if message['type'] == 'http.response.start':
+            headers = MutableHeaders(scope=message)
+            if _media_type(headers.get('content-type', '')) == JSON:
+                headers.add_vary_header('Accept')
+        await send(message)
+
+    return send_wrapper
+
+
+class _Transcoder:
+    def __init__(self, send: Send, codec: Codec):
+        self.send = send
+        self.codec = codec
+        self.start: Optional[Message] = None
+        self.corpo = []
+
+    async def __call__(self, message: Message):
+        if message['type'] == 'http.response.start':
+            if _media_type(Headers(raw=message['headers']).get('content-type', '')) == JSON:
+                self.start = message
+                return
+        elif message['type'] == 'http.response.body' and self.start is not None:
+            self.corpo.append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+            await self._transcodificar(b''.join(self.corpo))
+            return
+        await self.send(message)
+
+    async def _transcodificar(self, corpo: bytes):
+        headers = MutableHeaders(scope=self.start)
+        headers.add_vary_header('Accept')
+        comprimido = headers.get('content-encoding') == 'gzip'
+        try:
+            # Fora do event loop: uma lista grande leva dezenas de ms para decodificar e recodificar
+            codificado = await asyncio.to_thread(self._codificar, corpo, comprimido)
+        except (ValueError, OSError, OverflowError):
+            # Corpo vazio ou que não é JSON de verdade: segue como veio
+            pass
+        else:
+            headers['content-type'] = self.codec.media_type
+            headers['content-length'] = str(len(codificado))
+            corpo = codificado
+        await self.send(self.start)
+        await self.send({'type': 'http.response.body', 'body': corpo, 'more_body': False})
+
+    def _codificar(self, corpo: bytes, comprimido: bool) -> bytes:
+        # Quem pediu gzip continua recebendo gzip
+        if comprimido:
+            return gzip.compress(self.codec.encode(json.loads(gzip.decompress(corpo))), compresslevel=6)
+        return self.codec.encode(json.loads(corpo))
@@ -0,0 +1,39 @@
+from time import perf_counter
+
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+
+from observability.metrics import Counter, Gauge, Histogram
+
+REQUESTS = Counter('http_requests_total', 'Total de requisições HTTP', ('method', 'route', 'status'))
+IN_FLIGHT = Gauge('http_requests_in_flight', 'Requisições HTTP em andamento')
+LATENCY = Histogram('http_request_duration_seconds', 'Latência das requisições HTTP', ('method', 'route', 'status'))
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            IN_FLIGHT.dec()
+            route = getattr(scope.get('route'), 'path', '<unmatched>')
+            labels = dict(method=scope['method'], route=route, status=status)
+            REQUESTS.inc(**labels)
+            LATENCY.observe(elapsed, **labels)
@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+
+from orm.base import PRIMARY_PIN_COOKIE, PRIMARY_PIN_HEADER, primary_pin_key
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PrimaryPinMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._pin_seconds = None
+
+    def _pin(self) -> float:
+        if self._pin_seconds is None:
+            from settings import settings
+            config = settings()
+            self._pin_seconds = config.database_replica_pin_seconds if config.database_replica_urls else 0
+        return self._pin_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or scope['method'] in SAFE_METHODS or self._pin() <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        token = Headers(scope=scope).get(PRIMARY_PIN_HEADER)
+
+        async def send_wrapper(message: Message):
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                seconds = self._pin()
+                if token:
+                    # Também pelo token: nem todo cliente de API devolve o cookie. Com cache por processo
+                    # (memory) a fixação vale só para o worker que atendeu a escrita
+                    from cache import get_cache
+                    await asyncio.to_thread(get_cache().set, primary_pin_key(token), time.time() + seconds, seconds)
+                MutableHeaders(scope=message).append(
+                    'Set-Cookie',
+                    '{}={:.3f}; Max-Age={}; Path=/; HttpOnly; SameSite=Lax'.format(
+                        PRIMARY_PIN_COOKIE, time.time() + seconds, int(seconds) + 1),
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
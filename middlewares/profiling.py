@@ -0,0 +1,72 @@
+import asyncio
+import cProfile
+import hmac
+import threading
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+
+from observability import profiling
+
+PROFILE_HEADER = b'x-profile-token'
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._config = None
+        self._active = False
+
+    def _settings(self):
+        if self._config is None:
+            from settings import settings
+            config = settings()
+            self._config = (config.profiling_token, config.profiling_dir, config.profiling_max_profiles)
+        return self._config
+
+    def _requested_token(self, scope: Scope):
+        # Só pelo header: na query string o token vazaria para o access log e para as chaves de cache
+        for name, value in scope['headers']:
+            if name == PROFILE_HEADER:
+                return value.decode('latin-1')
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested_token(scope)
+        if requested is None:
+            await self.app(scope, receive, send)
+            return
+
+        token, directory, max_profiles = self._settings()
+        if self._active or not token or not hmac.compare_digest(requested.encode(), token.encode()):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        try:
+            await self._profile(scope, receive, send, directory, max_profiles)
+        finally:
+            self._active = False
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send, directory: str, max_profiles: int):
+        name = profiling.profile_name(scope['method'], scope['path'])
+
+        async def send_wrapper(message: Message):
+            if message['type'] == 'http.response.start':
+                MutableHeaders(scope=message).append('X-Profile-Id', name)
+            await send(message)
+
+        profile = cProfile.Profile()
+        sampler = profiling.StackSampler(threading.get_ident())
+        sampler.start()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.disable()
+            sampler.stop()
+            await asyncio.to_thread(profiling.write_profile, directory, name, profile, sampler, max_profiles)
@@ -0,0 +1,31 @@
+from time import perf_counter
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+
+from observability import sql
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        with sql.track_queries(scope['path']) as stats:
+            async def send_wrapper(message: Message):
+                if message['type'] == 'http.response.start':
+                    headers = MutableHeaders(scope=message)
+                    headers.append('Server-Timing', 'db;dur={:.3f};desc="{} queries", app;dur={:.3f}'.format(
+                        stats.total_seconds * 1000,
+                        stats.count,
+                        (perf_counter() - start) * 1000,
+                    ))
+                    headers.setdefault('Timing-Allow-Origin', '*')
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,160 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from middlewares import admission
+from middlewares.admission import AdmissionControlMiddleware, Limiter, Rejected, route_class
+
+
+class TestRouteClass(TestCase):
+    def test_classifica_rotas(self):
+        self.assertEqual(route_class('GET', '/receitas'), 'read')
+        self.assertEqual(route_class('GET', '/users/me'), 'read')
+        self.assertEqual(route_class('PUT', '/receitas/1'), 'write')
+        self.assertEqual(route_class('POST', '/receitas'), 'write')
+        self.assertEqual(route_class('POST', '/users/sign-in'), 'sign_in')
+        self.assertEqual(route_class('POST', '/receitas/imagem'), 'upload')
+
+    def test_rotas_isentas(self):
+        for method, path in (('GET', '/health'), ('GET', '/metrics'), ('GET', '/storage/a.png'),
+                             ('OPTIONS', '/receitas')):
+            self.assertIsNone(route_class(method, path))
+
+
+class TestLimiter(IsolatedAsyncioTestCase):
+    async def test_fila_cheia(self):
+        limiter = Limiter('read', 1, 1, 5)
+        await limiter.acquire()
+        na_fila = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with self.assertRaises(Rejected) as ctx:
+            await limiter.acquire()
+        self.assertEqual(ctx.exception.reason, 'queue_full')
+
+        limiter.release()
+        await na_fila
+        self.assertEqual(limiter.active, 1)
+
+    async def test_espera_demais(self):
+        limiter = Limiter('read', 1, 1, 0.01)
+        await limiter.acquire()
+
+        with self.assertRaises(Rejected) as ctx:
+            await limiter.acquire()
+        self.assertEqual(ctx.exception.reason, 'timeout')
+
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+    async def test_ordem_de_chegada(self):
+        limiter = Limiter('write', 1, 3, 5)
+        await limiter.acquire()
+        ordem = []
+
+        async def esperar(i):
+            await limiter.acquire()
+            ordem.append(i)
+            limiter.release()
+
+        tarefas = [asyncio.ensure_future(esperar(i)) for i in range(3)]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tarefas)
+
+        self.assertEqual(ordem, [0, 1, 2])
+        self.assertEqual(limiter.active, 0)
+
+    async def test_cancelamento_devolve_a_vaga(self):
+        limiter = Limiter('read', 1, 2, 5)
+        await limiter.acquire()
+        cancelada = asyncio.ensure_future(limiter.acquire())
+        seguinte = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+
+        cancelada.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        await seguinte
+
+        self.assertEqual(limiter.active, 1)
+        limiter.release()
+        self.assertEqual(limiter.active, 0)
+
+
+class TestAdmissionControlMiddleware(IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = patch('settings.settings')
+        mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        config = mock_settings.return_value
+        config.admission_enabled = True
+        config.admission_read_limit = 1
+        config.admission_read_queue = 1
+        config.admission_write_limit = 0
+        config.admission_sign_in_limit = 1
+        config.admission_sign_in_queue = 0
+        config.admission_upload_limit = 1
+        config.admission_upload_queue = 0
+        config.admission_queue_timeout_seconds = 5
+        config.admission_retry_after_seconds = 2
+
+        self.liberar = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await self.liberar.wait()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'ok'})
+
+        self.middleware = AdmissionControlMiddleware(app)
+
+    async def _request(self, method, path):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await self.middleware({'type': 'http', 'method': method, 'path': path}, None, send)
+        return messages[0]['status'], dict(messages[0]['headers'])
+
+    async def test_excesso_recebe_503(self):
+        antes = admission.REJECTED.values().get(('read', 'queue_full'), 0)
+        pedidos = [asyncio.ensure_future(self._request('GET', '/receitas')) for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        status, headers = await pedidos[2]
+        self.assertEqual(status, 503)
+        self.assertEqual(headers[b'retry-after'], b'2')
+        self.assertEqual(admission.REJECTED.values()[('read', 'queue_full')] - antes, 1)
+        self.assertEqual(admission.ACTIVE.values()[('read',)], 1)
+        self.assertEqual(admission.QUEUED.values()[('read',)], 1)
+
+        self.liberar.set()
+        self.assertEqual([(await pedido)[0] for pedido in pedidos[:2]], [200, 200])
+        self.assertEqual(admission.ACTIVE.values()[('read',)], 0)
+        self.assertEqual(admission.QUEUED.values()[('read',)], 0)
+        self.assertEqual(admission.LIMITS._callback()[('read',)], 1)
+
+    async def test_classes_sao_independentes(self):
+        login = asyncio.ensure_future(self._request('POST', '/users/sign-in'))
+        await asyncio.sleep(0.01)
+
+        self.assertEqual((await self._request('POST', '/users/sign-in'))[0], 503)
+        upload = asyncio.ensure_future(self._request('POST', '/receitas/imagem'))
+        await asyncio.sleep(0.01)
+        self.assertEqual(admission.ACTIVE.values()[('upload',)], 1)
+
+        self.liberar.set()
+        self.assertEqual([(await login)[0], (await upload)[0]], [200, 200])
+
+    async def test_limite_zero_e_rotas_isentas_nao_esperam_vaga(self):
+        leituras = [asyncio.ensure_future(self._request('GET', '/receitas')) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        livres = [asyncio.ensure_future(self._request(method, path))
+                  for method, path in (('POST', '/receitas'), ('GET', '/health'), ('GET', '/metrics'))]
+        await asyncio.sleep(0.01)
+        self.assertEqual((await self._request('GET', '/receitas'))[0], 503)
+        self.liberar.set()
+
+        self.assertEqual([(await pedido)[0] for pedido in leituras + livres], [200] * 5)
@@ -0,0 +1,114 @@
+import gzip
+from unittest import TestCase
+from unittest.mock import patch
+
+import cbor2
+import msgpack
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from starlette.responses import Response, PlainTextResponse
+
+from middlewares.content_negotiation import ContentNegotiationMiddleware, negotiate
+
+RECEITAS = [{'id': 1, 'nome': 'Bolo', 'ingredientes': [{'nome': 'Farinha', 'quantidade': '1 xícara'}]}]
+
+
+class TestNegotiate(TestCase):
+    def test_json_por_padrao(self):
+        self.assertIsNone(negotiate(''))
+        self.assertIsNone(negotiate('*/*'))
+        self.assertIsNone(negotiate('text/html, application/json'))
+        self.assertIsNone(negotiate('application/xml'))
+
+    def test_preferencia_e_q(self):
+        self.assertEqual(negotiate('application/msgpack').media_type, 'application/msgpack')
+        self.assertEqual(negotiate('application/x-msgpack, application/json').media_type, 'application/msgpack')
+        self.assertIsNone(negotiate('application/json, application/msgpack'))
+        self.assertEqual(negotiate('application/json;q=0.5, application/cbor').media_type, 'application/cbor')
+        self.assertIsNone(negotiate('application/msgpack;q=0, */*;q=0.1'))
+
+
+class TestContentNegotiationMiddleware(TestCase):
+    def setUp(self):
+        patcher = patch('settings.settings')
+        patcher.start().return_value.content_max_body_bytes = 1024
+        self.addCleanup(patcher.stop)
+
+        app = FastAPI()
+        app.add_middleware(ContentNegotiationMiddleware)
+
+        @app.get('/receitas')
+        async def get_receitas():
+            return RECEITAS
+
+        @app.get('/pagina')
+        async def get_pagina():
+            return Response(gzip.compress(b'[1,2,3]'), media_type='application/json',
+                            headers={'Content-Encoding': 'gzip'})
+
+        @app.get('/texto')
+        async def get_texto():
+            return PlainTextResponse('ok')
+
+        @app.post('/receitas')
+        async def post_receita(request: Request):
+            return {'content_type': request.headers['content-type'], 'corpo': await request.json()}
+
+        self.client = TestClient(app)
+
+    def test_json_ganha_vary(self):
+        response = self.client.get('/receitas')
+
+        self.assertEqual(response.json(), RECEITAS)
+        self.assertEqual(response.headers['vary'], 'Accept')
+
+    def test_responde_msgpack(self):
+        response = self.client.get('/receitas', headers={'Accept': 'application/msgpack'})
+
+        self.assertEqual(response.headers['content-type'], 'application/msgpack')
+        self.assertEqual(int(response.headers['content-length']), len(response.content))
+        self.assertEqual(msgpack.unpackb(response.content), RECEITAS)
+        self.assertEqual(response.headers['vary'], 'Accept')
+
+    def test_responde_cbor(self):
+        response = self.client.get('/receitas', headers={'Accept': 'application/cbor'})
+
+        self.assertEqual(response.headers['content-type'], 'application/cbor')
+        self.assertEqual(cbor2.loads(response.content), RECEITAS)
+
+    def test_transcodifica_corpo_comprimido_mantendo_o_gzip(self):
+        response = self.client.get('/pagina', headers={'Accept': 'application/msgpack', 'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(msgpack.unpackb(response.content), [1, 2, 3])
+
+    def test_nao_mexe_em_outros_tipos(self):
+        response = self.client.get('/texto', headers={'Accept': 'application/msgpack'})
+
+        self.assertEqual(response.text, 'ok')
+        self.assertTrue(response.headers['content-type'].startswith('text/plain'))
+
+    def test_aceita_corpo_msgpack_e_cbor(self):
+        for content_type, corpo in (('application/msgpack', msgpack.packb(RECEITAS[0])),
+                                    ('application/cbor', cbor2.dumps(RECEITAS[0]))):
+            with self.subTest(content_type=content_type):
+                response = self.client.post('/receitas', content=corpo, headers={'Content-Type': content_type})
+
+                self.assertEqual(response.json(), {'content_type': 'application/json', 'corpo': RECEITAS[0]})
+
+    def test_corpo_invalido(self):
+        response = self.client.post('/receitas', content=b'\xc1', headers={'Content-Type': 'application/msgpack'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_corpo_grande_demais(self):
+        corpo = msgpack.packb({'nome': 'x' * 2048})
+
+        response = self.client.post('/receitas', content=corpo, headers={'Content-Type': 'application/msgpack'})
+        self.assertEqual(response.status_code, 413)
+
+        # Sem Content-Length (chunked), o limite vale para o que já foi lido
+        response = self.client.post('/receitas', content=iter([corpo[:1000], corpo[1000:]]),
+                                    headers={'Content-Type': 'application/msgpack'})
+        self.assertEqual(response.status_code, 413)
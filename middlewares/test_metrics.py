@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from middlewares import metrics as metrics_middleware
+
+
+class TestMetricsMiddleware(TestCase):
+    def setUp(self):
+        app = FastAPI()
+        app.add_middleware(metrics_middleware.MetricsMiddleware)
+
+        @app.get('/receitas/{id_receita}')
+        async def get_receita(id_receita: int):
+            return {'id': id_receita}
+
+        self.client = TestClient(app)
+
+    def test_agrupa_por_template_da_rota(self):
+        antes = metrics_middleware.REQUESTS.values().get(('GET', '/receitas/{id_receita}', '200'), 0)
+
+        self.client.get('/receitas/1')
+        self.client.get('/receitas/2')
+
+        depois = metrics_middleware.REQUESTS.values()[('GET', '/receitas/{id_receita}', '200')]
+        self.assertEqual(depois - antes, 2)
+        self.assertIn(('GET', '/receitas/{id_receita}', '200'), metrics_middleware.LATENCY.values())
+        self.assertEqual(metrics_middleware.IN_FLIGHT.values().get((), 0), 0)
+
+    def test_rota_inexistente(self):
+        self.client.get('/nao-existe')
+
+        self.assertIn(('GET', '<unmatched>', '404'), metrics_middleware.REQUESTS.values())
@@ -0,0 +1,71 @@
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from middlewares.primary_pin import PrimaryPinMiddleware
+from cache import Cache, MemoryBackend
+from orm.base import PRIMARY_PIN_COOKIE, primary_pin_key
+
+
+class TestPrimaryPinMiddleware(TestCase):
+    def _client(self, replicas):
+        patcher = patch('settings.settings')
+        mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_settings.return_value.database_replica_urls = replicas
+        mock_settings.return_value.database_replica_pin_seconds = 5
+        cache_patcher = patch('cache.get_cache', return_value=Cache(MemoryBackend()))
+        self.cache = cache_patcher.start()()
+        self.addCleanup(cache_patcher.stop)
+
+        app = FastAPI()
+        app.add_middleware(PrimaryPinMiddleware)
+
+        @app.get('/receitas')
+        async def get_receitas():
+            return []
+
+        @app.post('/receitas')
+        async def post_receita():
+            return {}
+
+        @app.delete('/receitas/{id_receita}')
+        async def delete_receita(id_receita: int):
+            return Response(status_code=404 if id_receita == 404 else 204)
+
+        return TestClient(app)
+
+    def test_escrita_fixa_cliente_no_primario(self):
+        client = self._client(['sqlite://'])
+
+        response = client.post('/receitas')
+
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+    def test_escrita_autenticada_fixa_o_token(self):
+        client = self._client(['sqlite://'])
+
+        client.get('/receitas', headers={'X-Authorization': 'Bearer abc'})
+        self.assertIsNone(self.cache.get(primary_pin_key('Bearer abc')))
+
+        client.post('/receitas', headers={'X-Authorization': 'Bearer abc'})
+        self.assertGreater(self.cache.get(primary_pin_key('Bearer abc')), time.time())
+
+    def test_escrita_com_resposta_direta_tambem_fixa(self):
+        client = self._client(['sqlite://'])
+
+        self.assertIn(PRIMARY_PIN_COOKIE, client.delete('/receitas/1').cookies)
+        self.assertNotIn(PRIMARY_PIN_COOKIE, self._client(['sqlite://']).delete('/receitas/404').cookies)
+
+    def test_leitura_nao_fixa(self):
+        client = self._client(['sqlite://'])
+
+        self.assertNotIn(PRIMARY_PIN_COOKIE, client.get('/receitas').cookies)
+
+    def test_sem_replicas_nao_fixa(self):
+        client = self._client([])
+
+        self.assertNotIn(PRIMARY_PIN_COOKIE, client.post('/receitas').cookies)
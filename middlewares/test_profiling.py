@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from middlewares.profiling import ProfilingMiddleware
+
+
+class TestProfilingMiddleware(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch('settings.settings')
+        mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_settings.return_value.profiling_token = 'segredo'
+        mock_settings.return_value.profiling_dir = self.tmp.name
+        mock_settings.return_value.profiling_max_profiles = 2
+
+        app = FastAPI()
+        app.add_middleware(ProfilingMiddleware)
+
+        @app.get('/receitas')
+        async def get_receitas():
+            fim = time.perf_counter() + 0.01
+            while time.perf_counter() < fim:
+                pass
+            return []
+
+        @app.get('/sincrono')
+        def get_sincrono():
+            fim = time.perf_counter() + 0.05
+            while time.perf_counter() < fim:
+                pass
+            return []
+
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sem_token_nao_perfila(self):
+        response = self.client.get('/receitas')
+
+        self.assertNotIn('x-profile-id', response.headers)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_token_invalido_nao_perfila(self):
+        response = self.client.get('/receitas', headers={'X-Profile-Token': 'errado'})
+
+        self.assertNotIn('x-profile-id', response.headers)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_perfila_com_header(self):
+        response = self.client.get('/receitas', headers={'X-Profile-Token': 'segredo'})
+
+        name = response.headers['x-profile-id']
+        self.assertEqual(response.json(), [])
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)),
+            [name + '.collapsed', name + '.prof', name + '.txt'],
+        )
+        with open(os.path.join(self.tmp.name, name + '.txt')) as f:
+            self.assertIn('get_receitas', f.read())
+
+    def test_query_string_nao_perfila(self):
+        response = self.client.get('/receitas?profile_token=segredo')
+
+        self.assertNotIn('x-profile-id', response.headers)
+
+    def test_amostra_as_threads_do_pool(self):
+        response = self.client.get('/sincrono', headers={'X-Profile-Token': 'segredo'})
+
+        name = response.headers['x-profile-id']
+        with open(os.path.join(self.tmp.name, name + '.collapsed')) as f:
+            self.assertIn('get_sincrono', f.read())
+        with open(os.path.join(self.tmp.name, name + '.txt')) as f:
+            self.assertIn('get_sincrono', f.read().split('cProfile')[0])
+
+    def test_mantem_apenas_os_perfis_mais_recentes(self):
+        names = [
+            self.client.get('/receitas', headers={'X-Profile-Token': 'segredo'}).headers['x-profile-id']
+            for _ in range(3)
+        ]
+
+        remaining = {entry.rsplit('.', 1)[0] for entry in os.listdir(self.tmp.name)}
+        self.assertEqual(len(remaining), 2)
+        self.assertNotIn(names[0], remaining)
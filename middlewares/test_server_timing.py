@@ -0,0 +1,29 @@
+from unittest import TestCase
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from middlewares.server_timing import ServerTimingMiddleware
+from observability import sql
+
+
+class TestServerTimingMiddleware(TestCase):
+    def test_adiciona_header_com_totais_do_banco(self):
+        engine = create_engine('sqlite://')
+        sql.install(engine, slow_query_ms=60000)
+
+        app = FastAPI()
+        app.add_middleware(ServerTimingMiddleware)
+
+        @app.get('/receitas')
+        async def get_receitas():
+            with engine.connect() as conn:
+                conn.execute(text('select 1'))
+                conn.execute(text('select 2'))
+            return []
+
+        response = TestClient(app).get('/receitas')
+
+        self.assertRegex(response.headers['server-timing'], r'^db;dur=[0-9.]+;desc="2 queries", app;dur=[0-9.]+$')
+        self.assertEqual(response.headers['timing-allow-origin'], '*')
@@ -0,0 +1,46 @@
+import argparse
+import sys
+
+from sqlalchemy.orm import Session
+
+from repositories import user_repository
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Cria os índices únicos em caixa baixa de username e e-mail, depois de verificar duplicatas')
+    parser.add_argument('--database-url', help='Padrão: DATABASE_URL das configurações')
+    parser.add_argument('--rename-duplicates', action='store_true',
+                        help='Mantém a conta mais antiga de cada grupo e acrescenta o id ao username/e-mail das demais')
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import create_engine
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from orm.db import EngineSingleton
+        engine = EngineSingleton.get_engine(echo=False)
+
+    with Session(engine) as session:
+        duplicates = user_repository.case_duplicates(session)
+        groups = [(column, group) for column, column_groups in duplicates.items() for group in column_groups]
+        for column, group in groups:
+            print('{} duplicado: {}'.format(column, ', '.join('#{} {}'.format(*user) for user in group)))
+
+        if groups and not args.rename_duplicates:
+            print('{} grupo(s) de contas que só diferem na caixa; resolva-os ou rode com --rename-duplicates'.format(
+                len(groups)), file=sys.stderr)
+            return 1
+
+        if groups:
+            for user_id, column, old, new in user_repository.rename_case_duplicates(session):
+                print('#{} {}: {} -> {}'.format(user_id, column, old, new))
+
+        user_repository.create_case_insensitive_indexes(session)
+    print('Índices {} criados'.format(', '.join(user_repository.CASE_INSENSITIVE_INDEXES.values())))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
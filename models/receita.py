@@ -20,6 +20,10 @@ class Receita(BaseModel):
     imagem: str
 
 
+CAMPOS_RECEITA = tuple(Receita.model_fields)
+RESUMO_RECEITA = ('id', 'nome', 'tipo', 'criador', 'imagem')
+
+
 class CriarReceita(BaseModel):
     nome: str
     tipo: str
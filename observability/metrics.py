@@ -0,0 +1,185 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+REGISTRY: List['_Metric'] = []
+
+
+class _ThreadShards:
+    """Each thread writes only to its own dict, so updates need no lock.
+    The lock is taken only when a thread registers its shard for the first time."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def items(self) -> Iterable[Tuple[LabelValues, object]]:
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            while True:
+                try:
+                    items = list(shard.items())
+                    break
+                except RuntimeError:
+                    continue
+            yield from items
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: Sequence[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (v.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, v in pairs)
+        return '{' + ','.join('{}="{}"'.format(k, v) for (k, _), v in zip(pairs, escaped)) + '}'
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, Sequence[Tuple[str, str]], float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = ['# HELP {} {}'.format(self.name, self.description), '# TYPE {} {}'.format(self.name, self.type)]
+        for suffix, values, extra, value in self.samples():
+            lines.append('{}{}{} {}'.format(self.name, suffix, self._format_labels(values, extra), _format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._shards = _ThreadShards()
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shards.get()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for key, value in self._shards.items():
+            totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def samples(self):
+        for key, value in sorted(self.values().items()):
+            yield '', key, (), value
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackGauge(_Metric):
+    type = 'gauge'
+
+    def __init__(self, name: str, description: str, callback: Callable[[], Dict[LabelValues, float]],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._callback = callback
+
+    def samples(self):
+        for key, value in sorted(self._callback().items()):
+            yield '', key, (), value
+
+
+class CallbackCounter(CallbackGauge):
+    type = 'counter'
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _ThreadShards()
+
+    def observe(self, value: float, **labels):
+        shard = self._shards.get()
+        key = self._key(labels)
+        data = shard.get(key)
+        if data is None:
+            data = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        data[bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    def values(self) -> Dict[LabelValues, List[float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for key, data in self._shards.items():
+            total = totals.get(key)
+            if total is None:
+                totals[key] = list(data)
+            else:
+                for i, value in enumerate(data):
+                    total[i] += value
+        return totals
+
+    def samples(self):
+        for key, data in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), data):
+                cumulative += count
+                yield '_bucket', key, (('le', _format_value(bound)),), cumulative
+            yield '_sum', key, (), data[-1]
+            yield '_count', key, (), cumulative
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(perf_counter() - start, **labels)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render() -> str:
+    rendered = []
+    for metric in REGISTRY:
+        try:
+            rendered.append(metric.render())
+        except Exception:
+            continue
+    return '\n'.join(rendered) + '\n'
@@ -0,0 +1,112 @@
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+# Quadro mais interno de uma thread parada esperando trabalho (pool ocioso): não entra na amostra
+_IDLE_FILES = ('threading.py', 'queue.py', 'selectors.py')
+
+
+def _idle(frame) -> bool:
+    filename = os.path.basename(frame.f_code.co_filename)
+    return filename in _IDLE_FILES or (filename == 'thread.py' and frame.f_code.co_name == '_worker')
+
+
+class StackSampler:
+    # Amostra todas as threads, não só a do event loop: as consultas e a serialização rodam no threadpool
+    # (asyncio.to_thread, rotas síncronas). Requisições simultâneas de outros clientes também aparecem
+    def __init__(self, loop_thread_id: int, interval: float = 0.001):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (thread_id != self.loop_thread_id and _idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename),
+                                                     code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in self.stacks.most_common())
+
+    def functions(self, limit: int = 60) -> str:
+        # Amostras em que cada função estava na pilha, somando todas as threads
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            for function in set(stack.split(';')[1:]):
+                inclusive[function] += count
+        total = sum(self.stacks.values()) or 1
+        return ''.join('{:8d} {:6.1%}  {}\n'.format(count, count / total, function)
+                       for function, count in inclusive.most_common(limit))
+
+
+def write_profile(directory: str, name: str, profile, sampler: StackSampler, max_profiles: int):
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, name)
+
+    profile.dump_stats(base + '.prof')
+
+    report = io.StringIO()
+    stats = pstats.Stats(profile, stream=report)
+    stats.sort_stats('cumulative').print_stats(60)
+    stats.print_callees(30)
+    with open(base + '.txt', 'w') as f:
+        f.write('Amostras por função, todas as threads ({} amostras)\n\n'.format(sum(sampler.stacks.values())))
+        f.write(sampler.functions())
+        f.write('\ncProfile, só a thread do event loop\n\n')
+        f.write(report.getvalue())
+
+    with open(base + '.collapsed', 'w') as f:
+        f.write(sampler.collapsed())
+
+    _prune(directory, max_profiles)
+
+
+def _prune(directory: str, max_profiles: int):
+    profiles = {}
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            name = entry.name.rsplit('.', 1)[0]
+            profiles.setdefault(name, []).append(entry)
+
+    if len(profiles) <= max_profiles:
+        return
+
+    by_age = sorted(profiles.items(), key=lambda item: min(e.stat().st_mtime for e in item[1]))
+    for _, entries in by_age[:len(profiles) - max_profiles]:
+        for entry in entries:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def profile_name(method: str, path: str) -> str:
+    slug = ''.join(c if c.isalnum() else '-' for c in path.strip('/')) or 'root'
+    return '{}-{}-{}-{}'.format(time.strftime('%Y%m%dT%H%M%S'), os.urandom(3).hex(), method.lower(), slug[:60])
@@ -0,0 +1,80 @@
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import Engine, event
+
+from observability.metrics import Histogram
+
+logger = logging.getLogger('panela_magica.sql')
+
+QUERY_SECONDS = Histogram('db_query_duration_seconds', 'Duração das consultas SQL')
+
+
+class QueryStats:
+    __slots__ = ('path', 'count', 'total_seconds', 'slowest_seconds', 'slowest_statement')
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_seconds += elapsed
+        if elapsed > self.slowest_seconds:
+            self.slowest_seconds = elapsed
+            self.slowest_statement = statement
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar('query_stats', default=None)
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries(path: str = None):
+    stats = QueryStats(path)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def install(engine: Engine, slow_query_ms: float):
+    slow_query_seconds = slow_query_ms / 1000
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # No contexto da execução, não em conn.info: after_cursor_execute não roda quando a consulta falha
+        if context is not None:
+            context._query_start = perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_query_start', None)
+        if start is None:
+            return
+        elapsed = perf_counter() - start
+        QUERY_SECONDS.observe(elapsed)
+
+        stats = _current.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+        if elapsed >= slow_query_seconds:
+            logger.warning(json.dumps({
+                'event': 'slow_query',
+                'duration_ms': round(elapsed * 1000, 3),
+                'path': stats.path if stats is not None else None,
+                'statement': statement,
+                'executemany': executemany,
+            }, ensure_ascii=False))
@@ -0,0 +1,89 @@
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from observability import metrics
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        registry = patch.object(metrics, 'REGISTRY', [])
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def test_counter(self):
+        counter = metrics.Counter('teste_total', 'Teste', ('rota',))
+        counter.inc(rota='/a')
+        counter.inc(2, rota='/a')
+        counter.inc(rota='/b')
+
+        self.assertEqual(counter.values(), {('/a',): 3, ('/b',): 1})
+
+    def test_counter_soma_threads(self):
+        counter = metrics.Counter('teste_total', 'Teste')
+
+        def worker():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(counter.values(), {(): 8000})
+
+    def test_gauge(self):
+        gauge = metrics.Gauge('teste', 'Teste')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        self.assertEqual(gauge.values(), {(): 1})
+
+    def test_histogram(self):
+        histogram = metrics.Histogram('teste_seconds', 'Teste', ('rota',), buckets=(0.1, 1))
+        histogram.observe(0.05, rota='/a')
+        histogram.observe(0.5, rota='/a')
+        histogram.observe(5, rota='/a')
+
+        rendered = histogram.render()
+
+        self.assertIn('teste_seconds_bucket{rota="/a",le="0.1"} 1', rendered)
+        self.assertIn('teste_seconds_bucket{rota="/a",le="1"} 2', rendered)
+        self.assertIn('teste_seconds_bucket{rota="/a",le="+Inf"} 3', rendered)
+        self.assertIn('teste_seconds_sum{rota="/a"} 5.55', rendered)
+        self.assertIn('teste_seconds_count{rota="/a"} 3', rendered)
+
+    def test_timed(self):
+        histogram = metrics.Histogram('teste_seconds', 'Teste')
+
+        with metrics.timed(histogram):
+            pass
+
+        self.assertEqual(histogram.values()[()][-2], 0)
+        self.assertEqual(sum(histogram.values()[()][:-1]), 1)
+
+    def test_callback_gauge(self):
+        metrics.CallbackGauge('teste', 'Teste', lambda: {('a',): 2}, ('estado',))
+
+        self.assertIn('teste{estado="a"} 2', metrics.render())
+
+    def test_render_ignora_callback_com_erro(self):
+        def callback():
+            raise Exception('Erro')
+
+        metrics.CallbackGauge('quebrado', 'Teste', callback)
+        metrics.Counter('teste_total', 'Teste').inc()
+
+        rendered = metrics.render()
+
+        self.assertNotIn('quebrado', rendered)
+        self.assertIn('# TYPE teste_total counter\nteste_total 1', rendered)
+
+    def test_escapa_labels(self):
+        counter = metrics.Counter('teste_total', 'Teste', ('rota',))
+        counter.inc(rota='/a"b')
+
+        self.assertIn('teste_total{rota="/a\\"b"} 1', counter.render())
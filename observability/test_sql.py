@@ -0,0 +1,61 @@
+import json
+from unittest import TestCase
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from observability import sql
+
+
+class TestSqlInstrumentation(TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        sql.install(self.engine, slow_query_ms=0)
+
+    def test_registra_consultas_no_contexto(self):
+        with sql.track_queries('/receitas') as stats:
+            with self.engine.connect() as conn:
+                conn.execute(text('select 1'))
+                conn.execute(text('select 2'))
+
+        self.assertEqual(stats.count, 2)
+        self.assertGreater(stats.total_seconds, 0)
+        self.assertIn(stats.slowest_statement, ('select 1', 'select 2'))
+        self.assertIsNone(sql.current())
+
+    def test_consulta_com_erro_nao_deixa_estado_na_conexao(self):
+        with sql.track_queries('/receitas') as stats:
+            with self.engine.connect() as conn:
+                with self.assertRaises(OperationalError):
+                    conn.execute(text('select * from tabela_inexistente'))
+                conn.execute(text('select 1'))
+
+                self.assertNotIn('query_start', conn.info)
+
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.slowest_statement, 'select 1')
+
+    def test_fora_de_requisicao_nao_registra(self):
+        with self.engine.connect() as conn:
+            conn.execute(text('select 1'))
+
+        self.assertIsNone(sql.current())
+
+    def test_log_de_consulta_lenta(self):
+        with self.assertLogs('panela_magica.sql', level='WARNING') as logs:
+            with sql.track_queries('/receitas'):
+                with self.engine.connect() as conn:
+                    conn.execute(text('select 1'))
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['event'], 'slow_query')
+        self.assertEqual(entry['path'], '/receitas')
+        self.assertEqual(entry['statement'], 'select 1')
+
+    def test_consulta_rapida_nao_gera_log(self):
+        engine = create_engine('sqlite://')
+        sql.install(engine, slow_query_ms=60000)
+
+        with self.assertNoLogs('panela_magica.sql', level='WARNING'):
+            with engine.connect() as conn:
+                conn.execute(text('select 1'))
@@ -1,3 +1,6 @@
 from .base import *
 from .receita import *
 from .user import *
+from .job import *
+from .invalidation import *
+from .idempotency import *
@@ -1,16 +1,134 @@
-from typing import Generator, Annotated
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Generator, Annotated, Iterator
 
-from fastapi import Depends
+from fastapi import Depends, Request
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError
 from sqlalchemy.orm import Session, declarative_base
 
 from orm.db import EngineSingleton
 
+logger = logging.getLogger(__name__)
+
 BaseOrm = declarative_base()
 
+PRIMARY_PIN_COOKIE = 'pm_primary_until'
+PRIMARY_PIN_HEADER = 'x-authorization'
+
+
+def primary_pin_key(token: str) -> str:
+    import hashlib
+
+    return 'primary-pin:' + hashlib.sha256(token.encode('utf-8')).hexdigest()
 
-def get_db(echo=True) -> Generator:
+
+def utc_timestamp(value: datetime) -> int:
+    # As colunas DateTime guardam UTC sem fuso (datetime.utcnow); nunca interpretar como hora local
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def get_db(echo=None) -> Generator:
     with Session(EngineSingleton.get_engine(echo=echo), autoflush=True) as session:
         yield session
 
 
+def pinned_to_primary(request: Request) -> bool:
+    import time
+    from cache import get_cache
+
+    try:
+        if float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+
+    # Clientes que não guardam cookies (X-Authorization) são fixados pelo token, no cache compartilhado
+    token = request.headers.get(PRIMARY_PIN_HEADER)
+    if not token:
+        return False
+    pinned_until = get_cache().get(primary_pin_key(token))
+    return isinstance(pinned_until, (int, float)) and pinned_until > time.time()
+
+
+class ReplicaSession(Session):
+    # Se a réplica cair no meio da requisição, ela sai do rodízio e a leitura é repetida no primário
+    def __init__(self, replica, **kwargs):
+        super().__init__(**kwargs)
+        self._replica = replica
+
+    def _on_primary_on_failure(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except (OperationalError, InterfaceError):
+            if self._replica is None:
+                raise
+            EngineSingleton.mark_replica_down(self._replica)
+            self._replica = None
+            try:
+                self.rollback()
+            except DBAPIError:
+                pass
+            self.bind = EngineSingleton.get_engine()
+            return method(*args, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._on_primary_on_failure(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._on_primary_on_failure(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._on_primary_on_failure(super().scalars, *args, **kwargs)
+
+
+@contextmanager
+def read_session(primary: bool = False) -> Iterator[Session]:
+    # Leitura fora da requisição (cargas coalescidas): réplica em rodízio com fallback, ou o primário
+    if not primary:
+        for engine in EngineSingleton.replica_candidates():
+            try:
+                connection = engine.connect()
+            except DBAPIError:
+                EngineSingleton.mark_replica_down(engine)
+                continue
+
+            try:
+                with ReplicaSession(engine, bind=connection, autoflush=True) as session:
+                    yield session
+            finally:
+                connection.close()
+            return
+
+    with Session(EngineSingleton.get_engine(), autoflush=True) as session:
+        yield session
+
+
+def get_read_db(request: Request) -> Generator:
+    primary = not EngineSingleton.replica_candidates() or pinned_to_primary(request)
+    with read_session(primary) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
+
+
+def create_schema(engine=None):
+    engine = engine if engine is not None else EngineSingleton.get_engine()
+    BaseOrm.metadata.create_all(engine)
+    for table in BaseOrm.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    from repositories import user_repository
+
+    # Sem os índices em lower() o login faz varredura sequencial em users; IF NOT EXISTS torna isso um no-op depois
+    # da primeira subida, e só falha se ainda houver contas que diferem apenas na caixa
+    with Session(engine) as session:
+        try:
+            user_repository.create_case_insensitive_indexes(session)
+        except IntegrityError:
+            logger.error('Índices %s não criados: há usernames/e-mails que só diferem na caixa; rode '
+                         'migrate_user_indexes.py --rename-duplicates', ', '.join(
+                             user_repository.CASE_INSENSITIVE_INDEXES.values()))
@@ -1,23 +1,153 @@
-from typing import Optional
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
 
-from sqlalchemy import create_engine, Engine
+from sqlalchemy import create_engine, text, Engine
+from sqlalchemy.exc import DBAPIError
 
+from observability import sql
+from observability.metrics import CallbackGauge
 from settings import settings
 
+logger = logging.getLogger(__name__)
+
+
+def _pool_stats(engine: Engine) -> dict:
+    stats = {}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        fn = getattr(engine.pool, name, None)
+        if callable(fn):
+            stats[name] = fn()
+    return stats
+
 
 class EngineSingleton:
     _engine: Optional[Engine] = None
+    _replicas: Optional[List[Engine]] = None
+    _replica_down_until: Dict[int, float] = {}
+    _replica_cursor = itertools.count()
 
     @classmethod
-    def get_engine(cls, echo=True) -> Engine:
+    def get_engine(cls, echo=None) -> Engine:
         if cls._engine is None:
-            cls._engine = create_engine(settings().database_url, echo=echo)
+            config = settings()
+            cls._engine = create_engine(config.database_url, echo=config.database_echo if echo is None else echo)
+            sql.install(cls._engine, config.slow_query_ms)
         return cls._engine
 
+    @classmethod
+    def get_replica_engines(cls) -> List[Engine]:
+        if cls._replicas is None:
+            config = settings()
+            cls._replicas = []
+            for url in config.database_replica_urls:
+                engine = create_engine(url, echo=config.database_echo)
+                sql.install(engine, config.slow_query_ms)
+                cls._replicas.append(engine)
+        return cls._replicas
+
+    @classmethod
+    def replica_candidates(cls) -> List[Engine]:
+        replicas = cls.get_replica_engines()
+        if not replicas:
+            return []
+
+        now = time.monotonic()
+        start = next(cls._replica_cursor) % len(replicas)
+        ordered = replicas[start:] + replicas[:start]
+        return [engine for engine in ordered if cls._replica_down_until.get(id(engine), 0) <= now]
+
+    @classmethod
+    def mark_replica_down(cls, engine: Engine):
+        cls._replica_down_until[id(engine)] = time.monotonic() + settings().database_replica_retry_seconds
+
+    @classmethod
+    def mark_replica_up(cls, engine: Engine):
+        cls._replica_down_until.pop(id(engine), None)
+
+    @classmethod
+    def check_replicas(cls) -> int:
+        healthy = 0
+        for engine in cls.get_replica_engines():
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+            except DBAPIError as e:
+                if cls._replica_down_until.get(id(engine), 0) <= time.monotonic():
+                    logger.warning('Réplica %s fora do ar: %s', engine.url.render_as_string(), e)
+                cls.mark_replica_down(engine)
+                continue
+            cls.mark_replica_up(engine)
+            healthy += 1
+        return healthy
+
+    @classmethod
+    def pool_stats(cls) -> dict:
+        stats = {}
+        if cls._engine is not None:
+            stats['primary'] = _pool_stats(cls._engine)
+        for i, engine in enumerate(cls._replicas or []):
+            stats['replica-{}'.format(i)] = _pool_stats(engine)
+        return stats
+
     @classmethod
     def close_engine(cls):
+        closed = False
+        for engine in cls._replicas or []:
+            engine.dispose()
+        if cls._replicas:
+            closed = True
+        cls._replicas = None
+        cls._replica_down_until = {}
+
         if cls._engine is not None:
             cls._engine.dispose()
             cls._engine = None
-            return True
-        return False
+            closed = True
+        return closed
+
+
+class ReplicaHealthCheck:
+    # Testa as réplicas em segundo plano: a que cai sai do rodízio sem esperar uma requisição falhar, e a que
+    # volta entra de novo antes do fim de database_replica_retry_seconds
+    def __init__(self):
+        self._interval = settings().database_replica_health_interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._interval > 0 and settings().database_replica_urls:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(EngineSingleton.check_replicas)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Falha ao verificar as réplicas')
+            await asyncio.sleep(self._interval)
+
+
+DB_POOL = CallbackGauge(
+    'db_pool_connections',
+    'Conexões do pool do banco de dados por estado',
+    lambda: {
+        (pool, state): value
+        for pool, states in EngineSingleton.pool_stats().items()
+        for state, value in states.items()
+    },
+    ('pool', 'state'),
+)
@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, String, DateTime, LargeBinary, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from orm.base import BaseOrm
+
+
+class IdempotencyKey(BaseOrm):
+    __tablename__ = 'idempotency_keys'
+    # A restrição única é o "insere se não existir" atômico entre workers e nós
+    __table_args__ = (UniqueConstraint('user_id', 'route', 'key', name='uq_idempotency_keys_user_route_key'),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer)
+    route: Mapped[str] = mapped_column(String(100))
+    key: Mapped[str] = mapped_column(String(255))
+    fingerprint: Mapped[str] = mapped_column(String(64))
+    # 0 marca uma execução ainda em andamento
+    status_code: Mapped[int] = mapped_column(Integer, default=0)
+    body: Mapped[bytes] = mapped_column(LargeBinary, default=b'')
+    media_type: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.route} {self.user_id} - {self.status_code}>'
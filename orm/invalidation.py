@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from orm.base import BaseOrm
+
+
+class Invalidation(BaseOrm):
+    __tablename__ = 'invalidations'
+    # As versões nunca podem voltar para trás, nem depois que as linhas mais novas são apagadas
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(50))
+    entity_id: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<Invalidation {self.entity} {self.entity_id} - {self.id}>'
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, String, Text, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from orm.base import BaseOrm
+
+
+class Job(BaseOrm):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_status_kind_run_at', 'status', 'kind', 'run_at'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(100))
+    payload: Mapped[str] = mapped_column(Text, default='{}')
+    status: Mapped[str] = mapped_column(String(20), default='pending')
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=5)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    run_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.kind} - {self.id}>'
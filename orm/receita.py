@@ -1,11 +1,11 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import List
 
 from sqlalchemy import ForeignKey, String, Integer, Text, DateTime
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 
 import models
-from orm.base import BaseOrm
+from orm.base import BaseOrm, utc_timestamp
 from orm.user import User
 
 
@@ -31,7 +31,7 @@ class Receita(BaseOrm):
             tipo=self.tipo,
             ingredientes=[ingrediente.to_dto() for ingrediente in self.ingredientes],
             modo_de_preparo=self.modo_de_preparo,
-            data_de_criacao=int(self.data_de_criacao.astimezone(timezone.utc).timestamp()),
+            data_de_criacao=utc_timestamp(self.data_de_criacao),
             criador=models.CriadorReceita.from_orm(self.criador),
             imagem=self.imagem
         )
@@ -42,7 +42,8 @@ class Ingrediente(BaseOrm):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     nome: Mapped[str] = mapped_column(String(100))
     quantidade: Mapped[str] = mapped_column(String(50))
-    receita_id: Mapped[int] = mapped_column(Integer, ForeignKey('receitas.id', ondelete='CASCADE', onupdate='CASCADE'))
+    receita_id: Mapped[int] = mapped_column(Integer, ForeignKey('receitas.id', ondelete='CASCADE', onupdate='CASCADE'),
+                                            index=True)
 
     def __repr__(self):
         return f'<Ingrediente {self.nome} - {self.id}>'
@@ -53,3 +54,14 @@ class Ingrediente(BaseOrm):
             nome=self.nome,
             quantidade=self.quantidade
         )
+
+
+class ReceitaDocumento(BaseOrm):
+    __tablename__ = 'receitas_documentos'
+    receita_id: Mapped[int] = mapped_column(Integer, ForeignKey('receitas.id', ondelete='CASCADE', onupdate='CASCADE'),
+                                            primary_key=True)
+    documento: Mapped[str] = mapped_column(Text)
+    atualizado_em: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReceitaDocumento {self.receita_id}>'
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import tempfile
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import Mock, patch
+
+from sqlalchemy import text
+
+from cache import Cache, MemoryBackend
+from orm.base import get_read_db, primary_pin_key, PRIMARY_PIN_COOKIE
+from orm.db import EngineSingleton, ReplicaHealthCheck
+
+
+def _request(cookies=None, headers=None):
+    request = Mock()
+    request.cookies = cookies or {}
+    request.headers = headers or {}
+    return request
+
+
+class TestReadReplicaRouting(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.primary_url = 'sqlite:///{}'.format(os.path.join(self.tmp.name, 'primary.sqlite'))
+        self.replica_url = 'sqlite:///{}'.format(os.path.join(self.tmp.name, 'replica.sqlite'))
+        self.broken_url = 'sqlite:///{}'.format(os.path.join(self.tmp.name, 'nao-existe', 'replica.sqlite'))
+
+        patcher = patch('orm.db.settings')
+        self.mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_settings.return_value.database_url = self.primary_url
+        self.mock_settings.return_value.database_echo = False
+        self.mock_settings.return_value.slow_query_ms = 60000
+        self.mock_settings.return_value.database_replica_retry_seconds = 30
+        self.mock_settings.return_value.database_replica_urls = [self.replica_url]
+
+        self.mock_settings.return_value.database_replica_health_interval_seconds = 0.01
+
+        cache_patcher = patch('cache.get_cache', return_value=Cache(MemoryBackend()))
+        self.cache = cache_patcher.start()()
+        self.addCleanup(cache_patcher.stop)
+
+        EngineSingleton.close_engine()
+        self.addCleanup(EngineSingleton.close_engine)
+
+    def _database_used(self, request):
+        dependency = get_read_db(request)
+        session = next(dependency)
+        try:
+            return session.execute(text('pragma database_list')).all()[0][2]
+        finally:
+            dependency.close()
+
+    def test_sem_replicas_usa_primario(self):
+        self.mock_settings.return_value.database_replica_urls = []
+
+        self.assertTrue(self._database_used(_request()).endswith('primary.sqlite'))
+
+    def test_leitura_vai_para_replica(self):
+        self.assertTrue(self._database_used(_request()).endswith('replica.sqlite'))
+
+    def test_cookie_de_escrita_recente_fixa_no_primario(self):
+        request = _request({PRIMARY_PIN_COOKIE: str(time.time() + 5)})
+
+        self.assertTrue(self._database_used(request).endswith('primary.sqlite'))
+
+    def test_cookie_expirado_volta_para_replica(self):
+        request = _request({PRIMARY_PIN_COOKIE: str(time.time() - 1)})
+
+        self.assertTrue(self._database_used(request).endswith('replica.sqlite'))
+
+    def test_replica_indisponivel_cai_para_o_primario_e_fica_fora(self):
+        self.mock_settings.return_value.database_replica_urls = [self.broken_url]
+
+        self.assertTrue(self._database_used(_request()).endswith('primary.sqlite'))
+        self.assertEqual(EngineSingleton.replica_candidates(), [])
+
+    def test_replica_indisponivel_cai_para_a_proxima_replica(self):
+        self.mock_settings.return_value.database_replica_urls = [self.broken_url, self.replica_url]
+
+        for _ in range(3):
+            self.assertTrue(self._database_used(_request()).endswith('replica.sqlite'))
+
+    def test_token_de_escrita_recente_fixa_no_primario(self):
+        self.cache.set(primary_pin_key('Bearer abc'), time.time() + 5)
+
+        self.assertTrue(self._database_used(_request(headers={'x-authorization': 'Bearer abc'})).endswith(
+            'primary.sqlite'))
+        self.assertTrue(self._database_used(_request(headers={'x-authorization': 'Bearer outro'})).endswith(
+            'replica.sqlite'))
+
+    def test_replica_que_falha_na_consulta_cai_para_o_primario_e_fica_fora(self):
+        # A réplica sem a tabela faz a consulta falhar com OperationalError, como uma réplica que caiu
+        with EngineSingleton.get_engine().begin() as connection:
+            connection.execute(text('CREATE TABLE marca (nome TEXT)'))
+
+        dependency = get_read_db(_request())
+        session = next(dependency)
+        try:
+            self.assertEqual(session.execute(text('SELECT count(*) FROM marca')).scalar(), 0)
+            self.assertTrue(session.execute(text('pragma database_list')).all()[0][2].endswith('primary.sqlite'))
+        finally:
+            dependency.close()
+        self.assertEqual(EngineSingleton.replica_candidates(), [])
+
+    def test_verificacao_periodica_tira_e_devolve_replicas(self):
+        self.mock_settings.return_value.database_replica_urls = [self.broken_url, self.replica_url]
+
+        self.assertEqual(EngineSingleton.check_replicas(), 1)
+        self.assertEqual([str(engine.url) for engine in EngineSingleton.replica_candidates()], [self.replica_url])
+
+        os.mkdir(os.path.dirname(self.broken_url[len('sqlite:///'):]))
+        self.assertEqual(EngineSingleton.check_replicas(), 2)
+        self.assertEqual(len(EngineSingleton.replica_candidates()), 2)
+
+    def test_pool_stats(self):
+        EngineSingleton.get_engine()
+        EngineSingleton.get_replica_engines()
+
+        self.assertEqual(set(EngineSingleton.pool_stats()), {'primary', 'replica-0'})
+
+
+class TestReplicaHealthCheck(IsolatedAsyncioTestCase):
+    async def test_roda_em_segundo_plano_so_com_replicas(self):
+        with patch('orm.db.settings') as mock_settings, patch.object(EngineSingleton, 'check_replicas') as check:
+            mock_settings.return_value.database_replica_health_interval_seconds = 0.01
+            mock_settings.return_value.database_replica_urls = []
+            sem_replicas = ReplicaHealthCheck()
+            await sem_replicas.start()
+            await sem_replicas.stop()
+            self.assertEqual(check.call_count, 0)
+
+            mock_settings.return_value.database_replica_urls = ['sqlite://']
+            health_check = ReplicaHealthCheck()
+            await health_check.start()
+            await asyncio.sleep(0.05)
+            await health_check.stop()
+
+        self.assertGreater(check.call_count, 1)
@@ -1,10 +1,10 @@
-from datetime import datetime, timezone
+from datetime import datetime
 
 from sqlalchemy import Integer, String, Boolean, DateTime
 from sqlalchemy.orm import Mapped, mapped_column
 
 import models
-from orm import BaseOrm
+from orm import BaseOrm, utc_timestamp
 
 
 class User(BaseOrm):
@@ -23,10 +23,11 @@ class User(BaseOrm):
             name=self.name,
             username=self.username,
             email=self.email,
-            created_at=int(self.created_at.astimezone(timezone.utc).timestamp()),
+            created_at=utc_timestamp(self.created_at),
             is_active=self.is_active,
             hashed_password=self.hashed_password,
         )
 
     def __repr__(self):
         return f'<User {self.username} - {self.id}>'
+
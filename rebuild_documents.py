@@ -0,0 +1,34 @@
+import argparse
+import sys
+import time
+
+from sqlalchemy.orm import Session
+
+from repositories import receita_repository
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Regenera os documentos JSON materializados das receitas')
+    parser.add_argument('--database-url', help='Padrão: DATABASE_URL das configurações')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Receitas por transação')
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import create_engine
+    import orm
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from orm.db import EngineSingleton
+        engine = EngineSingleton.get_engine(echo=False)
+
+    orm.create_schema(engine)
+    start = time.perf_counter()
+    with Session(engine) as session:
+        total = receita_repository.reconstruir_documentos(session, batch_size=args.batch_size)
+    print('{} documentos regenerados em {:.1f}s'.format(total, time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators
+
+from orm import IdempotencyKey
+
+
+def _criterios(user_id: int, route: str, key: str):
+    return IdempotencyKey.user_id == user_id, IdempotencyKey.route == route, IdempotencyKey.key == key
+
+
+def reserve(session: Session, user_id: int, route: str, key: str, fingerprint: str, ttl_seconds: float,
+            pending_ttl_seconds: float) -> Optional[IdempotencyKey]:
+    # None quando a chave ficou com quem chamou; senão devolve o registro que já existe (concluído ou em andamento)
+    for _ in range(2):
+        now = datetime.utcnow()
+        try:
+            # Registros vencidos, ou execuções abandonadas (o nó caiu no meio), liberam a chave
+            session.execute(delete(IdempotencyKey).filter(*_criterios(user_id, route, key), operators.or_(
+                IdempotencyKey.created_at < now - timedelta(seconds=ttl_seconds),
+                operators.and_(IdempotencyKey.status_code == 0,
+                               IdempotencyKey.created_at < now - timedelta(seconds=pending_ttl_seconds)),
+            )))
+            session.execute(insert(IdempotencyKey).values(user_id=user_id, route=route, key=key,
+                                                          fingerprint=fingerprint, status_code=0, body=b'',
+                                                          created_at=now))
+            session.commit()
+            return None
+        except IntegrityError:
+            session.rollback()
+        except Exception as e:
+            session.rollback()
+            raise e
+
+        existing = session.execute(select(IdempotencyKey).filter(*_criterios(user_id, route, key))).scalar()
+        if existing is not None:
+            return existing
+    raise RuntimeError('Idempotency key {} could not be reserved'.format(key))
+
+
+def complete(session: Session, user_id: int, route: str, key: str, status_code: int, body: bytes,
+             media_type: Optional[str]):
+    try:
+        session.execute(update(IdempotencyKey).filter(*_criterios(user_id, route, key)).values(
+            status_code=status_code, body=body, media_type=media_type))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def release(session: Session, user_id: int, route: str, key: str):
+    try:
+        session.execute(delete(IdempotencyKey).filter(*_criterios(user_id, route, key), IdempotencyKey.status_code == 0))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def prune(session: Session, retention_seconds: float) -> int:
+    try:
+        result = session.execute(delete(IdempotencyKey).filter(
+            IdempotencyKey.created_at < datetime.utcnow() - timedelta(seconds=retention_seconds)))
+        session.commit()
+        return result.rowcount
+    except Exception as e:
+        session.rollback()
+        raise e
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import Session
+
+from orm import Invalidation
+
+CHANNEL = 'panela_magica_invalidation'
+
+
+def publish(session: Session, entity: str, *entity_ids: int) -> int:
+    # Roda na transação de quem escreve: o evento só fica visível (e o NOTIFY só é entregue) no commit
+    versions = session.execute(
+        insert(Invalidation).returning(Invalidation.id),
+        [{'entity': entity, 'entity_id': entity_id, 'created_at': datetime.utcnow()} for entity_id in entity_ids],
+    ).scalars().all()
+    version = max(versions)
+    if session.get_bind().dialect.name == 'postgresql':
+        session.execute(select(func.pg_notify(CHANNEL, str(version))))
+    return version
+
+
+def events_after(session: Session, version: int, limit: int = 1000) -> List[Invalidation]:
+    return list(session.execute(
+        select(Invalidation).filter(Invalidation.id > version).order_by(Invalidation.id).limit(limit)
+    ).scalars().all())
+
+
+def latest_version(session: Session) -> int:
+    return session.execute(select(func.max(Invalidation.id))).scalar() or 0
+
+
+def prune(session: Session, retention_seconds: float) -> int:
+    try:
+        result = session.execute(
+            delete(Invalidation).filter(
+                Invalidation.created_at < datetime.utcnow() - timedelta(seconds=retention_seconds))
+        )
+        session.commit()
+        return result.rowcount
+    except Exception as e:
+        session.rollback()
+        raise e
@@ -0,0 +1,111 @@
+import json
+from datetime import datetime, timedelta
+from typing import Collection, Dict, List
+
+from sqlalchemy import delete, select, update, func
+from sqlalchemy.orm import Session
+
+from orm import Job
+
+
+def enqueue(session: Session, kind: str, payload: dict = None, max_attempts: int = 5, delay_seconds: float = 0) -> Job:
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        status='pending',
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay_seconds),
+    )
+    session.add(job)
+    return job
+
+
+def claim_jobs(session: Session, slots: Dict[str, int]) -> List[Job]:
+    try:
+        now = datetime.utcnow()
+        claimed = []
+        for kind, limit in slots.items():
+            if limit <= 0:
+                continue
+
+            ids = session.execute(
+                select(Job.id)
+                .filter(Job.status == 'pending', Job.kind == kind, Job.run_at <= now)
+                .order_by(Job.run_at, Job.id)
+                .limit(limit)
+            ).scalars().all()
+
+            for job_id in ids:
+                result = session.execute(
+                    update(Job)
+                    .filter(Job.id == job_id, Job.status == 'pending')
+                    .values(status='running', started_at=now, attempts=Job.attempts + 1)
+                )
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+
+        session.commit()
+        if not claimed:
+            return []
+        return list(session.execute(select(Job).filter(Job.id.in_(claimed)).order_by(Job.id)).scalars().all())
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def complete_job(session: Session, job_id: int):
+    try:
+        session.execute(
+            update(Job).filter(Job.id == job_id).values(status='done', finished_at=datetime.utcnow(), last_error=None)
+        )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def fail_job(session: Session, job_id: int, error: str, retry_in_seconds: float = None):
+    try:
+        if retry_in_seconds is None:
+            values = dict(status='failed', finished_at=datetime.utcnow(), last_error=error)
+        else:
+            values = dict(status='pending', run_at=datetime.utcnow() + timedelta(seconds=retry_in_seconds),
+                          last_error=error)
+        session.execute(update(Job).filter(Job.id == job_id).values(**values))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def requeue_stale_jobs(session: Session, older_than_seconds: float, exclude_ids: Collection[int] = ()) -> int:
+    try:
+        criterios = [Job.status == 'running', Job.started_at < datetime.utcnow() - timedelta(seconds=older_than_seconds)]
+        if exclude_ids:
+            criterios.append(Job.id.not_in(exclude_ids))
+        result = session.execute(update(Job).filter(*criterios).values(status='pending'))
+        session.commit()
+        return result.rowcount
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def prune_finished_jobs(session: Session, retention_seconds: float) -> int:
+    try:
+        result = session.execute(delete(Job).filter(
+            Job.status.in_(('done', 'failed')),
+            Job.finished_at < datetime.utcnow() - timedelta(seconds=retention_seconds)))
+        session.commit()
+        return result.rowcount
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def queue_depth(session: Session) -> Dict[str, int]:
+    rows = session.execute(
+        select(Job.kind, func.count(Job.id)).filter(Job.status == 'pending').group_by(Job.kind)
+    ).all()
+    return {kind: count for kind, count in rows}
@@ -1,24 +1,325 @@
-from typing import IO
+import hashlib
+import threading
+import time
 from uuid import uuid4
+from collections import OrderedDict
+from functools import partial
+from typing import IO, Optional
 
 import filetype
 from fastapi import UploadFile
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, insert, func, cast, extract, literal_column, Text, BigInteger
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
-from clients import s3_client
+import models
+from cache import get_cache
+from clients import storage
 from models import CriarReceita
-from orm import Receita, Ingrediente, Session
+from orm import Receita, Ingrediente, ReceitaDocumento, User, Session, utc_timestamp
+from repositories import invalidation_repository, job_repository
 
+_COLUNAS_RECEITA = (Receita.id, Receita.nome, Receita.tipo, Receita.modo_de_preparo, Receita.data_de_criacao,
+                    Receita.imagem, User.id, User.name)
+_COLUNAS_INGREDIENTE = (Ingrediente.receita_id, Ingrediente.nome, Ingrediente.quantidade)
 
-def listar_receitas(session: Session):
-    stmt = select(Receita).order_by(Receita.id.desc())
-    receitas = session.execute(stmt).scalars().all()
-    return [receita.to_dto() for receita in receitas]
+JOB_MATERIALIZAR_DOCUMENTO = 'receita.materializar_documento'
 
 
-def buscar_receita_por_id(session: Session, id_receita: int):
-    receita = session.execute(select(Receita).filter(Receita.id == id_receita)).scalar()
-    return receita.to_dto() if receita else None
+_versao_catalogo = 0
+_versao_catalogo_lock = threading.Lock()
+_ultima_escrita = float('-inf')
+
+
+def versao_catalogo() -> int:
+    return _versao_catalogo
+
+
+def incrementar_versao_catalogo() -> int:
+    global _versao_catalogo, _ultima_escrita
+    with _versao_catalogo_lock:
+        _versao_catalogo += 1
+        _ultima_escrita = time.monotonic()
+        return _versao_catalogo
+
+
+def segundos_desde_a_ultima_escrita() -> float:
+    return time.monotonic() - _ultima_escrita
+
+
+CHAVE_GERACAO = 'receitas:geracao'
+
+
+def chave_receita(id_receita: int) -> str:
+    return 'receitas:receita:{}'.format(id_receita)
+
+
+def geracao_catalogo() -> str:
+    cache = get_cache()
+    geracao = cache.get(CHAVE_GERACAO)
+    if geracao is None:
+        geracao = uuid4().hex
+        cache.set(CHAVE_GERACAO, geracao)
+    return geracao
+
+
+def registrar_escrita(*ids_receitas: int):
+    # Chamada pelo nó que escreveu e, via barramento de invalidação, pelos demais nós. A versão local avança a cada
+    # evento aplicado: o id do evento não serve, porque no Postgres eventos podem commitar fora da ordem dos ids
+    incrementar_versao_catalogo()
+    cache = get_cache()
+    for id_receita in ids_receitas:
+        cache.delete(chave_receita(id_receita))
+    if cache.shared:
+        cache.set(CHAVE_GERACAO, uuid4().hex)
+
+
+def _ler_ingredientes(session: Session, receitas: dict, *criterios, construir_ingrediente=None):
+    stmt = select(*_COLUNAS_INGREDIENTE).order_by(Ingrediente.id)
+    if criterios:
+        stmt = stmt.where(Ingrediente.receita_id.in_(select(Receita.id).where(*criterios)))
+    construir_ingrediente = construir_ingrediente or models.Ingrediente.model_construct
+    for receita_id, nome, quantidade in session.execute(stmt):
+        lista = receitas.get(receita_id)
+        if lista is not None:
+            lista.append(construir_ingrediente(nome=nome, quantidade=quantidade))
+
+
+def _ler_receitas(session: Session, *criterios):
+    stmt = select(*_COLUNAS_RECEITA).join(User, Receita.criador_id == User.id).where(*criterios)
+    linhas = session.execute(stmt.order_by(Receita.id.desc())).all()
+    if not linhas:
+        return []
+
+    ingredientes = {linha[0]: [] for linha in linhas}
+    _ler_ingredientes(session, ingredientes, *criterios)
+
+    construir_receita = models.Receita.model_construct
+    construir_criador = models.CriadorReceita.model_construct
+    return [
+        construir_receita(
+            id=id_receita,
+            nome=nome,
+            tipo=tipo,
+            ingredientes=ingredientes[id_receita],
+            modo_de_preparo=modo_de_preparo,
+            data_de_criacao=utc_timestamp(data_de_criacao),
+            criador=construir_criador(id=criador_id, nome=criador_nome),
+            imagem=imagem
+        )
+        for id_receita, nome, tipo, modo_de_preparo, data_de_criacao, imagem, criador_id, criador_nome in linhas
+    ]
+
+
+_COLUNAS_CAMPO = {
+    'id': (),
+    'nome': (Receita.nome,),
+    'tipo': (Receita.tipo,),
+    'ingredientes': (),
+    'modo_de_preparo': (Receita.modo_de_preparo,),
+    'data_de_criacao': (Receita.data_de_criacao,),
+    'criador': (User.id, User.name),
+    'imagem': (Receita.imagem,),
+}
+
+
+def _ler_campos(session: Session, campos: tuple, *criterios, construir_ingrediente=None):
+    # Só as colunas pedidas saem do banco; ingredientes e criador só são lidos quando fazem parte da projeção
+    colunas = [Receita.id] + [coluna for campo in campos for coluna in _COLUNAS_CAMPO[campo]]
+    stmt = select(*colunas)
+    if 'criador' in campos:
+        stmt = stmt.join(User, Receita.criador_id == User.id)
+    linhas = session.execute(stmt.where(*criterios).order_by(Receita.id.desc())).all()
+    if not linhas:
+        return []
+
+    receitas = [{'id': linha[0]} for linha in linhas]
+    posicao = 1
+    for campo in campos:
+        if campo == 'criador':
+            for receita, linha in zip(receitas, linhas):
+                receita['criador'] = (linha[posicao], linha[posicao + 1])
+        elif campo == 'ingredientes':
+            for receita in receitas:
+                receita['ingredientes'] = []
+        elif campo == 'data_de_criacao':
+            for receita, linha in zip(receitas, linhas):
+                receita[campo] = utc_timestamp(linha[posicao])
+        elif campo != 'id':
+            for receita, linha in zip(receitas, linhas):
+                receita[campo] = linha[posicao]
+        posicao += len(_COLUNAS_CAMPO[campo])
+
+    if 'ingredientes' in campos:
+        ingredientes = {receita['id']: receita['ingredientes'] for receita in receitas}
+        _ler_ingredientes(session, ingredientes, *criterios, construir_ingrediente=construir_ingrediente)
+    return receitas
+
+
+def _ler_projecao(session: Session, campos: tuple, *criterios):
+    receitas = _ler_campos(session, campos, *criterios)
+    if 'criador' in campos:
+        construir_criador = models.CriadorReceita.model_construct
+        for receita in receitas:
+            criador_id, criador_nome = receita['criador']
+            receita['criador'] = construir_criador(id=criador_id, nome=criador_nome)
+
+    construir_receita = models.Receita.model_construct
+    return [construir_receita(**receita) for receita in receitas]
+
+
+def listar_receitas_compactas(session: Session, campos: tuple = None, internar_ingredientes: bool = False) -> dict:
+    # Cada criador aparece uma única vez em `criadores`; as receitas só guardam `criador_id`
+    campos = campos or models.CAMPOS_RECEITA
+    nomes_ingredientes = {}
+    construir_ingrediente = dict
+    if internar_ingredientes:
+        def construir_ingrediente(nome, quantidade):
+            return {'nome_id': nomes_ingredientes.setdefault(nome, len(nomes_ingredientes)), 'quantidade': quantidade}
+
+    receitas = _ler_campos(session, campos, construir_ingrediente=construir_ingrediente)
+    compacto = {'receitas': receitas}
+    if 'criador' in campos:
+        criadores = {}
+        for receita in receitas:
+            criador_id, criador_nome = receita.pop('criador')
+            receita['criador_id'] = criador_id
+            criadores[criador_id] = {'nome': criador_nome}
+        compacto['criadores'] = criadores
+    if internar_ingredientes and 'ingredientes' in campos:
+        compacto['nomes_ingredientes'] = list(nomes_ingredientes)
+    return compacto
+
+
+def listar_receitas(session: Session, campos: tuple = None):
+    if campos:
+        return _ler_projecao(session, campos)
+    return _ler_receitas(session)
+
+
+def buscar_receita_por_id(session: Session, id_receita: int, campos: tuple = None):
+    if campos:
+        receitas = _ler_projecao(session, campos, Receita.id == id_receita)
+    else:
+        receitas = _ler_receitas(session, Receita.id == id_receita)
+    return receitas[0] if receitas else None
+
+
+def _documento_receita(dialect: str, campos: tuple = models.CAMPOS_RECEITA):
+    if dialect == 'postgresql':
+        objeto = func.json_build_object
+        ingrediente = objeto('nome', Ingrediente.nome, 'quantidade', Ingrediente.quantidade)
+        ingredientes = select(
+            func.coalesce(func.json_agg(aggregate_order_by(ingrediente, Ingrediente.id)), literal_column("'[]'::json"))
+        ).where(Ingrediente.receita_id == Receita.id).scalar_subquery()
+        data_de_criacao = cast(func.floor(extract('epoch', Receita.data_de_criacao)), BigInteger)
+    else:
+        objeto = func.json_object
+        ordenados = select(Ingrediente.nome, Ingrediente.quantidade).where(
+            Ingrediente.receita_id == Receita.id
+        ).order_by(Ingrediente.id).correlate(Receita).subquery()
+        ingredientes = func.json(select(
+            func.json_group_array(objeto('nome', ordenados.c.nome, 'quantidade', ordenados.c.quantidade))
+        ).scalar_subquery())
+        data_de_criacao = cast(func.strftime('%s', Receita.data_de_criacao), BigInteger)
+
+    valores = {
+        'id': Receita.id,
+        'nome': Receita.nome,
+        'tipo': Receita.tipo,
+        'ingredientes': ingredientes,
+        'modo_de_preparo': Receita.modo_de_preparo,
+        'data_de_criacao': data_de_criacao,
+        'criador': objeto('id', User.id, 'nome', User.name),
+        'imagem': Receita.imagem,
+    }
+    return cast(objeto(*[argumento for campo in campos for argumento in (campo, valores[campo])]), Text)
+
+
+def _documentos_receitas(dialect: str, *criterios, campos: tuple = None):
+    stmt = select(_documento_receita(dialect, campos or models.CAMPOS_RECEITA)).select_from(Receita)
+    if not campos or 'criador' in campos:
+        stmt = stmt.join(User, Receita.criador_id == User.id)
+    return stmt.where(*criterios).order_by(Receita.id.desc())
+
+
+def _documentos_materializados(dialect: str, *criterios):
+    documento = func.coalesce(ReceitaDocumento.documento, _documento_receita(dialect))
+    return select(documento).join_from(Receita, User, Receita.criador_id == User.id).outerjoin(
+        ReceitaDocumento, ReceitaDocumento.receita_id == Receita.id
+    ).where(*criterios).order_by(Receita.id.desc())
+
+
+def _dialect(session: Session) -> str:
+    return session.get_bind().dialect.name
+
+
+def _listar_documentos(session: Session, consulta) -> bytes:
+    documentos = session.execute(consulta(_dialect(session))).scalars()
+    return b'[' + ','.join(documentos).encode('utf-8') + b']'
+
+
+def _buscar_documento(session: Session, consulta, id_receita: int) -> Optional[bytes]:
+    documento = session.execute(consulta(_dialect(session), Receita.id == id_receita)).scalar()
+    return documento.encode('utf-8') if documento is not None else None
+
+
+def listar_receitas_json(session: Session, campos: tuple = None) -> bytes:
+    return _listar_documentos(session, partial(_documentos_receitas, campos=campos))
+
+
+def buscar_receita_por_id_json(session: Session, id_receita: int, campos: tuple = None) -> Optional[bytes]:
+    return _buscar_documento(session, partial(_documentos_receitas, campos=campos), id_receita)
+
+
+def listar_documentos(session: Session) -> bytes:
+    return _listar_documentos(session, _documentos_materializados)
+
+
+def buscar_documento(session: Session, id_receita: int) -> Optional[bytes]:
+    return _buscar_documento(session, _documentos_materializados, id_receita)
+
+
+def atualizar_documentos(session: Session, *criterios, substituir: bool = True):
+    if substituir:
+        ids = select(Receita.id).where(*criterios)
+        session.execute(delete(ReceitaDocumento).where(ReceitaDocumento.receita_id.in_(ids)))
+    documentos = select(Receita.id, _documento_receita(_dialect(session))).join_from(
+        Receita, User, Receita.criador_id == User.id
+    ).where(*criterios)
+    session.execute(insert(ReceitaDocumento).from_select(['receita_id', 'documento'], documentos))
+
+
+def materializar_documento(session: Session, id_receita: int):
+    # Substitui sempre: o job pode rodar depois de uma edição (ou de uma remoção) da receita
+    try:
+        atualizar_documentos(session, Receita.id == id_receita)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def reconstruir_documentos(session: Session, batch_size: int = 1000) -> int:
+    try:
+        session.execute(delete(ReceitaDocumento).where(ReceitaDocumento.receita_id.not_in(select(Receita.id))))
+        primeiro, ultimo = session.execute(select(func.min(Receita.id), func.max(Receita.id))).one()
+        if primeiro is None:
+            session.commit()
+            return 0
+
+        for inicio in range(primeiro, ultimo + 1, batch_size):
+            lote = Receita.id.between(inicio, inicio + batch_size - 1)
+            atualizar_documentos(session, lote)
+            ids_receitas = session.execute(select(Receita.id).where(lote)).scalars().all()
+            if ids_receitas:
+                invalidation_repository.publish(session, 'receita', *ids_receitas)
+            session.commit()
+            if ids_receitas:
+                registrar_escrita(*ids_receitas)
+        return session.execute(select(func.count()).select_from(ReceitaDocumento)).scalar()
+    except Exception as e:
+        session.rollback()
+        raise e
 
 
 def criar_receita(session: Session, receita: CriarReceita) -> Receita:
@@ -34,21 +335,53 @@ def criar_receita(session: Session, receita: CriarReceita) -> Receita:
         )
 
         session.add(nova_receita)
+        session.flush()
+        # O documento sai da fila de jobs, na criação e na edição: até lá, a leitura monta o documento na hora
+        job_repository.enqueue(session, JOB_MATERIALIZAR_DOCUMENTO, {'id_receita': nova_receita.id})
+        invalidation_repository.publish(session, 'receita', nova_receita.id)
         session.commit()
+        registrar_escrita(nova_receita.id)
         return nova_receita.to_dto()
     except Exception as e:
         session.rollback()
         raise e
 
 
+_IMAGENS_CONHECIDAS_MAX = 10000
+_imagens_conhecidas: 'OrderedDict[str, None]' = OrderedDict()
+
+
+def _hash_conteudo(arquivo: IO) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: arquivo.read(65536), b''):
+        digest.update(chunk)
+    arquivo.seek(0)
+    return digest.hexdigest()
+
+
+def _marcar_imagem_conhecida(key: str):
+    _imagens_conhecidas[key] = None
+    _imagens_conhecidas.move_to_end(key)
+    if len(_imagens_conhecidas) > _IMAGENS_CONHECIDAS_MAX:
+        _imagens_conhecidas.popitem(last=False)
+
+
 def salvar_imagem_receita(imagem: UploadFile) -> str:
-    name = "{}.{}".format(uuid4(), imagem.filename.split('.')[-1])
-    return s3_client.upload_file(
+    name = "{}.{}".format(_hash_conteudo(imagem.file), imagem.filename.split('.')[-1].lower())
+    key = 'imagens-receitas/' + name
+
+    if key in _imagens_conhecidas or storage.file_exists(key):
+        _marcar_imagem_conhecida(key)
+        return storage.file_url(key)
+
+    url = storage.upload_file(
         file=imagem.file,
-        key='imagens-receitas/' + name,
+        key=key,
         public=True,
         mime_type=imagem.content_type
     )
+    _marcar_imagem_conhecida(key)
+    return url
 
 
 def imagem_receita_e_valida(imagem: IO) -> bool:
@@ -84,7 +417,13 @@ def atualizar_receita(session: Session, id_receita: int, receita: CriarReceita)
         receita_banco.modo_de_preparo = receita.modo_de_preparo
         receita_banco.ingredientes = [Ingrediente(nome=ingrediente.nome, quantidade=ingrediente.quantidade) for
                                       ingrediente in receita.ingredientes]
+        session.flush()
+        # Apaga o documento antigo na mesma transação (senão a leitura o preferiria ao atual) e deixa o novo para o job
+        session.execute(delete(ReceitaDocumento).filter(ReceitaDocumento.receita_id == id_receita))
+        job_repository.enqueue(session, JOB_MATERIALIZAR_DOCUMENTO, {'id_receita': id_receita})
+        invalidation_repository.publish(session, 'receita', id_receita)
         session.commit()
+        registrar_escrita(id_receita)
         session.refresh(receita_banco)
         return receita_banco.to_dto()
     except Exception as e:
@@ -94,9 +433,12 @@ def atualizar_receita(session: Session, id_receita: int, receita: CriarReceita)
 
 def deletar_receita(session: Session, id_receita: int):
     try:
+        session.execute(delete(ReceitaDocumento).filter(ReceitaDocumento.receita_id == id_receita))
         session.execute(delete(Ingrediente).filter(Ingrediente.receita_id == id_receita))
         session.execute(delete(Receita).filter(Receita.id == id_receita))
+        invalidation_repository.publish(session, 'receita', id_receita)
         session.commit()
+        registrar_escrita(id_receita)
     except Exception as e:
         session.rollback()
         raise e
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import orm
+from repositories import idempotency_repository
+
+
+class TestIdempotencyRepository(TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        orm.create_schema(self.engine)
+
+    def _reserve(self, session, user_id=1, key='k1', fingerprint='a'):
+        return idempotency_repository.reserve(session, user_id, 'POST /receitas', key, fingerprint, 3600, 60)
+
+    def test_reserve_e_atomico_por_usuario_rota_e_chave(self):
+        with Session(self.engine) as session:
+            self.assertIsNone(self._reserve(session))
+            self.assertIsNone(self._reserve(session, user_id=2))
+
+            existente = self._reserve(session, fingerprint='b')
+            self.assertEqual((existente.fingerprint, existente.status_code), ('a', 0))
+
+    def test_complete_e_release(self):
+        with Session(self.engine) as session:
+            self._reserve(session)
+            idempotency_repository.complete(session, 1, 'POST /receitas', 'k1', 201, b'{}', 'application/json')
+            idempotency_repository.release(session, 1, 'POST /receitas', 'k1')
+
+            self.assertEqual(self._reserve(session).status_code, 201)
+
+            self._reserve(session, key='k2')
+            idempotency_repository.release(session, 1, 'POST /receitas', 'k2')
+            self.assertIsNone(self._reserve(session, key='k2'))
+
+    def test_prune(self):
+        with Session(self.engine) as session:
+            self._reserve(session)
+            self._reserve(session, key='k2')
+            session.execute(orm.IdempotencyKey.__table__.update().filter(orm.IdempotencyKey.key == 'k1').values(
+                created_at=datetime.utcnow() - timedelta(hours=2)))
+            session.commit()
+
+            self.assertEqual(idempotency_repository.prune(session, 3600), 1)
+            self.assertEqual(session.execute(select(orm.IdempotencyKey.key)).scalars().all(), ['k2'])
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import orm
+from repositories import invalidation_repository
+
+
+class TestInvalidationRepository(TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        orm.create_schema(self.engine)
+
+    def test_publish_retorna_maior_versao(self):
+        with Session(self.engine) as session:
+            self.assertEqual(invalidation_repository.publish(session, 'receita', 3, 1, 2), 3)
+            self.assertEqual(invalidation_repository.publish(session, 'user', 1), 4)
+            session.commit()
+
+            eventos = invalidation_repository.events_after(session, 2)
+            self.assertEqual([(e.id, e.entity, e.entity_id) for e in eventos], [(3, 'receita', 2), (4, 'user', 1)])
+            self.assertEqual(invalidation_repository.latest_version(session), 4)
+
+    def test_publish_descartado_no_rollback(self):
+        with Session(self.engine) as session:
+            invalidation_repository.publish(session, 'receita', 1)
+            session.rollback()
+
+            self.assertEqual(invalidation_repository.latest_version(session), 0)
+
+    def test_prune_mantem_versoes_crescentes(self):
+        with Session(self.engine) as session:
+            invalidation_repository.publish(session, 'receita', 1, 2)
+            session.execute(orm.Invalidation.__table__.update().values(created_at=datetime.utcnow() - timedelta(hours=2)))
+            session.commit()
+
+            self.assertEqual(invalidation_repository.prune(session, 3600), 2)
+            self.assertEqual(invalidation_repository.latest_version(session), 0)
+            self.assertEqual(invalidation_repository.publish(session, 'receita', 1), 3)
+            self.assertEqual(session.execute(select(orm.Invalidation.entity_id)).scalars().all(), [1])
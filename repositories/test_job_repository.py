@@ -0,0 +1,126 @@
+import json
+from datetime import datetime, timedelta
+from unittest import TestCase
+from unittest.mock import Mock
+
+import orm
+from repositories import job_repository
+
+
+class TestJobRepositoryEnqueue(TestCase):
+    def test_enqueue(self):
+        session = Mock()
+
+        job = job_repository.enqueue(session, 'receitas.indexar', {'id': 1}, max_attempts=3)
+
+        session.add.assert_called_once_with(job)
+        session.commit.assert_not_called()
+        self.assertEqual(job.kind, 'receitas.indexar')
+        self.assertEqual(json.loads(job.payload), {'id': 1})
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.max_attempts, 3)
+
+    def test_enqueue_com_atraso(self):
+        session = Mock()
+
+        job = job_repository.enqueue(session, 'receitas.indexar', delay_seconds=60)
+
+        self.assertEqual(json.loads(job.payload), {})
+        self.assertGreater(job.run_at, datetime.utcnow() + timedelta(seconds=50))
+
+
+class TestJobRepositoryClaimJobs(TestCase):
+    def test_claim_jobs(self):
+        session = Mock()
+        claimed_job = orm.Job(id=1, kind='a')
+        select_ids = Mock()
+        select_ids.scalars.return_value.all.return_value = [1, 2]
+        update_ok = Mock(rowcount=1)
+        update_lost = Mock(rowcount=0)
+        select_jobs = Mock()
+        select_jobs.scalars.return_value.all.return_value = [claimed_job]
+        session.execute.side_effect = [select_ids, update_ok, update_lost, select_jobs]
+
+        jobs = job_repository.claim_jobs(session, {'a': 2, 'b': 0})
+
+        self.assertEqual(jobs, [claimed_job])
+        self.assertEqual(session.execute.call_count, 4)
+        session.commit.assert_called_once()
+
+    def test_claim_jobs_sem_vagas(self):
+        session = Mock()
+
+        jobs = job_repository.claim_jobs(session, {'a': 0})
+
+        self.assertEqual(jobs, [])
+        session.execute.assert_not_called()
+
+    def test_claim_jobs_falha(self):
+        session = Mock()
+        session.execute.side_effect = Exception('Erro')
+
+        with self.assertRaises(Exception):
+            job_repository.claim_jobs(session, {'a': 1})
+        session.rollback.assert_called_once()
+
+
+class TestJobRepositoryFinish(TestCase):
+    def test_complete_job(self):
+        session = Mock()
+
+        job_repository.complete_job(session, 1)
+
+        session.execute.assert_called_once()
+        session.commit.assert_called_once()
+
+    def test_fail_job_com_retry(self):
+        session = Mock()
+
+        job_repository.fail_job(session, 1, 'erro', retry_in_seconds=10)
+
+        params = session.execute.call_args[0][0].compile().params
+        self.assertEqual(params['status'], 'pending')
+        self.assertEqual(params['last_error'], 'erro')
+        session.commit.assert_called_once()
+
+    def test_fail_job_definitivo(self):
+        session = Mock()
+
+        job_repository.fail_job(session, 1, 'erro')
+
+        params = session.execute.call_args[0][0].compile().params
+        self.assertEqual(params['status'], 'failed')
+        session.commit.assert_called_once()
+
+    def test_fail_job_falha(self):
+        session = Mock()
+        session.execute.side_effect = Exception('Erro')
+
+        with self.assertRaises(Exception):
+            job_repository.fail_job(session, 1, 'erro')
+        session.rollback.assert_called_once()
+
+    def test_prune_finished_jobs(self):
+        session = Mock()
+        session.execute.return_value.rowcount = 3
+
+        self.assertEqual(job_repository.prune_finished_jobs(session, 3600), 3)
+
+        params = session.execute.call_args[0][0].compile().params
+        self.assertEqual(set(params['status_1']), {'done', 'failed'})
+        self.assertLess(params['finished_at_1'], datetime.utcnow() - timedelta(seconds=3500))
+        session.commit.assert_called_once()
+
+    def test_prune_finished_jobs_falha(self):
+        session = Mock()
+        session.execute.side_effect = Exception('Erro')
+
+        with self.assertRaises(Exception):
+            job_repository.prune_finished_jobs(session, 3600)
+        session.rollback.assert_called_once()
+
+    def test_queue_depth(self):
+        session = Mock()
+        session.execute.return_value.all.return_value = [('a', 2), ('b', 1)]
+
+        self.assertEqual(job_repository.queue_depth(session), {'a': 2, 'b': 1})
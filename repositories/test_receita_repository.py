@@ -1,4 +1,7 @@
 import datetime
+import hashlib
+import io
+import json
 import random
 from unittest import TestCase
 from unittest.mock import Mock, patch
@@ -33,19 +36,34 @@ mock_receita = orm.Receita(
 )
 
 
+linha_receita = (mock_receita.id, mock_receita.nome, mock_receita.tipo, mock_receita.modo_de_preparo,
+                 mock_receita.data_de_criacao, mock_receita.imagem, mock_receita.criador.id, mock_receita.criador.name)
+linha_ingrediente = (mock_receita.id, 'Ingrediente 1', '1 xícara')
+
+
 class TestReceitaRepositoryListarReceitas(TestCase):
     def test_listar_receitas(self):
         session = Mock()
-        session.execute.return_value.scalars.return_value.all.return_value = [mock_receita]
+        session.execute.return_value.all.return_value = [linha_receita]
+        session.execute.return_value.__iter__ = Mock(return_value=iter([linha_ingrediente]))
 
         receitas = receita_repository.listar_receitas(session)
 
         self.assertEqual(receitas, [mock_receita.to_dto()])
-        session.execute.assert_called_once()
+        self.assertEqual(session.execute.call_count, 2)
+
+    def test_listar_receitas_ignora_ingredientes_de_receitas_fora_da_pagina(self):
+        session = Mock()
+        session.execute.return_value.all.return_value = [linha_receita]
+        session.execute.return_value.__iter__ = Mock(return_value=iter([linha_ingrediente, (2, 'Sal', 'pitada')]))
+
+        receitas = receita_repository.listar_receitas(session)
+
+        self.assertEqual(receitas[0].ingredientes, [models.Ingrediente(nome='Ingrediente 1', quantidade='1 xícara')])
 
     def test_listar_receitas_vazia(self):
         session = Mock()
-        session.execute.return_value.scalars.return_value.all.return_value = []
+        session.execute.return_value.all.return_value = []
 
         receitas = receita_repository.listar_receitas(session)
 
@@ -64,16 +82,18 @@ class TestReceitaRepositoryListarReceitas(TestCase):
 class TestReceitaRepositoryBuscarReceitaPorId(TestCase):
     def test_buscar_receita_por_id(self):
         session = Mock()
-        session.execute.return_value.scalar.return_value = mock_receita
+        session.execute.return_value.all.return_value = [linha_receita]
+        session.execute.return_value.__iter__ = Mock(return_value=iter([linha_ingrediente]))
 
         receita = receita_repository.buscar_receita_por_id(session, 1)
 
         self.assertEqual(receita, mock_receita.to_dto())
-        session.execute.assert_called_once()
+        self.assertEqual(receita.model_dump(), mock_receita.to_dto().model_dump())
+        self.assertEqual(session.execute.call_count, 2)
 
     def test_buscar_receita_por_id_nao_encontrada(self):
         session = Mock()
-        session.execute.return_value.scalar.return_value = None
+        session.execute.return_value.all.return_value = []
 
         receita = receita_repository.buscar_receita_por_id(session, 1)
 
@@ -90,9 +110,18 @@ class TestReceitaRepositoryBuscarReceitaPorId(TestCase):
 
 
 class TestReceitaRepositoryCriarReceita(TestCase):
-    @patch('repositories.receita_repository.uuid4')
-    def test_criar_receita(self, mock_uuid4):
+    def setUp(self):
+        patcher = patch('repositories.receita_repository.get_cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('repositories.invalidation_repository.publish', return_value=1)
+        self.mock_publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_criar_receita(self):
         def mock_add_fn(receita):
+            if not isinstance(receita, orm.Receita):
+                return
             receita.id = mock_receita.id
             receita.data_de_criacao = mock_receita.data_de_criacao
             receita.criador = orm.User(
@@ -122,7 +151,11 @@ class TestReceitaRepositoryCriarReceita(TestCase):
         nova_receita = receita_repository.criar_receita(session, receita)
 
         self.assertEqual(nova_receita, mock_receita.to_dto())
-        session.add.assert_called_once()
+        self.assertEqual(session.add.call_count, 2)
+        job = session.add.call_args_list[1].args[0]
+        self.assertEqual((job.kind, json.loads(job.payload)),
+                         (receita_repository.JOB_MATERIALIZAR_DOCUMENTO, {'id_receita': mock_receita.id}))
+        session.execute.assert_not_called()
         session.commit.assert_called_once()
 
     def test_criar_receita_falha(self):
@@ -153,51 +186,96 @@ class TestReceitaRepositoryCriarReceita(TestCase):
 
 
 class TestReceitaRepositorySalvarImagemReceita(TestCase):
-    @patch('repositories.receita_repository.uuid4')
-    @patch('clients.s3_client.upload_file')
-    def test_salvar_imagem_receita(self, mock_s3_client, mock_uuid4):
-        mock_uuid4.return_value = '1234'
-        mock_s3_client.return_value = 'http://localhost:8002/imagens-receitas/1234.jpg'
+    hash_conteudo = hashlib.sha256(b'conteudo').hexdigest()
+
+    def setUp(self):
+        receita_repository._imagens_conhecidas.clear()
 
+    def _mock_imagem(self, filename='imagem.jpg'):
         imagem = Mock()
-        imagem.filename = 'imagem.jpg'
-        imagem.file = b'conteudo'
+        imagem.filename = filename
+        imagem.file = io.BytesIO(b'conteudo')
         imagem.content_type = 'image/jpeg'
+        return imagem
+
+    @patch('clients.storage.file_url')
+    @patch('clients.storage.file_exists')
+    @patch('clients.storage.upload_file')
+    def test_salvar_imagem_receita(self, mock_s3_client, mock_file_exists, mock_file_url):
+        mock_file_exists.return_value = False
+        mock_s3_client.return_value = 'http://localhost:8002/imagens-receitas/{}.jpg'.format(self.hash_conteudo)
+
+        imagem = self._mock_imagem()
 
         url = receita_repository.salvar_imagem_receita(imagem)
 
-        self.assertEqual(url, 'http://localhost:8002/imagens-receitas/1234.jpg')
-        mock_uuid4.assert_called_once()
+        self.assertEqual(url, 'http://localhost:8002/imagens-receitas/{}.jpg'.format(self.hash_conteudo))
+        mock_file_exists.assert_called_once_with('imagens-receitas/{}.jpg'.format(self.hash_conteudo))
         mock_s3_client.assert_called_once_with(
             file=imagem.file,
-            key='imagens-receitas/1234.jpg',
+            key='imagens-receitas/{}.jpg'.format(self.hash_conteudo),
             public=True,
             mime_type='image/jpeg'
         )
-
-    @patch('repositories.receita_repository.uuid4')
-    @patch('clients.s3_client.upload_file')
-    def test_salvar_imagem_receita_com_erro(self, mock_s3_client, mock_uuid4):
-        mock_uuid4.return_value = '1234'
+        self.assertEqual(imagem.file.tell(), 0)
+        mock_file_url.assert_not_called()
+
+    @patch('clients.storage.file_url')
+    @patch('clients.storage.file_exists')
+    @patch('clients.storage.upload_file')
+    def test_salvar_imagem_receita_existente_nao_reenvia(self, mock_s3_client, mock_file_exists, mock_file_url):
+        mock_file_exists.return_value = True
+        mock_file_url.return_value = 'http://localhost:8002/imagens-receitas/{}.jpg'.format(self.hash_conteudo)
+
+        url = receita_repository.salvar_imagem_receita(self._mock_imagem(filename='imagem.JPG'))
+
+        self.assertEqual(url, 'http://localhost:8002/imagens-receitas/{}.jpg'.format(self.hash_conteudo))
+        mock_s3_client.assert_not_called()
+        mock_file_url.assert_called_once_with('imagens-receitas/{}.jpg'.format(self.hash_conteudo))
+
+    @patch('clients.storage.file_url')
+    @patch('clients.storage.file_exists')
+    @patch('clients.storage.upload_file')
+    def test_salvar_imagem_receita_repetida_usa_indice_local(self, mock_s3_client, mock_file_exists, mock_file_url):
+        mock_file_exists.return_value = False
+        mock_s3_client.return_value = 'http://localhost:8002/imagens-receitas/{}.jpg'.format(self.hash_conteudo)
+        mock_file_url.return_value = mock_s3_client.return_value
+
+        primeira = receita_repository.salvar_imagem_receita(self._mock_imagem())
+        segunda = receita_repository.salvar_imagem_receita(self._mock_imagem())
+
+        self.assertEqual(primeira, segunda)
+        mock_s3_client.assert_called_once()
+        mock_file_exists.assert_called_once()
+
+    @patch('clients.storage.file_exists')
+    @patch('clients.storage.upload_file')
+    def test_salvar_imagem_receita_com_erro(self, mock_s3_client, mock_file_exists):
+        mock_file_exists.return_value = False
         mock_s3_client.side_effect = Exception('Erro')
 
-        imagem = Mock()
-        imagem.filename = 'imagem.jpg'
-        imagem.file = b'conteudo'
-        imagem.content_type = 'image/jpeg'
+        imagem = self._mock_imagem()
 
         with self.assertRaises(Exception):
             receita_repository.salvar_imagem_receita(imagem)
-        mock_uuid4.assert_called_once()
         mock_s3_client.assert_called_once_with(
             file=imagem.file,
-            key='imagens-receitas/1234.jpg',
+            key='imagens-receitas/{}.jpg'.format(self.hash_conteudo),
             public=True,
             mime_type='image/jpeg'
         )
+        self.assertNotIn('imagens-receitas/{}.jpg'.format(self.hash_conteudo), receita_repository._imagens_conhecidas)
 
 
 class TestReceitaRepositoryDeletarReceita(TestCase):
+    def setUp(self):
+        patcher = patch('repositories.receita_repository.get_cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('repositories.invalidation_repository.publish', return_value=1)
+        self.mock_publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_deletar_receita(self):
         session = Mock()
         session.execute = Mock()
@@ -205,7 +283,8 @@ class TestReceitaRepositoryDeletarReceita(TestCase):
 
         receita_repository.deletar_receita(session, 1)
 
-        self.assertEqual(session.execute.call_count, 2)
+        self.assertEqual(session.execute.call_count, 3)
+        self.mock_publish.assert_called_once_with(session, 'receita', 1)
         session.commit.assert_called_once()
 
     def test_deletar_receita_falha(self):
@@ -222,6 +301,14 @@ class TestReceitaRepositoryDeletarReceita(TestCase):
 
 
 class TestReceitaRepositoryAtualizarReceita(TestCase):
+    def setUp(self):
+        patcher = patch('repositories.receita_repository.get_cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('repositories.invalidation_repository.publish', return_value=1)
+        self.mock_publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_atualizar_receita(self):
         session = Mock()
         session.execute.return_value.scalar.return_value = mock_receita
@@ -244,7 +331,12 @@ class TestReceitaRepositoryAtualizarReceita(TestCase):
         nova_receita = receita_repository.atualizar_receita(session, 1, receita)
 
         self.assertEqual(nova_receita, mock_receita.to_dto())
-        session.execute.assert_called_once()
+        self.assertEqual(session.execute.call_count, 2)
+        job = session.add.call_args.args[0]
+        self.assertEqual((job.kind, json.loads(job.payload)),
+                         (receita_repository.JOB_MATERIALIZAR_DOCUMENTO, {'id_receita': 1}))
+        self.mock_publish.assert_called_once_with(session, 'receita', 1)
+        session.flush.assert_called_once()
         session.commit.assert_called_once()
 
     def test_atualizar_receita_falha(self):
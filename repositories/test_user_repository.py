@@ -3,6 +3,7 @@ from select import select
 from unittest import TestCase
 from unittest.mock import Mock
 
+from sqlalchemy import func
 from sqlalchemy.sql import operators, select
 
 import orm
@@ -39,7 +40,7 @@ class TestUserRepository(TestCase):
         self.assertEqual(user.email, mock_user.email)
         self.assertEqual(user.hashed_password, mock_user.hashed_password)
         self.assertEqual(user.is_active, mock_user.is_active)
-        self.assertEqual(user.created_at, int(mock_user.created_at.timestamp()))
+        self.assertEqual(user.created_at, orm.utc_timestamp(mock_user.created_at))
         mock_session.execute.assert_called_once()
         mock_session.execute.return_value.scalar.assert_called_once()
         self.assertTrue(
@@ -48,10 +49,13 @@ class TestUserRepository(TestCase):
                     operators.and_(
                         operators.eq(orm.User.is_active, True),
                         operators.or_(
-                            orm.User.email == mock_user.email,
-                            orm.User.username == mock_user.email
+                            func.lower(orm.User.email) == func.lower(mock_user.email),
+                            func.lower(orm.User.username) == func.lower(mock_user.email),
                         ),
                     ),
+                ).order_by(
+                    operators.or_(orm.User.email == mock_user.email, orm.User.username == mock_user.email).desc(),
+                    orm.User.id,
                 ),
             ),
         )
@@ -78,7 +82,7 @@ class TestUserRepository(TestCase):
         self.assertEqual(user.email, mock_user.email)
         self.assertEqual(user.hashed_password, mock_user.hashed_password)
         self.assertEqual(user.is_active, mock_user.is_active)
-        self.assertEqual(user.created_at, int(mock_user.created_at.timestamp()))
+        self.assertEqual(user.created_at, orm.utc_timestamp(mock_user.created_at))
         mock_session.execute.assert_called_once()
         mock_session.execute.return_value.scalar.assert_called_once()
         self.assertTrue(
@@ -116,7 +120,7 @@ class TestUserRepository(TestCase):
         self.assertEqual(user.email, mock_user.email)
         self.assertEqual(user.hashed_password, mock_user.hashed_password)
         self.assertEqual(user.is_active, mock_user.is_active)
-        self.assertEqual(user.created_at, int(mock_user.created_at.timestamp()))
+        self.assertEqual(user.created_at, orm.utc_timestamp(mock_user.created_at))
         mock_session.add.assert_called_once()
         mock_session.commit.assert_called_once()
         mock_session.commit.assert_called_once()
@@ -140,7 +144,7 @@ class TestUserRepository(TestCase):
         self.assertEqual(user.email, mock_user.email)
         self.assertEqual(user.hashed_password, mock_user.hashed_password)
         self.assertEqual(user.is_active, mock_user.is_active)
-        self.assertEqual(user.created_at, int(mock_user.created_at.timestamp()))
+        self.assertEqual(user.created_at, orm.utc_timestamp(mock_user.created_at))
         mock_session.add.assert_called_once()
         mock_session.commit.assert_called_once()
         mock_session.commit.assert_called_once()
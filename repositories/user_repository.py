@@ -1,8 +1,24 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import func, insert, text, update
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import select, operators
 
+from cache import get_cache
 from models import User as UserModel, CreateUserRequest
-from orm import User as UserOrm
+from orm import User as UserOrm, Receita as ReceitaOrm
+from repositories import receita_repository, invalidation_repository
+
+
+def user_cache_key(user_id: int) -> str:
+    return 'auth:user:{}'.format(user_id)
+
+
+def invalidate_users(*user_ids: int):
+    cache = get_cache()
+    for user_id in user_ids:
+        cache.delete(user_cache_key(user_id))
 
 
 def get_user_by_email_or_username(session: Session, email_or_username: str) -> UserModel or None:
@@ -12,10 +28,15 @@ def get_user_by_email_or_username(session: Session, email_or_username: str) -> U
         operators.and_(
             operators.eq(UserOrm.is_active, True),
             operators.or_(
-                UserOrm.email == email_or_username,
-                UserOrm.username == email_or_username,
+                func.lower(UserOrm.email) == func.lower(email_or_username),
+                func.lower(UserOrm.username) == func.lower(email_or_username),
             ),
         ),
+    ).order_by(
+        # Até a migração dos índices únicos em caixa baixa, "Bob" e "bob" podem coexistir: a grafia exata ganha e,
+        # entre variações, a conta mais antiga
+        operators.or_(UserOrm.email == email_or_username, UserOrm.username == email_or_username).desc(),
+        UserOrm.id,
     )
 
     user = session.execute(stmp).scalar()
@@ -36,6 +57,116 @@ def create_user(session: Session, user: CreateUserRequest) -> UserModel:
         is_active=True,
     )
 
-    session.add(user)
-    session.commit()
-    return user.to_dto()
+    try:
+        session.add(user)
+        session.commit()
+        return user.to_dto()
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def find_conflicts(session: Session, emails: Iterable[str], usernames: Iterable[str],
+                   chunk_size: int = 500) -> Tuple[Set[str], Set[str]]:
+    # Devolve os valores em caixa baixa, como são comparados pelos índices únicos
+    emails, usernames = [email.lower() for email in emails], [username.lower() for username in usernames]
+    taken_emails, taken_usernames = set(), set()
+    for start in range(0, max(len(emails), len(usernames)), chunk_size):
+        stmt = select(func.lower(UserOrm.email), func.lower(UserOrm.username)).filter(operators.or_(
+            func.lower(UserOrm.email).in_(emails[start:start + chunk_size]),
+            func.lower(UserOrm.username).in_(usernames[start:start + chunk_size]),
+        ))
+        for email, username in session.execute(stmt):
+            taken_emails.add(email)
+            taken_usernames.add(username)
+    return taken_emails, taken_usernames
+
+
+def create_users(session: Session, users: List[dict]) -> int:
+    try:
+        session.execute(insert(UserOrm), [dict(user, is_active=True, created_at=datetime.utcnow()) for user in users])
+        session.commit()
+        return len(users)
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def update_user_name(session: Session, user_id: int, name: str) -> UserModel or None:
+    try:
+        user = session.execute(select(UserOrm).filter(UserOrm.id == user_id)).scalar()
+        if not user:
+            return None
+
+        user.name = name
+        session.flush()
+        receita_repository.atualizar_documentos(session, ReceitaOrm.criador_id == user_id)
+        ids_receitas = session.execute(select(ReceitaOrm.id).filter(ReceitaOrm.criador_id == user_id)).scalars().all()
+        invalidation_repository.publish(session, 'user', user_id)
+        if ids_receitas:
+            invalidation_repository.publish(session, 'receita', *ids_receitas)
+        session.commit()
+        invalidate_users(user_id)
+        receita_repository.registrar_escrita(*ids_receitas)
+        return user.to_dto()
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+CASE_INSENSITIVE_INDEXES = {
+    'username': 'ix_users_username_lower',
+    'email': 'ix_users_email_lower',
+}
+
+
+def case_duplicates(session: Session) -> Dict[str, List[List[Tuple[int, str]]]]:
+    # Grupos de contas que só diferem na caixa, do mais antigo para o mais novo, por coluna
+    duplicates = {}
+    for column_name in CASE_INSENSITIVE_INDEXES:
+        column = getattr(UserOrm, column_name)
+        repeated = select(func.lower(column)).group_by(func.lower(column)).having(func.count() > 1)
+        groups: Dict[str, List[Tuple[int, str]]] = {}
+        for user_id, value in session.execute(
+                select(UserOrm.id, column).filter(func.lower(column).in_(repeated)).order_by(UserOrm.id)):
+            groups.setdefault(value.lower(), []).append((user_id, value))
+        duplicates[column_name] = list(groups.values())
+    return duplicates
+
+
+def rename_case_duplicates(session: Session) -> List[Tuple[int, str, str, str]]:
+    # Mantém a conta mais antiga de cada grupo; as demais ganham o id no username/e-mail e seguem entrando com ele
+    renamed = []
+    try:
+        for column_name, groups in case_duplicates(session).items():
+            for _, *others in groups:
+                for user_id, value in others:
+                    if column_name == 'email':
+                        local, _, domain = value.rpartition('@')
+                        new_value = '{}+{}@{}'.format(local, user_id, domain)
+                    else:
+                        new_value = '{}-{}'.format(value.lower(), user_id)
+                    session.execute(update(UserOrm).filter(UserOrm.id == user_id).values({column_name: new_value}))
+                    renamed.append((user_id, column_name, value, new_value))
+        user_ids = {user_id for user_id, *_ in renamed}
+        if user_ids:
+            invalidation_repository.publish(session, 'user', *user_ids)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+    invalidate_users(*user_ids)
+    return renamed
+
+
+def create_case_insensitive_indexes(session: Session):
+    # DDL explícita (SQLite e Postgres), fora do metadata: create_schema a roda no boot e só registra erro se houver
+    # duplicatas, que migrate_user_indexes.py resolve
+    try:
+        for column_name, index_name in CASE_INSENSITIVE_INDEXES.items():
+            session.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS {} ON users (lower({}))'.format(
+                index_name, column_name)))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
@@ -0,0 +1,233 @@
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List
+
+from sqlalchemy import Engine, event, func, insert, select, text
+from sqlalchemy.orm import Session
+
+import orm
+
+TIPOS = ('Doce', 'Salgado', 'Bebida', 'Sobremesa', 'Massa', 'Vegano', 'Lanche', 'Sopa')
+INGREDIENTES = ('Farinha de trigo', 'Açúcar', 'Ovo', 'Leite', 'Manteiga', 'Sal', 'Fermento', 'Chocolate', 'Tomate',
+                'Cebola', 'Alho', 'Azeite', 'Queijo', 'Frango', 'Arroz', 'Feijão', 'Cenoura', 'Batata', 'Creme de leite',
+                'Leite condensado', 'Coco ralado', 'Canela', 'Limão', 'Pimenta-do-reino', 'Salsinha', 'Carne moída')
+QUANTIDADES = ('1 xícara', '1/2 xícara', '2 colheres de sopa', '1 colher de chá', '200g', '500g', '1 unidade',
+               '3 unidades', 'a gosto', '500ml', '1 pitada', '1 lata')
+NOMES = ('Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor', 'Isabela', 'João', 'Larissa',
+         'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Thiago', 'Vitória', 'Yuri')
+SOBRENOMES = ('Silva', 'Souza', 'Oliveira', 'Santos', 'Lima', 'Pereira', 'Costa', 'Almeida', 'Ferreira', 'Rocha')
+PRATOS = ('Bolo', 'Torta', 'Pudim', 'Risoto', 'Lasanha', 'Escondidinho', 'Suco', 'Sopa', 'Pão', 'Brigadeiro',
+          'Salada', 'Farofa', 'Moqueca', 'Quiche', 'Mousse')
+SABORES = ('de chocolate', 'de cenoura', 'de frango', 'de legumes', 'de limão', 'de milho', 'de queijo', 'da vovó',
+           'de coco', 'de carne', 'caseiro', 'cremoso', 'rápido', 'de panela')
+VERBOS = ('Misture', 'Bata', 'Refogue', 'Adicione', 'Asse', 'Cozinhe', 'Mexa', 'Despeje', 'Reserve', 'Leve à geladeira',
+          'Tempere', 'Pique', 'Unte a forma e', 'Sirva')
+COMPLEMENTOS = ('até ficar homogêneo', 'por 10 minutos', 'em fogo baixo', 'até dourar', 'com cuidado',
+                'até levantar fervura', 'por 40 minutos a 180°C', 'e deixe descansar', 'até engrossar')
+
+BASE_DATE = datetime(2023, 1, 1)
+
+
+class SeedConfig:
+    def __init__(self, users=1000, receitas=10000, seed=42, password='senha-padrao', ingredientes_min=3,
+                 ingredientes_media=8, ingredientes_max=30, passos_media=8.0, passos_sigma=0.6,
+                 criadores_zipf=1.1, batch_size=5000):
+        self.users = users
+        self.receitas = receitas
+        self.seed = seed
+        self.password = password
+        self.ingredientes_min = ingredientes_min
+        self.ingredientes_media = ingredientes_media
+        self.ingredientes_max = ingredientes_max
+        self.passos_media = passos_media
+        self.passos_sigma = passos_sigma
+        self.criadores_zipf = criadores_zipf
+        self.batch_size = batch_size
+
+
+def _batched(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _next_id(session: Session, column) -> int:
+    return (session.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _sincronizar_sequencias(session: Session):
+    # Os ids são explícitos (usernames e imagens derivam deles), então as sequências SERIAL do Postgres ficam para
+    # trás e o próximo INSERT da API colidiria com uma chave já usada
+    if session.get_bind().dialect.name != 'postgresql':
+        return
+    for tabela in (orm.User.__tablename__, orm.Receita.__tablename__):
+        session.execute(text(
+            "SELECT setval(pg_get_serial_sequence('{0}', 'id'), (SELECT max(id) FROM {0}))".format(tabela)))
+    session.commit()
+
+
+def gerar_usuarios(config: SeedConfig, first_id: int, hashed_password: str) -> Iterator[dict]:
+    rng = random.Random('{}-users'.format(config.seed))
+    for user_id in range(first_id, first_id + config.users):
+        yield dict(
+            id=user_id,
+            name='{} {}'.format(rng.choice(NOMES), rng.choice(SOBRENOMES)),
+            username='usuario{}'.format(user_id),
+            email='usuario{}@panela.test'.format(user_id),
+            hashed_password=hashed_password,
+            is_active=True,
+            created_at=BASE_DATE + timedelta(minutes=user_id),
+        )
+
+
+def _zipf_weights(n: int, exponent: float) -> List[float]:
+    weights = []
+    total = 0.0
+    for rank in range(1, n + 1):
+        total += 1 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+def _modo_de_preparo(rng: random.Random, config: SeedConfig) -> str:
+    passos = max(1, int(rng.lognormvariate(math.log(config.passos_media), config.passos_sigma)))
+    linhas = ['# Modo de preparo', '']
+    linhas += ['{}. {} {}.'.format(i, rng.choice(VERBOS), rng.choice(COMPLEMENTOS)) for i in range(1, passos + 1)]
+    if rng.random() < 0.3:
+        linhas += ['', '## Dicas', '', '- {} {}.'.format(rng.choice(VERBOS), rng.choice(COMPLEMENTOS))]
+    return '\n'.join(linhas) + '\n'
+
+
+def _quantidade_de_ingredientes(rng: random.Random, config: SeedConfig) -> int:
+    n = int(round(rng.gauss(config.ingredientes_media, config.ingredientes_media / 3)))
+    return min(config.ingredientes_max, max(config.ingredientes_min, n))
+
+
+def gerar_receitas(config: SeedConfig, first_id: int, criador_ids: List[int]):
+    rng = random.Random('{}-receitas'.format(config.seed))
+    shuffled = list(criador_ids)
+    rng.shuffle(shuffled)
+    weights = _zipf_weights(len(shuffled), config.criadores_zipf)
+
+    for receita_id in range(first_id, first_id + config.receitas):
+        receita = dict(
+            id=receita_id,
+            nome='{} {}'.format(rng.choice(PRATOS), rng.choice(SABORES)),
+            tipo=rng.choice(TIPOS),
+            criador_id=rng.choices(shuffled, cum_weights=weights)[0],
+            imagem='https://cdn.panela.test/imagens-receitas/{}.jpg'.format(receita_id),
+            modo_de_preparo=_modo_de_preparo(rng, config),
+            data_de_criacao=BASE_DATE + timedelta(seconds=receita_id * 37),
+        )
+        ingredientes = [
+            dict(receita_id=receita_id, nome=rng.choice(INGREDIENTES), quantidade=rng.choice(QUANTIDADES))
+            for _ in range(_quantidade_de_ingredientes(rng, config))
+        ]
+        yield receita, ingredientes
+
+
+def _fast_sqlite(engine: Engine):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.close()
+
+
+def _inserir_receitas(session: Session, receitas: List[dict], ingredientes: List[dict]):
+    from repositories import receita_repository
+
+    session.execute(insert(orm.Receita), receitas)
+    session.execute(insert(orm.Ingrediente), ingredientes)
+    receita_repository.atualizar_documentos(session, orm.Receita.id.between(receitas[0]['id'], receitas[-1]['id']),
+                                            substituir=False)
+    session.commit()
+
+
+def seed(engine: Engine, config: SeedConfig, hashed_password: str = None) -> dict:
+    from services.user_service import _hash_password
+
+    _fast_sqlite(engine)
+    orm.create_schema(engine)
+    hashed_password = hashed_password or _hash_password(config.password)
+
+    with Session(engine) as session:
+        first_user = _next_id(session, orm.User.id)
+        for batch in _batched(gerar_usuarios(config, first_user, hashed_password), config.batch_size):
+            session.execute(insert(orm.User), batch)
+        session.commit()
+
+        criador_ids = list(range(first_user, first_user + config.users))
+        first_receita = _next_id(session, orm.Receita.id)
+        receitas, ingredientes = [], []
+        total_ingredientes = 0
+        for receita, ingredientes_receita in gerar_receitas(config, first_receita, criador_ids):
+            receitas.append(receita)
+            ingredientes.extend(ingredientes_receita)
+            if len(receitas) >= config.batch_size:
+                _inserir_receitas(session, receitas, ingredientes)
+                total_ingredientes += len(ingredientes)
+                receitas, ingredientes = [], []
+        if receitas:
+            _inserir_receitas(session, receitas, ingredientes)
+            total_ingredientes += len(ingredientes)
+        _sincronizar_sequencias(session)
+
+    return {'users': config.users, 'receitas': config.receitas, 'ingredientes': total_ingredientes}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Gera usuários, receitas e ingredientes sintéticos')
+    parser.add_argument('--database-url', help='Padrão: DATABASE_URL das configurações')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--receitas', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--password', default='senha-padrao', help='Senha de todos os usuários sintéticos')
+    parser.add_argument('--ingredientes-min', type=int, default=3)
+    parser.add_argument('--ingredientes-media', type=int, default=8)
+    parser.add_argument('--ingredientes-max', type=int, default=30)
+    parser.add_argument('--passos-media', type=float, default=8.0, help='Mediana de passos do modo de preparo')
+    parser.add_argument('--passos-sigma', type=float, default=0.6, help='Dispersão (log-normal) dos passos')
+    parser.add_argument('--criadores-zipf', type=float, default=1.1,
+                        help='Expoente Zipf da distribuição de receitas por criador (0 = uniforme)')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import create_engine
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from orm.db import EngineSingleton
+        engine = EngineSingleton.get_engine(echo=False)
+
+    config = SeedConfig(
+        users=args.users, receitas=args.receitas, seed=args.seed, password=args.password,
+        ingredientes_min=args.ingredientes_min, ingredientes_media=args.ingredientes_media,
+        ingredientes_max=args.ingredientes_max, passos_media=args.passos_media, passos_sigma=args.passos_sigma,
+        criadores_zipf=args.criadores_zipf, batch_size=args.batch_size,
+    )
+
+    start = time.perf_counter()
+    totals = seed(engine, config)
+    elapsed = time.perf_counter() - start
+    print('Inseridos {users} usuários, {receitas} receitas e {ingredientes} ingredientes em {elapsed:.1f}s'.format(
+        elapsed=elapsed, **totals))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
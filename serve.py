@@ -0,0 +1,134 @@
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import threading
+import time
+
+import uvicorn
+
+from settings import settings, Settings
+
+logger = logging.getLogger('panela_magica.serve')
+
+# O socket é aberto aqui e herdado pelos workers; spawn (e não fork) para não copiar o estado do supervisor
+multiprocessing.allow_connection_pickling()
+_spawn = multiprocessing.get_context('spawn')
+
+
+def worker_count(config: Settings) -> int:
+    return config.server_workers if config.server_workers > 0 else (os.cpu_count() or 1)
+
+
+def uvicorn_config(config: Settings) -> uvicorn.Config:
+    max_requests = None
+    if config.server_max_requests > 0:
+        max_requests = config.server_max_requests + random.randint(0, max(config.server_max_requests_jitter, 0))
+
+    return uvicorn.Config(
+        'main:app',
+        host=config.server_host,
+        port=config.server_port,
+        loop=config.server_loop,
+        http=config.server_http,
+        backlog=config.server_backlog,
+        timeout_keep_alive=config.server_keep_alive,
+        timeout_graceful_shutdown=config.server_graceful_timeout,
+        limit_max_requests=max_requests,
+        proxy_headers=True,
+        forwarded_allow_ips=config.server_forwarded_allow_ips,
+        access_log=config.server_access_log,
+        lifespan='on',
+    )
+
+
+def restart_delay(failures: int, config: Settings) -> float:
+    # Worker que cai logo ao subir (banco fora, configuração errada) volta com espera dobrada a cada falha
+    if failures <= 0:
+        return 0.0
+    return min(config.server_restart_backoff_seconds * 2 ** (failures - 1), config.server_restart_backoff_max_seconds)
+
+
+def _run_worker(config: uvicorn.Config, sockets):
+    # O logging não atravessa o spawn: cada worker configura o seu
+    config.configure_logging()
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+class Supervisor:
+    def __init__(self, config: Settings):
+        self.config = config
+        self.workers = worker_count(config)
+        self.should_exit = threading.Event()
+        self.processes = []
+        self._started = []
+        self._failures = []
+        self._restart_at = []
+
+    def _spawn(self, sockets):
+        config = uvicorn_config(self.config)
+        process = _spawn.Process(target=_run_worker, kwargs={'config': config, 'sockets': sockets})
+        process.start()
+        logger.info('Worker %s iniciado (limite de %s requisições)', process.pid, config.limit_max_requests)
+        return process
+
+    def _handle_exit(self, sig, frame):
+        self.should_exit.set()
+
+    def check_workers(self, sockets, now: float):
+        for i, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                process.join()
+                # Saída limpa (reciclagem por max_requests) ou worker que ficou de pé um bom tempo zera as falhas
+                if process.exitcode == 0 or now - self._started[i] >= self.config.server_restart_backoff_max_seconds:
+                    self._failures[i] = 0
+                else:
+                    self._failures[i] += 1
+                delay = restart_delay(self._failures[i], self.config)
+                logger.info('Worker %s encerrou (código %s), reiniciando em %.1fs', process.pid, process.exitcode,
+                            delay)
+                self.processes[i] = None
+                self._restart_at[i] = now + delay
+
+            if self.processes[i] is None and now >= self._restart_at[i]:
+                self.processes[i] = self._spawn(sockets)
+                self._started[i] = now
+
+    def run(self):
+        socket = uvicorn_config(self.config).bind_socket()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._handle_exit)
+
+        now = time.monotonic()
+        self.processes = [self._spawn([socket]) for _ in range(self.workers)]
+        self._started = [now] * self.workers
+        self._failures = [0] * self.workers
+        self._restart_at = [now] * self.workers
+        while not self.should_exit.wait(0.5):
+            self.check_workers([socket], time.monotonic())
+
+        processes = [process for process in self.processes if process is not None]
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(self.config.server_graceful_timeout + 5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        socket.close()
+
+
+def main():
+    config = settings()
+    logging.basicConfig(level=logging.INFO)
+
+    if worker_count(config) == 1 and config.server_max_requests <= 0:
+        uvicorn.Server(uvicorn_config(config)).run()
+    else:
+        Supervisor(config).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
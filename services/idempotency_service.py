@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import itertools
+import time
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+from cache import SingleFlight
+from orm.db import EngineSingleton
+from repositories import idempotency_repository
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+class Record(NamedTuple):
+    fingerprint: str
+    # status_code 0 marca uma execução ainda em andamento (possivelmente em outro nó)
+    status_code: int = 0
+    body: bytes = b''
+    media_type: Optional[str] = None
+
+    def to_response(self, replayed: bool) -> Response:
+        headers = {REPLAYED_HEADER: 'true'} if replayed else None
+        return Response(content=self.body, status_code=self.status_code, media_type=self.media_type, headers=headers)
+
+
+_executions = SingleFlight('idempotency')
+_reservations = itertools.count(1)
+PRUNE_EVERY = 1000
+POLL_INITIAL_SECONDS = 0.05
+POLL_MAX_SECONDS = 1.0
+
+
+def fingerprint(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        if hasattr(part, 'read'):
+            for chunk in iter(lambda: part.read(65536), b''):
+                digest.update(chunk)
+            part.seek(0)
+        else:
+            digest.update(part.encode('utf-8') if isinstance(part, str) else part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _run(owner: object, user_id: int, route: str, key: str, request_fingerprint: str,
+         fn: Callable[[Session], Response]):
+    from settings import settings
+
+    config = settings()
+    # Sessão própria no primário: a execução é blindada e pode sobreviver ao cancelamento da requisição
+    with Session(EngineSingleton.get_engine()) as session:
+        if next(_reservations) % PRUNE_EVERY == 0:
+            idempotency_repository.prune(session, max(config.idempotency_ttl_seconds,
+                                                      config.idempotency_pending_ttl_seconds))
+
+        existing = idempotency_repository.reserve(session, user_id, route, key, request_fingerprint,
+                                                  config.idempotency_ttl_seconds,
+                                                  config.idempotency_pending_ttl_seconds)
+        if existing is not None:
+            return None, Record(existing.fingerprint, existing.status_code, existing.body, existing.media_type)
+
+        try:
+            response = fn(session)
+        except Exception:
+            idempotency_repository.release(session, user_id, route, key)
+            raise
+
+        record = Record(request_fingerprint, response.status_code, bytes(response.body), response.media_type)
+        if response.status_code < 500:
+            idempotency_repository.complete(session, user_id, route, key, record.status_code, record.body,
+                                            record.media_type)
+        else:
+            idempotency_repository.release(session, user_id, route, key)
+        return owner, record
+
+
+async def execute(key: str, user_id: int, route: str, request_fingerprint: str,
+                  fn: Callable[[Session], Response]) -> Response:
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise InvalidIdempotencyKeyError()
+
+    from settings import settings
+
+    # Duplicatas simultâneas neste worker esperam a primeira execução; as de outros workers/nós esbarram na
+    # restrição única da tabela e consultam o registro de novo, com espera crescente, até ele ser concluído. Se o
+    # outro nó cair, o registro vence em idempotency_pending_ttl_seconds e a próxima consulta assume a execução
+    owner = object()
+    deadline = time.monotonic() + settings().idempotency_pending_ttl_seconds
+    delay = POLL_INITIAL_SECONDS
+    while True:
+        executor, record = await _executions.do((route, user_id, key), _run, owner, user_id, route, key,
+                                                request_fingerprint, fn)
+        if record.fingerprint != request_fingerprint:
+            raise IdempotencyKeyReusedError()
+        if record.status_code != 0:
+            return record.to_response(executor is not owner)
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInProgressError()
+        await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 2, POLL_MAX_SECONDS)
+
+
+class InvalidIdempotencyKeyError(Exception):
+    def __init__(self, message: str = 'Invalid Idempotency-Key'):
+        self.message = message
+        super().__init__(self.message)
+
+
+class IdempotencyKeyReusedError(Exception):
+    def __init__(self, message: str = 'Idempotency-Key already used with a different request'):
+        self.message = message
+        super().__init__(self.message)
+
+
+class IdempotencyKeyInProgressError(Exception):
+    def __init__(self, message: str = 'A request with this Idempotency-Key is still in progress'):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from observability.metrics import Counter
+from orm.db import EngineSingleton
+from repositories import invalidation_repository, receita_repository, user_repository
+
+logger = logging.getLogger(__name__)
+
+INVALIDATIONS = Counter('cache_invalidations_total', 'Eventos de invalidação aplicados a partir do barramento',
+                        ('entity',))
+
+# No Postgres as sequências podem ser confirmadas fora de ordem: ids até esta distância do topo são relidos
+# até aparecerem
+GAP_WINDOW = 100
+
+HANDLERS: Dict[str, Callable] = {
+    'receita': receita_repository.registrar_escrita,
+    'user': user_repository.invalidate_users,
+}
+
+
+class InvalidationListener:
+    def __init__(self, session_factory: Callable[[], Session] = None):
+        from settings import settings
+        self._session_factory = session_factory or (lambda: Session(EngineSingleton.get_engine()))
+        self._poll_interval = settings().cache_invalidation_poll_interval
+        self._retention_seconds = settings().cache_invalidation_retention_seconds
+        self._last_version = 0
+        self._seen = set()
+        self._polls = 0
+        self._task: Optional[asyncio.Task] = None
+        self._connection = None
+        self._wakeup = asyncio.Event()
+
+    @property
+    def last_version(self) -> int:
+        return self._last_version
+
+    def _with_session(self, fn: Callable, *args):
+        with self._session_factory() as session:
+            return fn(session, *args)
+
+    async def start(self):
+        # Só importam os eventos confirmados depois da subida: os caches deste nó começam vazios
+        self._last_version, engine = await asyncio.to_thread(self._with_session, self._head)
+
+        if engine.dialect.name == 'postgresql':
+            self._listen(engine)
+        self._task = asyncio.create_task(self._loop())
+
+    @staticmethod
+    def _head(session: Session):
+        return invalidation_repository.latest_version(session), session.get_bind()
+
+    async def stop(self):
+        if self._connection is not None:
+            asyncio.get_running_loop().remove_reader(self._connection.fileno())
+            self._connection.close()
+            self._connection = None
+
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _listen(self, engine):
+        connection = engine.raw_connection()
+        connection.detach()
+        self._connection = connection.driver_connection
+        self._connection.autocommit = True
+        with self._connection.cursor() as cursor:
+            cursor.execute('LISTEN {}'.format(invalidation_repository.CHANNEL))
+        asyncio.get_running_loop().add_reader(self._connection.fileno(), self._on_notify)
+
+    def _on_notify(self):
+        # O NOTIFY só acorda o poller; a tabela de eventos continua sendo a fonte da verdade
+        self._connection.poll()
+        self._connection.notifies.clear()
+        self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.poll_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Falha ao ler os eventos de invalidação')
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def poll_once(self) -> int:
+        with self._session_factory() as session:
+            events = invalidation_repository.events_after(session, max(self._last_version - GAP_WINDOW, 0))
+            self._polls += 1
+            if self._polls % 100 == 0:
+                invalidation_repository.prune(session, self._retention_seconds)
+
+        events = [event for event in events if event.id not in self._seen]
+        if not events:
+            return 0
+
+        ids: Dict[str, List[int]] = defaultdict(list)
+        for event in events:
+            ids[event.entity].append(event.entity_id)
+            self._seen.add(event.id)
+            self._last_version = max(self._last_version, event.id)
+
+        for entity, entity_ids in ids.items():
+            handler = HANDLERS.get(entity)
+            if handler is None:
+                logger.warning('Nenhum handler de invalidação para %s', entity)
+                continue
+            handler(*entity_ids)
+            INVALIDATIONS.inc(len(entity_ids), entity=entity)
+
+        self._seen = {version for version in self._seen if version > self._last_version - GAP_WINDOW}
+        return len(events)
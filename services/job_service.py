@@ -0,0 +1,248 @@
+import asyncio
+import inspect
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from observability.metrics import CallbackGauge, CallbackCounter
+from orm.db import EngineSingleton
+from repositories import job_repository
+
+logger = logging.getLogger(__name__)
+
+
+class JobHandler:
+    def __init__(self, kind: str, fn: Callable, concurrency: int):
+        self.kind = kind
+        self.fn = fn
+        self.concurrency = concurrency
+
+
+class JobStats:
+    def __init__(self):
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.running = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+        self.run_seconds_max = 0.0
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+_handlers: Dict[str, JobHandler] = {}
+_stats: Dict[str, JobStats] = {}
+_worker: Optional['JobWorker'] = None
+
+
+def register(kind: str, concurrency: int = 1):
+    def decorator(fn: Callable) -> Callable:
+        _handlers[kind] = JobHandler(kind, fn, concurrency)
+        _stats.setdefault(kind, JobStats())
+        return fn
+
+    return decorator
+
+
+def stats() -> Dict[str, dict]:
+    return {kind: job_stats.to_dict() for kind, job_stats in _stats.items()}
+
+
+def queue_depth() -> Dict[str, int]:
+    with Session(EngineSingleton.get_engine()) as session:
+        return job_repository.queue_depth(session)
+
+
+def notify():
+    if _worker is not None:
+        _worker.notify()
+
+
+def _backoff_seconds(attempts: int) -> float:
+    from settings import settings
+    return min(settings().job_backoff_seconds * (2 ** max(attempts - 1, 0)), settings().job_backoff_max_seconds)
+
+
+class JobWorker:
+    def __init__(self, session_factory: Callable[[], Session] = None):
+        from settings import settings
+        self._session_factory = session_factory or (lambda: Session(EngineSingleton.get_engine()))
+        self._poll_interval = settings().job_poll_interval
+        self._stale_seconds = settings().job_stale_seconds
+        self._retention_seconds = settings().job_retention_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._running: Dict[str, int] = {}
+        self._running_ids = set()
+        self._tasks = set()
+        self._wakeup = asyncio.Event()
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reclaim_at = 0.0
+
+    def _with_session(self, fn: Callable, *args):
+        with self._session_factory() as session:
+            return fn(session, *args)
+
+    async def start(self):
+        self._event_loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._loop())
+
+        global _worker
+        _worker = self
+
+    async def stop(self, timeout: float = 30):
+        global _worker
+        if _worker is self:
+            _worker = None
+
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+
+    def notify(self):
+        # Chamado também das threads das rotas síncronas, depois do commit
+        if self._event_loop is not None:
+            self._event_loop.call_soon_threadsafe(self._wakeup.set)
+        else:
+            self._wakeup.set()
+
+    async def reclaim_stale(self) -> int:
+        # Jobs de um nó que caiu ficam em 'running' para sempre: a cada meio job_stale_seconds voltam para a fila.
+        # Os que rodam neste worker ficam de fora, então job_stale_seconds precisa cobrir o job mais longo
+        requeued = await asyncio.to_thread(self._with_session, job_repository.requeue_stale_jobs, self._stale_seconds,
+                                           set(self._running_ids))
+        if requeued:
+            logger.warning('%s jobs presos voltaram para a fila', requeued)
+        return requeued
+
+    async def prune_finished(self) -> int:
+        # Jobs concluídos ou que esgotaram as tentativas só servem para inspeção; depois de job_retention_seconds saem
+        pruned = await asyncio.to_thread(self._with_session, job_repository.prune_finished_jobs,
+                                         self._retention_seconds)
+        if pruned:
+            logger.info('%s jobs finalizados removidos', pruned)
+        return pruned
+
+    async def _loop(self):
+        while True:
+            try:
+                if time.monotonic() >= self._reclaim_at:
+                    self._reclaim_at = time.monotonic() + max(self._stale_seconds / 2, self._poll_interval)
+                    await self.reclaim_stale()
+                    await self.prune_finished()
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Falha no ciclo do worker de jobs')
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_once(self) -> int:
+        slots = {
+            kind: handler.concurrency - self._running.get(kind, 0)
+            for kind, handler in _handlers.items()
+        }
+        if not any(free > 0 for free in slots.values()):
+            return 0
+
+        jobs = await asyncio.to_thread(self._with_session, job_repository.claim_jobs, slots)
+        for job in jobs:
+            self._running[job.kind] = self._running.get(job.kind, 0) + 1
+            self._running_ids.add(job.id)
+            task = asyncio.create_task(self._execute(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(jobs)
+
+    async def _execute(self, job):
+        handler = _handlers[job.kind]
+        job_stats = _stats[job.kind]
+        job_stats.running += 1
+
+        wait = (job.started_at - job.run_at).total_seconds() if job.started_at and job.run_at else 0.0
+        job_stats.wait_seconds_total += wait
+        job_stats.wait_seconds_max = max(job_stats.wait_seconds_max, wait)
+
+        started = datetime.utcnow()
+        try:
+            payload = json.loads(job.payload or '{}')
+            if inspect.iscoroutinefunction(handler.fn):
+                await handler.fn(payload)
+            else:
+                await asyncio.to_thread(handler.fn, payload)
+
+            await asyncio.to_thread(self._with_session, job_repository.complete_job, job.id)
+            job_stats.succeeded += 1
+        except Exception as e:
+            logger.exception('Job %s (%s) falhou na tentativa %s', job.id, job.kind, job.attempts)
+            if job.attempts >= job.max_attempts:
+                await asyncio.to_thread(self._with_session, job_repository.fail_job, job.id, repr(e))
+                job_stats.failed += 1
+            else:
+                await asyncio.to_thread(self._with_session, job_repository.fail_job, job.id, repr(e),
+                                        _backoff_seconds(job.attempts))
+                job_stats.retried += 1
+        finally:
+            elapsed = (datetime.utcnow() - started).total_seconds()
+            job_stats.run_seconds_total += elapsed
+            job_stats.run_seconds_max = max(job_stats.run_seconds_max, elapsed)
+            job_stats.running -= 1
+            self._running[job.kind] -= 1
+            self._running_ids.discard(job.id)
+
+
+JOB_QUEUE_DEPTH = CallbackGauge(
+    'job_queue_depth', 'Jobs pendentes por tipo',
+    lambda: {(kind,): count for kind, count in queue_depth().items()},
+    ('kind',),
+)
+JOB_RESULTS = CallbackCounter(
+    'job_results_total', 'Jobs finalizados por tipo e resultado',
+    lambda: {
+        (kind, result): job_stats[result]
+        for kind, job_stats in stats().items()
+        for result in ('succeeded', 'retried', 'failed')
+    },
+    ('kind', 'result'),
+)
+JOB_RUNNING = CallbackGauge(
+    'job_running', 'Jobs em execução por tipo',
+    lambda: {(kind,): job_stats['running'] for kind, job_stats in stats().items()},
+    ('kind',),
+)
+JOB_SECONDS = CallbackCounter(
+    'job_seconds_total', 'Tempo acumulado de espera na fila (wait) e de execução (run) dos jobs',
+    lambda: {
+        (kind, phase): job_stats['{}_seconds_total'.format(phase)]
+        for kind, job_stats in stats().items()
+        for phase in ('wait', 'run')
+    },
+    ('kind', 'phase'),
+)
+JOB_SECONDS_MAX = CallbackGauge(
+    'job_seconds_max', 'Maior tempo de espera na fila (wait) e de execução (run) dos jobs',
+    lambda: {
+        (kind, phase): job_stats['{}_seconds_max'.format(phase)]
+        for kind, job_stats in stats().items()
+        for phase in ('wait', 'run')
+    },
+    ('kind', 'phase'),
+)
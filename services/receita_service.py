@@ -0,0 +1,228 @@
+import asyncio
+import gzip
+import json
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from starlette.responses import Response
+
+import models
+from cache import Page, PageCache, SingleFlight, get_cache
+from observability.metrics import Counter
+from orm import Session, read_session
+from repositories import receita_repository
+from services import job_service
+
+READ_MODES = ('rows', 'json', 'documents')
+FORMATOS_LISTA = ('full', 'compact', 'compact-interned')
+GZIP_MIN_BYTES = 1024
+
+PAGE_CACHE = Counter('receitas_page_cache_total', 'Consultas ao cache de páginas de receitas', ('result',))
+
+_lista_receitas = TypeAdapter(List[models.Receita])
+
+# Buscas idênticas simultâneas neste worker aguardam uma única ida ao banco
+_cargas_receitas = SingleFlight('receitas')
+_cargas_listas = SingleFlight('receitas_lista')
+
+
+@lru_cache
+def _modo_leitura() -> str:
+    from settings import settings
+
+    modo = settings().receitas_read_mode
+    if modo not in READ_MODES:
+        raise ValueError('receitas_read_mode inválido: {}'.format(modo))
+    return modo
+
+
+@lru_cache
+def _paginas() -> PageCache:
+    from settings import settings
+
+    return PageCache(settings().receitas_page_cache_size)
+
+
+@lru_cache
+def _comprimir_paginas() -> bool:
+    from settings import settings
+
+    return settings().receitas_page_cache_gzip
+
+
+def _json(documento: bytes) -> Response:
+    return Response(content=documento, media_type='application/json')
+
+
+class CampoInvalidoError(Exception):
+    def __init__(self, message: str = 'Campo inválido'):
+        self.message = message
+        super().__init__(self.message)
+
+
+def campos_da_consulta(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if not fields:
+        return None
+    if fields == 'summary':
+        return models.RESUMO_RECEITA
+
+    pedidos = {campo.strip() for campo in fields.split(',') if campo.strip()}
+    invalidos = pedidos.difference(models.CAMPOS_RECEITA)
+    if invalidos:
+        raise CampoInvalidoError('Campos inválidos: {}'.format(', '.join(sorted(invalidos))))
+
+    campos = tuple(campo for campo in models.CAMPOS_RECEITA if campo in pedidos or campo == 'id')
+    return campos if campos != models.CAMPOS_RECEITA else None
+
+
+def _serializar_lista(session: Session, campos: Optional[tuple], formato: str = 'full') -> bytes:
+    if formato != 'full':
+        # O formato compacto é montado a partir das linhas em qualquer modo de leitura
+        compacto = receita_repository.listar_receitas_compactas(
+            session, campos, internar_ingredientes=formato == 'compact-interned')
+        return to_json(compacto)
+
+    modo = _modo_leitura()
+    if modo == 'documents' and not campos:
+        return receita_repository.listar_documentos(session)
+    # Os documentos materializados estão sempre completos: projeções saem da agregação JSON
+    if modo in ('json', 'documents'):
+        return receita_repository.listar_receitas_json(session, campos)
+    if campos:
+        return _lista_receitas.dump_json(receita_repository.listar_receitas(session, campos),
+                                         include={'__all__': set(campos)})
+    return _lista_receitas.dump_json(receita_repository.listar_receitas(session))
+
+
+def _pagina(corpo: bytes) -> Page:
+    if _comprimir_paginas() and len(corpo) >= GZIP_MIN_BYTES:
+        return Page(corpo, gzip.compress(corpo, compresslevel=6))
+    return Page(corpo)
+
+
+def _pagina_compartilhada(session: Session, campos: Optional[tuple], formato: str) -> Page:
+    cache = get_cache()
+    if not cache.shared:
+        return _pagina(_serializar_lista(session, campos, formato))
+
+    # Só campos e formato já normalizados entram na chave: parâmetros extras na URL não criam páginas novas
+    chave = 'receitas:pagina:{}:{}:{}'.format(receita_repository.geracao_catalogo(), formato, ','.join(campos or ()))
+    pagina = cache.get(chave)
+    if pagina is None:
+        pagina = _pagina(_serializar_lista(session, campos, formato))
+        cache.set(chave, pagina)
+    return pagina
+
+
+# Cargas coalescidas sobrevivem a quem as iniciou: abrem sessão própria em vez de usar a da requisição, que é
+# fechada quando a requisição termina ou é cancelada
+async def _ler_do_primario(fixado_no_primario: Optional[Callable[[], bool]]) -> bool:
+    # Logo depois de uma escrita (local ou recebida pelo barramento) uma réplica atrasada devolveria linhas
+    # anteriores a ela, que ficariam no cache sob a versão nova: nessa janela a carga vai ao primário
+    from orm.db import EngineSingleton
+    from settings import settings
+
+    if not EngineSingleton.replica_candidates():
+        return True
+    if receita_repository.segundos_desde_a_ultima_escrita() < settings().database_replica_pin_seconds:
+        return True
+    # Só nos misses: a consulta da fixação pode ir ao Redis
+    return fixado_no_primario is not None and await asyncio.to_thread(fixado_no_primario)
+
+
+def _carregar_pagina(primario: bool, campos: Optional[tuple], formato: str, versao: int) -> Page:
+    with read_session(primario) as session:
+        pagina = _pagina_compartilhada(session, campos, formato)
+    _paginas().put(versao, (campos, formato), pagina)
+    return pagina
+
+
+def _codificar_pagina(pagina: Page, codec, versao: int, chave: tuple) -> Page:
+    codificada = _pagina(codec.encode(json.loads(pagina.body)))
+    _paginas().put(versao, chave, codificada)
+    return codificada
+
+
+async def listar_receitas(aceita_gzip: bool = False, campos: Optional[tuple] = None, formato: str = 'full',
+                          fixado_no_primario: Callable[[], bool] = None, codec=None) -> Response:
+    versao = receita_repository.versao_catalogo()
+    pagina = _paginas().get(versao, (campos, formato))
+    PAGE_CACHE.inc(result='hit' if pagina is not None else 'miss')
+
+    if pagina is None:
+        primario = await _ler_do_primario(fixado_no_primario)
+        pagina = await _cargas_listas.do((versao, primario, campos, formato), _carregar_pagina, primario, campos,
+                                         formato, versao)
+
+    media_type, headers = 'application/json', {'Vary': 'Accept-Encoding'}
+    if codec is not None:
+        # A página em msgpack/CBOR fica ao lado da JSON: o middleware de negociação não precisa transcodificar
+        # (no event loop) a cada requisição
+        chave = (campos, formato, codec.media_type)
+        codificada = _paginas().get(versao, chave)
+        if codificada is None:
+            codificada = await _cargas_listas.do((versao, chave), _codificar_pagina, pagina, codec, versao, chave)
+        pagina, media_type, headers = codificada, codec.media_type, {'Vary': 'Accept, Accept-Encoding'}
+
+    if aceita_gzip and pagina.gzip is not None:
+        return Response(content=pagina.gzip, media_type=media_type,
+                        headers=dict(headers, **{'Content-Encoding': 'gzip'}))
+    if codec is not None:
+        return Response(content=pagina.body, media_type=media_type, headers=headers)
+    return _json(pagina.body)
+
+
+def _serializar_receita(session: Session, id_receita: int, campos: Optional[tuple] = None) -> Optional[bytes]:
+    modo = _modo_leitura()
+    if modo == 'documents' and not campos:
+        return receita_repository.buscar_documento(session, id_receita)
+    if modo in ('json', 'documents'):
+        return receita_repository.buscar_receita_por_id_json(session, id_receita, campos)
+
+    receita = receita_repository.buscar_receita_por_id(session, id_receita, campos)
+    if receita is None:
+        return None
+    return receita.model_dump_json(include=set(campos) if campos else None).encode('utf-8')
+
+
+def _carregar_projecao(primario: bool, id_receita: int, campos: tuple) -> Optional[bytes]:
+    with read_session(primario) as session:
+        return _serializar_receita(session, id_receita, campos)
+
+
+def _carregar_receita(primario: bool, id_receita: int, versao: int) -> Optional[bytes]:
+    with read_session(primario) as session:
+        documento = _serializar_receita(session, id_receita)
+    if documento is not None and receita_repository.versao_catalogo() == versao:
+        get_cache().set(receita_repository.chave_receita(id_receita), documento)
+    return documento
+
+
+async def buscar_receita_por_id(id_receita: int, campos: Optional[tuple] = None,
+                                fixado_no_primario: Callable[[], bool] = None) -> Optional[Response]:
+    versao = receita_repository.versao_catalogo()
+    if campos:
+        # Projeções não passam pelo cache de receitas, que só guarda o documento completo
+        primario = await _ler_do_primario(fixado_no_primario)
+        documento = await _cargas_receitas.do((versao, primario, id_receita, campos), _carregar_projecao, primario,
+                                              id_receita, campos)
+        return _json(documento) if documento is not None else None
+
+    documento = get_cache().get(receita_repository.chave_receita(id_receita))
+    if documento is None:
+        primario = await _ler_do_primario(fixado_no_primario)
+        documento = await _cargas_receitas.do((versao, primario, id_receita), _carregar_receita, primario,
+                                              id_receita, versao)
+        if documento is None:
+            return None
+    return _json(documento)
+
+
+@job_service.register(receita_repository.JOB_MATERIALIZAR_DOCUMENTO, concurrency=2)
+def materializar_documento(payload: dict):
+    from orm.db import EngineSingleton
+
+    with Session(EngineSingleton.get_engine()) as session:
+        receita_repository.materializar_documento(session, payload['id_receita'])
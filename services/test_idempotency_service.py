@@ -0,0 +1,169 @@
+import asyncio
+import io
+import threading
+from datetime import datetime, timedelta
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from starlette.responses import Response
+
+import orm
+from orm.db import EngineSingleton
+from services import idempotency_service
+from services.idempotency_service import IdempotencyKeyReusedError, IdempotencyKeyInProgressError, \
+    InvalidIdempotencyKeyError
+
+
+class TestIdempotencyService(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        orm.create_schema(self.engine)
+        patcher = patch.object(EngineSingleton, '_engine', self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('settings.settings')
+        self.mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_settings.return_value.idempotency_ttl_seconds = 60
+        self.mock_settings.return_value.idempotency_pending_ttl_seconds = 5
+
+        self.calls = 0
+
+    def _criar(self, status_code=200):
+        def fn(session):
+            self.assertIsInstance(session, Session)
+            self.calls += 1
+            return Response(content=b'{"id":%d}' % self.calls, status_code=status_code, media_type='application/json')
+        return fn
+
+    async def test_repeticao_devolve_resposta_guardada(self):
+        primeira = await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar(201))
+        segunda = await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar(201))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual((segunda.status_code, segunda.body), (201, primeira.body))
+        self.assertNotIn(idempotency_service.REPLAYED_HEADER, primeira.headers)
+        self.assertEqual(segunda.headers[idempotency_service.REPLAYED_HEADER], 'true')
+
+    async def test_chave_e_por_usuario_e_rota(self):
+        await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar())
+        await idempotency_service.execute('k1', 2, 'POST /receitas', 'a', self._criar())
+        await idempotency_service.execute('k1', 1, 'POST /receitas/imagem', 'a', self._criar())
+
+        self.assertEqual(self.calls, 3)
+
+    async def test_chave_reutilizada_com_outro_pedido(self):
+        await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar())
+
+        with self.assertRaises(IdempotencyKeyReusedError):
+            await idempotency_service.execute('k1', 1, 'POST /receitas', 'b', self._criar())
+
+    async def test_chave_invalida(self):
+        for chave in (None, '', 'x' * 256):
+            with self.assertRaises(InvalidIdempotencyKeyError):
+                await idempotency_service.execute(chave, 1, 'POST /receitas', 'a', self._criar())
+
+    async def test_duplicatas_simultaneas_esperam_a_primeira(self):
+        liberar = threading.Event()
+        criar = self._criar()
+
+        def lento(session):
+            liberar.wait(5)
+            return criar(session)
+
+        pedidos = [asyncio.ensure_future(idempotency_service.execute('k1', 1, 'POST /receitas', 'a', lento))
+                   for _ in range(5)]
+        await asyncio.sleep(0.01)
+        liberar.set()
+        respostas = await asyncio.gather(*pedidos)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({response.body for response in respostas}, {b'{"id":1}'})
+        self.assertEqual(sum(idempotency_service.REPLAYED_HEADER in response.headers for response in respostas), 4)
+
+    async def test_erros_nao_sao_guardados(self):
+        def falha(session):
+            raise RuntimeError('banco fora do ar')
+
+        with self.assertRaises(RuntimeError):
+            await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', falha)
+        await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar(503))
+        await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar())
+
+        self.assertEqual(self.calls, 2)
+
+    def _inserir(self, status_code=0, idade=timedelta(0)):
+        with Session(self.engine) as session:
+            session.add(orm.IdempotencyKey(user_id=1, route='POST /receitas', key='k1', fingerprint='a',
+                                           status_code=status_code, body=b'{"id":0}', media_type='application/json',
+                                           created_at=datetime.utcnow() - idade))
+            session.commit()
+
+    async def test_execucao_em_andamento_em_outro_no_devolve_a_resposta_ao_concluir(self):
+        self._inserir()
+
+        async def concluir_no_outro_no():
+            await asyncio.sleep(0.1)
+            with Session(self.engine) as session:
+                session.execute(update(orm.IdempotencyKey).values(status_code=201, body=b'{"id":9}'))
+                session.commit()
+
+        response, _ = await asyncio.gather(
+            idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar()), concluir_no_outro_no())
+
+        self.assertEqual(self.calls, 0)
+        self.assertEqual((response.status_code, response.body), (201, b'{"id":9}'))
+        self.assertEqual(response.headers[idempotency_service.REPLAYED_HEADER], 'true')
+
+    async def test_execucao_abandonada_em_outro_no_e_assumida_ao_vencer(self):
+        self.mock_settings.return_value.idempotency_pending_ttl_seconds = 0.2
+        self._inserir()
+
+        response = await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar(201))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual((response.status_code, response.body), (201, b'{"id":1}'))
+        self.assertNotIn(idempotency_service.REPLAYED_HEADER, response.headers)
+
+    async def test_desiste_quando_a_execucao_nao_termina_no_prazo(self):
+        self.mock_settings.return_value.idempotency_pending_ttl_seconds = 0.2
+        self._inserir()
+
+        with patch('repositories.idempotency_repository.reserve') as mock_reserve:
+            mock_reserve.return_value = orm.IdempotencyKey(fingerprint='a', status_code=0, body=b'')
+            with self.assertRaises(IdempotencyKeyInProgressError):
+                await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar())
+        self.assertEqual(self.calls, 0)
+        self.assertGreater(mock_reserve.call_count, 1)
+
+    async def test_resposta_guardada_no_banco_vale_entre_workers(self):
+        await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar(201))
+
+        with Session(self.engine) as session:
+            registro = session.execute(select(orm.IdempotencyKey)).scalar_one()
+            self.assertEqual((registro.status_code, registro.body), (201, b'{"id":1}'))
+
+    async def test_registros_vencidos_e_execucoes_abandonadas_liberam_a_chave(self):
+        for status_code, idade in ((201, timedelta(seconds=61)), (0, timedelta(seconds=6))):
+            with self.subTest(status_code=status_code):
+                self._inserir(status_code, idade)
+
+                response = await idempotency_service.execute('k1', 1, 'POST /receitas', 'a', self._criar())
+
+                self.assertNotIn(idempotency_service.REPLAYED_HEADER, response.headers)
+                with Session(self.engine) as session:
+                    session.execute(orm.IdempotencyKey.__table__.delete())
+                    session.commit()
+        self.assertEqual(self.calls, 2)
+
+    def test_fingerprint_de_arquivo(self):
+        arquivo = io.BytesIO(b'imagem')
+
+        self.assertEqual(idempotency_service.fingerprint('a.png', arquivo), idempotency_service.fingerprint(
+            'a.png', b'imagem'))
+        self.assertEqual(arquivo.read(), b'imagem')
+        self.assertNotEqual(idempotency_service.fingerprint('ab', 'c'), idempotency_service.fingerprint('a', 'bc'))
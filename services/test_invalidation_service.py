@@ -0,0 +1,110 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch, Mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import orm
+from repositories import invalidation_repository, receita_repository
+from services import invalidation_service
+
+
+class TestInvalidationListener(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        orm.create_schema(self.engine)
+
+        patcher = patch('settings.settings')
+        mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_settings.return_value.cache_invalidation_poll_interval = 0.01
+        mock_settings.return_value.cache_invalidation_retention_seconds = 3600
+
+        versao = patch.object(receita_repository, '_versao_catalogo', 0)
+        versao.start()
+        self.addCleanup(versao.stop)
+
+        self.receita = Mock()
+        self.user = Mock()
+        handlers = patch.dict(invalidation_service.HANDLERS, {'receita': self.receita, 'user': self.user}, clear=True)
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+        self.listener = invalidation_service.InvalidationListener(session_factory=lambda: Session(self.engine))
+
+    def _publish(self, entity, *entity_ids):
+        with Session(self.engine) as session:
+            version = invalidation_repository.publish(session, entity, *entity_ids)
+            session.commit()
+            return version
+
+    def _insert(self, event_id, entity, entity_id):
+        with Session(self.engine) as session:
+            session.add(orm.Invalidation(id=event_id, entity=entity, entity_id=entity_id))
+            session.commit()
+
+    async def test_start_ignora_eventos_anteriores(self):
+        self._publish('receita', 1)
+        self._publish('receita', 2)
+
+        await self.listener.start()
+        self.addAsyncCleanup(self.listener.stop)
+
+        self.assertEqual(self.listener.last_version, 2)
+        self.assertEqual(receita_repository.versao_catalogo(), 0)
+        self.receita.assert_not_called()
+
+    async def test_poll_agrupa_eventos_por_entidade(self):
+        self._publish('receita', 1, 2)
+        self._publish('user', 7)
+
+        self.assertEqual(self.listener.poll_once(), 3)
+
+        self.receita.assert_called_once_with(1, 2)
+        self.user.assert_called_once_with(7)
+        self.assertEqual(self.listener.last_version, 3)
+        self.assertEqual(self.listener.poll_once(), 0)
+
+    def test_poll_aplica_evento_commitado_fora_de_ordem(self):
+        self._insert(2, 'receita', 20)
+        self.listener.poll_once()
+        self.receita.assert_called_once_with(20)
+
+        self._insert(1, 'receita', 10)
+        self.listener.poll_once()
+        self.receita.assert_called_with(10)
+        self.assertEqual(self.receita.call_count, 2)
+        self.assertEqual(self.listener.last_version, 2)
+
+    def test_poll_ignora_entidade_sem_handler(self):
+        self._publish('desconhecida', 1)
+        self._publish('receita', 1)
+
+        self.assertEqual(self.listener.poll_once(), 2)
+        self.receita.assert_called_once_with(1)
+
+    async def test_loop_aplica_eventos_publicados_apos_start(self):
+        await self.listener.start()
+        self.addAsyncCleanup(self.listener.stop)
+
+        self._publish('receita', 5)
+        for _ in range(100):
+            if self.receita.called:
+                break
+            await asyncio.sleep(0.01)
+
+        self.receita.assert_called_once_with(5)
+
+    def test_evento_fora_de_ordem_avanca_a_versao_do_catalogo(self):
+        with patch.dict(invalidation_service.HANDLERS, {'receita': receita_repository.registrar_escrita}), \
+                patch('repositories.receita_repository.get_cache'):
+            self._insert(2, 'receita', 20)
+            self.listener.poll_once()
+            versao = receita_repository.versao_catalogo()
+
+            self._insert(1, 'receita', 10)
+            self.listener.poll_once()
+
+        self.assertEqual(receita_repository.versao_catalogo(), versao + 1)
@@ -0,0 +1,205 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import orm
+from repositories import job_repository
+from services import job_service
+
+
+class TestJobWorker(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+        orm.create_schema(self.engine)
+
+        patcher = patch('settings.settings')
+        mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_settings.return_value.job_poll_interval = 0.01
+        mock_settings.return_value.job_stale_seconds = 300
+        mock_settings.return_value.job_retention_seconds = 3600
+        mock_settings.return_value.job_backoff_seconds = 0
+        mock_settings.return_value.job_backoff_max_seconds = 0
+
+        handlers = patch.dict(job_service._handlers, clear=True)
+        handlers.start()
+        self.addCleanup(handlers.stop)
+        stats = patch.dict(job_service._stats, clear=True)
+        stats.start()
+        self.addCleanup(stats.stop)
+
+        self.worker = job_service.JobWorker(session_factory=lambda: Session(self.engine))
+
+    def _enqueue(self, kind, payload=None, max_attempts=5):
+        with Session(self.engine) as session:
+            job = job_repository.enqueue(session, kind, payload, max_attempts=max_attempts)
+            session.commit()
+            return job.id
+
+    def _job(self, job_id):
+        with Session(self.engine) as session:
+            return session.execute(select(orm.Job).filter(orm.Job.id == job_id)).scalar()
+
+    async def _drain(self):
+        while self.worker._tasks:
+            await asyncio.gather(*self.worker._tasks)
+
+    async def test_executa_job(self):
+        recebidos = []
+        job_service.register('teste')(lambda payload: recebidos.append(payload))
+        job_id = self._enqueue('teste', {'id': 1})
+
+        self.assertEqual(await self.worker.run_once(), 1)
+        await self._drain()
+
+        self.assertEqual(recebidos, [{'id': 1}])
+        self.assertEqual(self._job(job_id).status, 'done')
+        self.assertEqual(job_service.stats()['teste']['succeeded'], 1)
+
+    async def test_executa_job_async(self):
+        recebidos = []
+
+        async def handler(payload):
+            recebidos.append(payload)
+
+        job_service.register('teste')(handler)
+        self._enqueue('teste', {'id': 2})
+
+        await self.worker.run_once()
+        await self._drain()
+
+        self.assertEqual(recebidos, [{'id': 2}])
+
+    async def test_retry_e_falha_definitiva(self):
+        def handler(payload):
+            raise ValueError('erro')
+
+        job_service.register('teste')(handler)
+        job_id = self._enqueue('teste', max_attempts=2)
+
+        await self.worker.run_once()
+        await self._drain()
+        job = self._job(job_id)
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('erro', job.last_error)
+
+        await self.worker.run_once()
+        await self._drain()
+        job = self._job(job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job_service.stats()['teste']['retried'], 1)
+        self.assertEqual(job_service.stats()['teste']['failed'], 1)
+
+    async def test_respeita_concorrencia_por_tipo(self):
+        liberar = asyncio.Event()
+
+        async def handler(payload):
+            await liberar.wait()
+
+        job_service.register('lento', concurrency=2)(handler)
+        for _ in range(5):
+            self._enqueue('lento')
+
+        self.assertEqual(await self.worker.run_once(), 2)
+        self.assertEqual(await self.worker.run_once(), 0)
+
+        liberar.set()
+        await self._drain()
+        self.assertEqual(await self.worker.run_once(), 2)
+        await self._drain()
+
+    async def test_start_e_stop(self):
+        recebidos = []
+        job_service.register('teste')(lambda payload: recebidos.append(payload))
+        self._enqueue('teste', {'id': 3})
+
+        await self.worker.start()
+        for _ in range(100):
+            if recebidos:
+                break
+            await asyncio.sleep(0.01)
+        await self.worker.stop()
+
+        self.assertEqual(recebidos, [{'id': 3}])
+        self.assertIsNone(job_service._worker)
+
+    async def test_devolve_jobs_presos_periodicamente(self):
+        liberar = asyncio.Event()
+
+        async def handler(payload):
+            await liberar.wait()
+
+        job_service.register('lento')(handler)
+        proprio = self._enqueue('lento')
+        await self.worker.run_once()
+
+        # Job de outro nó, que caiu depois de pegá-lo
+        preso = self._enqueue('orfao')
+        with Session(self.engine) as session:
+            session.execute(update(orm.Job).filter(orm.Job.id.in_([preso, proprio])).values(
+                status='running', started_at=datetime.utcnow() - timedelta(hours=1)))
+            session.commit()
+
+        self.worker._stale_seconds = 0.02
+        await self.worker.start()
+        for _ in range(100):
+            if self._job(preso).status == 'pending':
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self._job(preso).status, 'pending')
+        self.assertEqual(self._job(proprio).status, 'running')
+
+        liberar.set()
+        await self.worker.stop()
+        self.assertEqual(self._job(proprio).status, 'done')
+
+    async def test_notify_de_outra_thread(self):
+        recebidos = []
+        job_service.register('teste')(lambda payload: recebidos.append(payload))
+        self.worker._poll_interval = 60
+
+        await self.worker.start()
+        await asyncio.sleep(0.01)
+        self._enqueue('teste', {'id': 4})
+        thread = threading.Thread(target=job_service.notify)
+        thread.start()
+        thread.join()
+        for _ in range(100):
+            if recebidos:
+                break
+            await asyncio.sleep(0.01)
+        await self.worker.stop()
+
+        self.assertEqual(recebidos, [{'id': 4}])
+
+    async def test_remove_jobs_finalizados_antigos(self):
+        job_service.register('teste', concurrency=4)(lambda payload: None)
+        antigos = [self._enqueue('teste'), self._enqueue('teste')]
+        recente = self._enqueue('teste')
+        pendente = self._enqueue('teste')
+        await self.worker.run_once()
+        await self._drain()
+        with Session(self.engine) as session:
+            session.execute(update(orm.Job).filter(orm.Job.id.in_(antigos)).values(
+                finished_at=datetime.utcnow() - timedelta(hours=2)))
+            session.execute(update(orm.Job).filter(orm.Job.id == antigos[1]).values(status='failed'))
+            session.execute(update(orm.Job).filter(orm.Job.id == pendente).values(
+                status='pending', finished_at=datetime.utcnow() - timedelta(hours=2)))
+            session.commit()
+
+        self.assertEqual(await self.worker.prune_finished(), 2)
+
+        self.assertIsNone(self._job(antigos[0]))
+        self.assertIsNone(self._job(antigos[1]))
+        self.assertEqual(self._job(recente).status, 'done')
+        self.assertEqual(self._job(pendente).status, 'pending')
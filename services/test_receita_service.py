@@ -0,0 +1,186 @@
+import asyncio
+import gzip
+import threading
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import Mock, patch
+
+from starlette.responses import Response
+
+import models
+from cache import get_cache
+from repositories import receita_repository
+from services import receita_service
+
+
+class TestReceitaService(IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = patch('settings.settings')
+        self.mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_settings.return_value.receitas_page_cache_size = 8
+        self.mock_settings.return_value.receitas_page_cache_gzip = False
+        self.mock_settings.return_value.cache_backend = 'memory'
+        self.mock_settings.return_value.cache_max_entries = 16
+        self.mock_settings.return_value.cache_prefix = ''
+        self.mock_settings.return_value.cache_ttl_seconds = 0
+
+        self.mock_settings.return_value.database_replica_pin_seconds = 5
+
+        patcher = patch('orm.db.EngineSingleton.get_engine')
+        self.primario = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('orm.db.EngineSingleton.replica_candidates', return_value=[])
+        self.replicas = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for cached in (receita_service._modo_leitura, receita_service._paginas, receita_service._comprimir_paginas,
+                       get_cache):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+
+    @patch('repositories.receita_repository.listar_receitas')
+    async def test_listar_receitas_modo_rows(self, mock_listar):
+        self.mock_settings.return_value.receitas_read_mode = 'rows'
+        mock_listar.return_value = []
+
+        self.assertEqual((await receita_service.listar_receitas()).body, b'[]')
+
+    @patch('repositories.receita_repository.listar_receitas_json')
+    async def test_listar_receitas_modo_json(self, mock_listar_json):
+        self.mock_settings.return_value.receitas_read_mode = 'json'
+        mock_listar_json.return_value = b'[]'
+
+        response = await receita_service.listar_receitas()
+
+        self.assertIsInstance(response, Response)
+        self.assertEqual(response.body, b'[]')
+        self.assertEqual(response.media_type, 'application/json')
+
+    @patch('repositories.receita_repository.buscar_receita_por_id_json')
+    async def test_buscar_receita_modo_json_inexistente(self, mock_buscar_json):
+        self.mock_settings.return_value.receitas_read_mode = 'json'
+        mock_buscar_json.return_value = None
+
+        self.assertIsNone(await receita_service.buscar_receita_por_id(1))
+
+    @patch('repositories.receita_repository.buscar_receita_por_id_json')
+    async def test_buscas_simultaneas_coalescidas(self, mock_buscar_json):
+        self.mock_settings.return_value.receitas_read_mode = 'json'
+        liberar = threading.Event()
+        mock_buscar_json.side_effect = lambda *args: liberar.wait(5) and b'{"id":1}'
+
+        buscas = [asyncio.ensure_future(receita_service.buscar_receita_por_id(1)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        liberar.set()
+        respostas = await asyncio.gather(*buscas)
+
+        self.assertEqual([resposta.body for resposta in respostas], [b'{"id":1}'] * 5)
+        mock_buscar_json.assert_called_once()
+        self.assertEqual((await receita_service.buscar_receita_por_id(1)).body, b'{"id":1}')
+        mock_buscar_json.assert_called_once()
+
+    @patch('repositories.receita_repository.buscar_receita_por_id_json')
+    async def test_carga_usa_sessao_propria_e_sobrevive_ao_cancelamento(self, mock_buscar_json):
+        self.mock_settings.return_value.receitas_read_mode = 'json'
+        liberar = threading.Event()
+        sessoes = []
+
+        def buscar(session, *args):
+            liberar.wait(5)
+            sessoes.append(session)
+            return b'{"id":1}'
+
+        mock_buscar_json.side_effect = buscar
+        primeira = asyncio.ensure_future(receita_service.buscar_receita_por_id(1))
+        segunda = asyncio.ensure_future(receita_service.buscar_receita_por_id(1))
+        await asyncio.sleep(0.01)
+        primeira.cancel()
+        liberar.set()
+
+        self.assertEqual((await segunda).body, b'{"id":1}')
+        self.assertIs(sessoes[0].bind, self.primario.return_value)
+
+    @patch('repositories.receita_repository.listar_receitas_json')
+    async def test_listar_receitas_usa_cache_da_versao_atual(self, mock_listar_json):
+        self.mock_settings.return_value.receitas_read_mode = 'json'
+        mock_listar_json.return_value = b'[]'
+
+        await receita_service.listar_receitas()
+        await receita_service.listar_receitas()
+        mock_listar_json.assert_called_once()
+
+        receita_repository.incrementar_versao_catalogo()
+        await receita_service.listar_receitas()
+        self.assertEqual(mock_listar_json.call_count, 2)
+
+    @patch('repositories.receita_repository.segundos_desde_a_ultima_escrita', return_value=60)
+    @patch('repositories.receita_repository.listar_receitas_json')
+    async def test_paginas_sao_carregadas_da_replica_fora_da_janela_de_escrita(self, mock_listar_json, mock_segundos):
+        self.mock_settings.return_value.receitas_read_mode = 'json'
+        mock_listar_json.return_value = b'[]'
+        replica = Mock()
+        self.replicas.return_value = [replica]
+
+        await receita_service.listar_receitas()
+        self.assertIs(mock_listar_json.call_args.args[0].bind, replica.connect.return_value)
+
+        receita_repository.incrementar_versao_catalogo()
+        await receita_service.listar_receitas(fixado_no_primario=lambda: True)
+        self.assertIs(mock_listar_json.call_args.args[0].bind, self.primario.return_value)
+
+        # Logo depois de uma escrita a réplica pode estar atrasada: a página que vai para o cache sai do primário
+        mock_segundos.return_value = 1
+        receita_repository.incrementar_versao_catalogo()
+        await receita_service.listar_receitas()
+        self.assertIs(mock_listar_json.call_args.args[0].bind, self.primario.return_value)
+
+    @patch('repositories.receita_repository.segundos_desde_a_ultima_escrita', return_value=60)
+    @patch('repositories.receita_repository.buscar_receita_por_id_json', return_value=b'{"id":1}')
+    async def test_projecao_usa_sessao_da_replica_com_fallback(self, mock_buscar_json, mock_segundos):
+        from orm.base import ReplicaSession
+
+        self.mock_settings.return_value.receitas_read_mode = 'json'
+        replica = Mock()
+        self.replicas.return_value = [replica]
+
+        await receita_service.buscar_receita_por_id(1, ('id', 'nome'))
+
+        session = mock_buscar_json.call_args.args[0]
+        self.assertIsInstance(session, ReplicaSession)
+        self.assertIs(session.bind, replica.connect.return_value)
+
+    @patch('repositories.receita_repository.listar_receitas_json')
+    async def test_listar_receitas_comprimido(self, mock_listar_json):
+        self.mock_settings.return_value.receitas_read_mode = 'json'
+        self.mock_settings.return_value.receitas_page_cache_gzip = True
+        mock_listar_json.return_value = b'[' + b'{"nome":"Bolo"},' * 200 + b'{}]'
+
+        response = await receita_service.listar_receitas(aceita_gzip=True)
+
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.body), mock_listar_json.return_value)
+        self.assertNotIn('content-encoding', (await receita_service.listar_receitas()).headers)
+
+    async def test_campos_da_consulta(self):
+        self.assertIsNone(receita_service.campos_da_consulta(None))
+        self.assertEqual(receita_service.campos_da_consulta('summary'), ('id', 'nome', 'tipo', 'criador', 'imagem'))
+        self.assertEqual(receita_service.campos_da_consulta('imagem, nome'), ('id', 'nome', 'imagem'))
+        self.assertIsNone(receita_service.campos_da_consulta(','.join(reversed(models.CAMPOS_RECEITA))))
+        with self.assertRaises(receita_service.CampoInvalidoError):
+            receita_service.campos_da_consulta('nome,senha')
+
+    @patch('repositories.receita_repository.listar_receitas')
+    async def test_listar_receitas_projecao_modo_rows(self, mock_listar):
+        self.mock_settings.return_value.receitas_read_mode = 'rows'
+        mock_listar.return_value = [models.Receita.model_construct(id=1, nome='Bolo')]
+
+        response = await receita_service.listar_receitas(campos=('id', 'nome'))
+
+        self.assertEqual(response.body, b'[{"id":1,"nome":"Bolo"}]')
+        self.assertEqual(mock_listar.call_args.args[1], ('id', 'nome'))
+
+    async def test_modo_invalido(self):
+        self.mock_settings.return_value.receitas_read_mode = 'orm'
+
+        with self.assertRaises(ValueError):
+            await receita_service.listar_receitas()
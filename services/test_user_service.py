@@ -3,6 +3,7 @@ from unittest import TestCase
 from unittest.mock import Mock, patch
 
 import jwt
+from sqlalchemy.exc import IntegrityError
 
 import services
 from services.user_service import _hash_password, _verify_password, _generate_token, sign_in, CredentialsNotMatchError, \
@@ -10,6 +11,11 @@ from services.user_service import _hash_password, _verify_password, _generate_to
 
 
 class TestUserService(TestCase):
+    def setUp(self):
+        patcher = patch('services.user_service.get_cache')
+        self.mock_cache = patcher.start().return_value
+        self.mock_cache.get.return_value = None
+        self.addCleanup(patcher.stop)
 
     @patch('backports.pbkdf2.pbkdf2_hmac')
     @patch('settings.settings')
@@ -273,6 +279,26 @@ class TestUserService(TestCase):
         mock_get_user_by_id.assert_called_once()
         mock_jwt_decode.assert_called_once()
 
+    @patch('repositories.user_repository.get_user_by_id')
+    @patch('settings.settings')
+    def test_buscar_usuario_usa_cache_sem_a_senha(self, mock_settings, mock_get_user_by_id):
+        from cache import Cache, MemoryBackend
+        from models import User
+
+        services.user_service.get_cache.return_value = Cache(MemoryBackend())
+        mock_settings.return_value.cache_auth_ttl_seconds = 30
+        mock_get_user_by_id.return_value = User(id=1, name='test', username='test', email='test@test.com',
+                                                hashed_password='hash', created_at=0, is_active=True)
+
+        primeiro = services.user_service._buscar_usuario(Mock(), 1)
+        segundo = services.user_service._buscar_usuario(Mock(), 1)
+
+        self.assertEqual(primeiro.hashed_password, 'hash')
+        self.assertEqual(segundo.hashed_password, '')
+        self.assertEqual(segundo.model_dump(exclude={'hashed_password'}),
+                         primeiro.model_dump(exclude={'hashed_password'}))
+        mock_get_user_by_id.assert_called_once()
+
     @patch('services.user_service._validate_token')
     def test_me(self, mock_validate_token):
         mock_session = Mock()
@@ -314,35 +340,20 @@ class TestUserService(TestCase):
             services.me('mock_token')
         mock_validate_token.assert_called_once_with('mock_token', None)
 
+    @patch('services.user_service._hash_password')
+    @patch('repositories.user_repository.create_user')
     @patch('repositories.user_repository.get_user_by_email_or_username')
-    def test_create_user_should_raise_if_user_email_already_exists(self, mock_get_user_by_email_or_username):
-        mock_get_user_by_email_or_username.return_value = Mock()
-        mock_session = Mock()
-        mock_user = Mock()
-        mock_user.email = 'test@test.com'
-        with self.assertRaises(services.user_service.UserAlreadyExistsError):
-            services.create_user(mock_user, session=mock_session)
-
-        mock_get_user_by_email_or_username.assert_called_once_with(mock_session, mock_user.email)
-
-    @patch('repositories.user_repository.get_user_by_email_or_username')
-    def test_create_user_should_raise_if_user_username_already_exists(self, mock_get_user_by_email_or_username):
-        def side_effect(session, email_or_username):
-            if email_or_username == 'test@test.com':
-                return None
-            return Mock()
-
-        mock_get_user_by_email_or_username.side_effect = side_effect
+    def test_create_user_should_raise_if_user_already_exists(self, mock_get_user_by_email_or_username,
+                                                             mock_create_user, mock_hash_password):
+        mock_hash_password.return_value = 'hashed_password'
+        mock_create_user.side_effect = IntegrityError('INSERT INTO users', {}, Exception('UNIQUE constraint failed'))
         mock_session = Mock()
         mock_user = Mock()
-        mock_user.email = 'test@test.com'
-        mock_user.username = 'test'
         with self.assertRaises(services.user_service.UserAlreadyExistsError):
             services.create_user(mock_user, session=mock_session)
 
-        self.assertEqual(mock_get_user_by_email_or_username.call_count, 2)
-        self.assertEqual(mock_get_user_by_email_or_username.call_args_list[0][0][1], mock_user.email)
-        self.assertEqual(mock_get_user_by_email_or_username.call_args_list[1][0][1], mock_user.username)
+        mock_get_user_by_email_or_username.assert_not_called()
+        mock_create_user.assert_called_once_with(mock_session, mock_user)
 
     @patch('services.user_service._hash_password')
     @patch('repositories.user_repository.create_user')
@@ -1,25 +1,43 @@
 import binascii
+import os
+from typing import List
 
 from pydantic import BaseModel
 
+from cache import get_cache
 from models import CreateUserResponse
 from models.user import User, CreateUserRequest
+from observability.metrics import Histogram, timed
 from repositories import user_repository
 
+PASSWORD_HASH_SECONDS = Histogram('password_hash_duration_seconds', 'Duração do hash de senhas (PBKDF2)')
+
 
 def _hash_password(password: str) -> str:
     from backports.pbkdf2 import pbkdf2_hmac
     from settings import settings
-    key = pbkdf2_hmac(
-        "sha256",
-        password.encode('utf-8'),
-        settings().pdkdf2_salt_bytes(),
-        settings().pdkdf2_rounds,
-    )
+    with timed(PASSWORD_HASH_SECONDS):
+        key = pbkdf2_hmac(
+            "sha256",
+            password.encode('utf-8'),
+            settings().pdkdf2_salt_bytes(),
+            settings().pdkdf2_rounds,
+        )
 
     return binascii.hexlify(key).decode('utf-8')
 
 
+def hash_passwords(passwords: List[str], workers: int = None) -> List[str]:
+    # PBKDF2 é CPU-bound: processos usam todos os núcleos, threads ficariam presas ao GIL
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    if workers <= 1:
+        return [_hash_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
 def _verify_password(plain_password: str, hashed_password: str) -> bool:
     return _hash_password(plain_password) == hashed_password
 
@@ -43,6 +61,21 @@ def _generate_token(user: User) -> str:
     )
 
 
+def _buscar_usuario(session, user_id: int) -> User or None:
+    from settings import settings
+
+    cache = get_cache()
+    user = cache.get(user_repository.user_cache_key(user_id), model=User)
+    if user is not None:
+        return user
+
+    user = user_repository.get_user_by_id(session, user_id)
+    if user is not None:
+        cache.set(user_repository.user_cache_key(user_id), user.model_copy(update={'hashed_password': ''}),
+                  ttl=settings().cache_auth_ttl_seconds)
+    return user
+
+
 def _validate_token(token: str, session=None) -> 'User':
     import jwt
     from settings import settings
@@ -55,7 +88,7 @@ def _validate_token(token: str, session=None) -> 'User':
             audience=settings().jwt_audience,
             issuer=settings().jwt_issuer,
         )
-        user = user_repository.get_user_by_id(session, payload['id'])
+        user = _buscar_usuario(session, payload['id'])
         if not user:
             raise InvalidTokenError()
         return user
@@ -97,16 +130,14 @@ def me(token: str, session=None) -> 'MeResponse':
 
 
 def create_user(request: CreateUserRequest, session=None) -> 'CreateUserResponse':
-    user = user_repository.get_user_by_email_or_username(session, request.email)
-    if user:
-        raise UserAlreadyExistsError()
-
-    user = user_repository.get_user_by_email_or_username(session, request.username)
-    if user:
-        raise UserAlreadyExistsError()
+    from sqlalchemy.exc import IntegrityError
 
+    # Os índices únicos decidem a duplicidade: sem consultas prévias e sem corrida entre a checagem e o insert
     request.password = _hash_password(request.password)
-    user = user_repository.create_user(session, request)
+    try:
+        user = user_repository.create_user(session, request)
+    except IntegrityError:
+        raise UserAlreadyExistsError()
     return CreateUserResponse.from_dto(user)
 
 
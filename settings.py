@@ -1,17 +1,58 @@
 import binascii
 
+from typing import List
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     database_url: str
+    database_echo: bool = False
+    database_replica_urls: List[str] = []
+    database_replica_retry_seconds: float = 30.0
+    database_replica_pin_seconds: float = 5.0
+    database_replica_health_interval_seconds: float = 5.0
+    slow_query_ms: float = 200.0
+    receitas_read_mode: str = 'rows'
+    receitas_page_cache_size: int = 64
+    receitas_page_cache_gzip: bool = False
+    cache_backend: str = 'memory'
+    cache_prefix: str = 'panela-magica:'
+    cache_ttl_seconds: float = 3600.0
+    cache_auth_ttl_seconds: float = 30.0
+    cache_max_entries: int = 1024
+    cache_shm_path: str = '/dev/shm/panela-magica.cache'
+    cache_shm_slots: int = 128
+    cache_shm_slot_bytes: int = 1048576
+    cache_url: str = 'redis://localhost:6379/0'
+    cache_timeout: float = 0.05
+    cache_pool_size: int = 8
+    cache_invalidation_enabled: bool = True
+    cache_invalidation_poll_interval: float = 0.5
+    cache_invalidation_retention_seconds: int = 3600
+    idempotency_ttl_seconds: float = 86400.0
+    idempotency_pending_ttl_seconds: float = 60.0
+    admission_enabled: bool = True
+    admission_read_limit: int = 8
+    admission_read_queue: int = 64
+    admission_write_limit: int = 4
+    admission_write_queue: int = 16
+    admission_sign_in_limit: int = 2
+    admission_sign_in_queue: int = 16
+    admission_upload_limit: int = 1
+    admission_upload_queue: int = 4
+    admission_queue_timeout_seconds: float = 2.0
+    admission_retry_after_seconds: float = 1.0
+    content_max_body_bytes: int = 1048576
     api_url: str
-    s3_access_key: str
-    s3_secret_key: str
-    s3_bucket: str
-    s3_region: str
-    s3_endpoint: str
-    s3_cdn_url: str
+    storage_backend: str = 's3'
+    storage_path: str = 'storage'
+    s3_access_key: str = ''
+    s3_secret_key: str = ''
+    s3_bucket: str = ''
+    s3_region: str = ''
+    s3_endpoint: str = ''
+    s3_cdn_url: str = ''
     pdkdf2_salt: str = 'aaef2d3f4d77ac66e9c5a6c3d8f921d1'
     pdkdf2_rounds: int = 50000
     jwt_secret: str = 'jwt_secret'
@@ -19,6 +60,29 @@ class Settings(BaseSettings):
     jwt_issuer: str = 'panela-magica'
     jwt_audience: str = 'urn:panela-magica-api'
     jwt_algorithm: str = 'HS256'
+    profiling_token: str = ''
+    profiling_dir: str = 'profiles'
+    profiling_max_profiles: int = 50
+    server_host: str = '0.0.0.0'
+    server_port: int = 8000
+    server_workers: int = 0
+    server_loop: str = 'uvloop'
+    server_http: str = 'httptools'
+    server_backlog: int = 2048
+    server_keep_alive: int = 5
+    server_max_requests: int = 0
+    server_max_requests_jitter: int = 0
+    server_graceful_timeout: int = 30
+    server_restart_backoff_seconds: float = 0.5
+    server_restart_backoff_max_seconds: float = 30.0
+    server_forwarded_allow_ips: str = '127.0.0.1'
+    server_access_log: bool = True
+    job_worker_enabled: bool = True
+    job_poll_interval: float = 1.0
+    job_stale_seconds: int = 300
+    job_backoff_seconds: float = 2.0
+    job_backoff_max_seconds: float = 300.0
+    job_retention_seconds: int = 604800
 
     def pdkdf2_salt_bytes(self) -> bytes:
         return binascii.unhexlify(self.pdkdf2_salt)
@@ -0,0 +1,117 @@
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+import create_user
+import orm
+from services import user_service
+
+CSV = '''name,username,email,password
+Ana Silva,anasilva,ana@panela.test,senha-segura
+Bruno Lima,bruno,bruno@panela.test,curta
+Carla Souza,carlasouza,carla@panela.test,senha-segura
+Carla Outra,carlasouza,outra@panela.test,senha-segura
+'''
+
+
+class TestCreateUser(TestCase):
+    def setUp(self):
+        patcher = patch('models.user.email_validator.validate_email')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('settings.settings')
+        mock_settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_settings.return_value.pdkdf2_salt_bytes.return_value = b'salt'
+        mock_settings.return_value.pdkdf2_rounds = 1000
+
+        self.engine = create_engine('sqlite://')
+        orm.create_schema(self.engine)
+        self.session = Session(self.engine)
+        self.addCleanup(self.session.close)
+
+    def _usernames(self):
+        return self.session.execute(select(orm.User.username).order_by(orm.User.id)).scalars().all()
+
+    def test_validate_csv(self):
+        valid, rejected = create_user.validate(create_user.read_rows(io.StringIO(CSV), 'csv'))
+
+        self.assertEqual([(line, request.username) for line, request in valid], [(2, 'anasilva'), (4, 'carlasouza')])
+        self.assertEqual([line for line, _ in rejected], [3, 5])
+        self.assertIn('password', rejected[0].reason)
+        self.assertEqual(rejected[1].reason, 'duplicated in file')
+
+    def test_validate_ndjson(self):
+        ndjson = '\n'.join([
+            json.dumps({'name': 'Ana', 'username': 'anasilva', 'email': 'ana@panela.test', 'password': 'senha-segura'}),
+            '',
+            '{quebrado',
+            '[1, 2]',
+        ])
+
+        valid, rejected = create_user.validate(create_user.read_rows(io.StringIO(ndjson), 'ndjson'))
+
+        self.assertEqual(len(valid), 1)
+        self.assertEqual(rejected, [create_user.Rejected(3, 'not a JSON object'),
+                                    create_user.Rejected(4, 'not a JSON object')])
+
+    def test_provision_em_lotes_e_conflitos(self):
+        self.session.add(orm.User(name='Ana', username='anasilva', email='outro@panela.test', hashed_password='x',
+                                  is_active=True))
+        self.session.commit()
+        rows = [(i + 2, {'name': 'Pessoa {}'.format(i), 'username': 'pessoa{}'.format(i),
+                         'email': 'pessoa{}@panela.test'.format(i), 'password': 'senha-segura'}) for i in range(5)]
+        rows.append((7, {'name': 'Ana', 'username': 'anasouza', 'email': 'Outro@Panela.test', 'password': 'senha-segura'}))
+        valid, _ = create_user.validate(rows)
+
+        with patch.object(self.session, 'commit', wraps=self.session.commit) as commit:
+            created, rejected = create_user.provision(self.session, valid, batch_size=2, workers=1)
+
+        self.assertEqual(created, 5)
+        self.assertEqual(commit.call_count, 3)
+        self.assertEqual(rejected, [create_user.Rejected(7, 'user already exists')])
+        self.assertEqual(self._usernames(), ['anasilva'] + ['pessoa{}'.format(i) for i in range(5)])
+        hashed = self.session.execute(select(orm.User.hashed_password).filter(orm.User.username == 'pessoa0')).scalar()
+        self.assertEqual(hashed, user_service._hash_password('senha-segura'))
+
+    def test_provision_conflito_concorrente_rejeita_so_a_linha(self):
+        rows = [(i + 2, {'name': 'Pessoa {}'.format(i), 'username': 'pessoa{}'.format(i),
+                         'email': 'pessoa{}@panela.test'.format(i), 'password': 'senha-segura'}) for i in range(3)]
+        valid, _ = create_user.validate(rows)
+        # Criado por outro processo depois da checagem de conflitos
+        self.session.add(orm.User(name='Outra', username='PESSOA1', email='outra@panela.test', hashed_password='x',
+                                  is_active=True))
+        self.session.commit()
+
+        with patch('repositories.user_repository.find_conflicts', return_value=(set(), set())):
+            created, rejected = create_user.provision(self.session, valid, batch_size=3, workers=1)
+
+        self.assertEqual(created, 2)
+        self.assertEqual(rejected, [create_user.Rejected(3, 'user already exists (created concurrently)')])
+        self.assertEqual(self._usernames(), ['PESSOA1', 'pessoa0', 'pessoa2'])
+
+    def test_hash_passwords_em_processos(self):
+        passwords = ['senha-{}'.format(i) for i in range(6)]
+
+        self.assertEqual(user_service.hash_passwords(passwords, workers=2),
+                         [user_service._hash_password(password) for password in passwords])
+
+    def test_main_com_arquivo(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'equipe.csv')
+            with open(path, 'w') as f:
+                f.write(CSV)
+
+            with patch('create_user.get_db', return_value=iter([self.session])), \
+                    patch('sys.stderr', new_callable=io.StringIO) as stderr, patch('sys.stdout', new_callable=io.StringIO):
+                self.assertEqual(create_user.main([path, '--workers', '1']), 1)
+
+        self.assertEqual(self._usernames(), ['anasilva', 'carlasouza'])
+        self.assertIn('line 3: password', stderr.getvalue())
@@ -0,0 +1,106 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import migrate_user_indexes
+import orm
+from repositories import user_repository
+
+
+class TestMigrateUserIndexes(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.url = 'sqlite:///{}'.format(os.path.join(self.tmp.name, 'panela.sqlite'))
+        self.engine = create_engine(self.url)
+        orm.create_schema(self.engine)
+        # Simula um banco anterior aos índices em lower(), onde as duplicatas ainda podem existir
+        with self.engine.begin() as connection:
+            for index_name in user_repository.CASE_INSENSITIVE_INDEXES.values():
+                connection.execute(text('DROP INDEX {}'.format(index_name)))
+
+        patcher = patch('repositories.user_repository.get_cache')
+        self.mock_get_cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with Session(self.engine) as session:
+            for username, email in (('Cozinheiro', 'cozinheiro@panela.test'), ('cozinheiro', 'Cozinheiro@Panela.test'),
+                                    ('confeiteira', 'confeiteira@panela.test')):
+                session.add(orm.User(name=username, username=username, email=email, hashed_password='x',
+                                     is_active=True))
+            session.commit()
+
+    def _main(self, *args):
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout, \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            code = migrate_user_indexes.main(['--database-url', self.url] + list(args))
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def _users(self):
+        with Session(self.engine) as session:
+            return session.execute(select(orm.User.id, orm.User.username, orm.User.email).order_by(orm.User.id)).all()
+
+    def test_login_antes_da_migracao_prefere_grafia_exata(self):
+        with Session(self.engine) as session:
+            self.assertEqual(user_repository.get_user_by_email_or_username(session, 'cozinheiro').id, 2)
+            self.assertEqual(user_repository.get_user_by_email_or_username(session, 'COZINHEIRO').id, 1)
+
+    def test_duplicatas_interrompem_a_migracao(self):
+        code, stdout, stderr = self._main()
+
+        self.assertEqual(code, 1)
+        self.assertIn('username duplicado: #1 Cozinheiro, #2 cozinheiro', stdout)
+        self.assertIn('email duplicado: #1 cozinheiro@panela.test, #2 Cozinheiro@Panela.test', stdout)
+        self.assertIn('2 grupo(s)', stderr)
+        self.assertEqual(self._users()[1], (2, 'cozinheiro', 'Cozinheiro@Panela.test'))
+
+    def test_renomeia_duplicatas_e_cria_indices(self):
+        code, stdout, _ = self._main('--rename-duplicates')
+
+        self.assertEqual(code, 0, stdout)
+        self.assertEqual(self._users(), [(1, 'Cozinheiro', 'cozinheiro@panela.test'),
+                                         (2, 'cozinheiro-2', 'Cozinheiro+2@Panela.test'),
+                                         (3, 'confeiteira', 'confeiteira@panela.test')])
+        with Session(self.engine) as session:
+            session.add(orm.User(name='Outra', username='CONFEITEIRA', email='outra@panela.test', hashed_password='x',
+                                 is_active=False))
+            with self.assertRaises(IntegrityError):
+                session.commit()
+
+        self.assertEqual(self._main()[0], 0)
+
+    def test_boot_com_duplicatas_registra_erro_sem_criar_indices(self):
+        with self.assertLogs('orm.base', level='ERROR') as logs:
+            orm.create_schema(self.engine)
+
+        self.assertIn('migrate_user_indexes.py --rename-duplicates', logs.output[0])
+        with Session(self.engine) as session:
+            session.add(orm.User(name='Outra', username='CONFEITEIRA', email='outra@panela.test', hashed_password='x',
+                                 is_active=False))
+            session.commit()
+
+    def test_boot_cria_indices_quando_nao_ha_duplicatas(self):
+        user_repository.rename_case_duplicates(Session(self.engine))
+
+        orm.create_schema(self.engine)
+
+        with Session(self.engine) as session:
+            session.add(orm.User(name='Outra', username='CONFEITEIRA', email='outra@panela.test', hashed_password='x',
+                                 is_active=False))
+            with self.assertRaises(IntegrityError):
+                session.commit()
+
+    def test_renomear_invalida_os_usuarios_depois_do_commit(self):
+        with Session(self.engine) as session:
+            user_repository.rename_case_duplicates(session)
+
+        self.mock_get_cache.return_value.delete.assert_called_once_with(user_repository.user_cache_key(2))
+        with Session(self.engine) as session:
+            eventos = session.execute(select(orm.Invalidation.entity, orm.Invalidation.entity_id)).all()
+        self.assertEqual(eventos, [('user', 2)])
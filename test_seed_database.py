@@ -0,0 +1,63 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+import orm
+import seed_database
+
+
+class TestSeedDatabase(TestCase):
+    def test_gerar_receitas_e_deterministico(self):
+        config = seed_database.SeedConfig(users=10, receitas=20, seed=7)
+
+        primeira = list(seed_database.gerar_receitas(config, 1, list(range(1, 11))))
+        segunda = list(seed_database.gerar_receitas(config, 1, list(range(1, 11))))
+        outra_seed = list(seed_database.gerar_receitas(seed_database.SeedConfig(users=10, receitas=20, seed=8), 1,
+                                                       list(range(1, 11))))
+
+        self.assertEqual(primeira, segunda)
+        self.assertNotEqual(primeira, outra_seed)
+
+    def test_respeita_limites_de_ingredientes(self):
+        config = seed_database.SeedConfig(receitas=200, ingredientes_min=2, ingredientes_media=5, ingredientes_max=6)
+
+        for _, ingredientes in seed_database.gerar_receitas(config, 1, [1]):
+            self.assertGreaterEqual(len(ingredientes), 2)
+            self.assertLessEqual(len(ingredientes), 6)
+
+    def test_seed(self):
+        engine = create_engine('sqlite://')
+        config = seed_database.SeedConfig(users=5, receitas=30, batch_size=7)
+
+        totals = seed_database.seed(engine, config, hashed_password='hash')
+        seed_database.seed(engine, config, hashed_password='hash')
+
+        with Session(engine) as session:
+            self.assertEqual(session.execute(select(func.count(orm.User.id))).scalar(), 10)
+            self.assertEqual(session.execute(select(func.count(orm.Receita.id))).scalar(), 60)
+            self.assertEqual(session.execute(select(func.count(orm.Ingrediente.id))).scalar(),
+                             totals['ingredientes'] * 2)
+            self.assertEqual(set(session.execute(select(orm.User.hashed_password)).scalars()), {'hash'})
+            self.assertEqual(session.execute(select(func.count(orm.ReceitaDocumento.receita_id))).scalar(), 60)
+
+    def test_sincroniza_sequencias_no_postgres(self):
+        session = Mock()
+        session.get_bind.return_value.dialect.name = 'postgresql'
+
+        seed_database._sincronizar_sequencias(session)
+
+        comandos = [str(c.args[0]) for c in session.execute.call_args_list]
+        self.assertEqual(len(comandos), 2)
+        self.assertIn("pg_get_serial_sequence('users', 'id')", comandos[0])
+        self.assertIn("pg_get_serial_sequence('receitas', 'id')", comandos[1])
+        session.commit.assert_called_once()
+
+    def test_nao_sincroniza_sequencias_fora_do_postgres(self):
+        session = Mock()
+        session.get_bind.return_value.dialect.name = 'sqlite'
+
+        seed_database._sincronizar_sequencias(session)
+
+        session.execute.assert_not_called()
@@ -0,0 +1,100 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import serve
+
+
+def _settings(**overrides):
+    config = Mock()
+    config.server_host = '0.0.0.0'
+    config.server_port = 8000
+    config.server_workers = 0
+    config.server_loop = 'uvloop'
+    config.server_http = 'httptools'
+    config.server_backlog = 4096
+    config.server_keep_alive = 10
+    config.server_max_requests = 0
+    config.server_max_requests_jitter = 0
+    config.server_graceful_timeout = 30
+    config.server_restart_backoff_seconds = 0.5
+    config.server_restart_backoff_max_seconds = 30
+    config.server_forwarded_allow_ips = '127.0.0.1'
+    config.server_access_log = False
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+class TestServe(TestCase):
+    @patch('os.cpu_count', return_value=8)
+    def test_worker_count_padrao_usa_todos_os_nucleos(self, mock_cpu_count):
+        self.assertEqual(serve.worker_count(_settings()), 8)
+        self.assertEqual(serve.worker_count(_settings(server_workers=3)), 3)
+
+    def test_uvicorn_config(self):
+        config = serve.uvicorn_config(_settings())
+
+        self.assertEqual(config.app, 'main:app')
+        self.assertEqual(config.loop, 'uvloop')
+        self.assertEqual(config.http, 'httptools')
+        self.assertEqual(config.backlog, 4096)
+        self.assertEqual(config.timeout_keep_alive, 10)
+        self.assertEqual(config.timeout_graceful_shutdown, 30)
+        self.assertIsNone(config.limit_max_requests)
+
+    def test_uvicorn_config_max_requests_com_jitter(self):
+        limits = {
+            serve.uvicorn_config(_settings(server_max_requests=1000, server_max_requests_jitter=50)).limit_max_requests
+            for _ in range(50)
+        }
+
+        self.assertTrue(all(1000 <= limit <= 1050 for limit in limits))
+        self.assertGreater(len(limits), 1)
+
+    def test_restart_delay_exponencial_com_teto(self):
+        config = _settings()
+
+        self.assertEqual([serve.restart_delay(falhas, config) for falhas in range(0, 9)],
+                         [0, 0.5, 1, 2, 4, 8, 16, 30, 30])
+
+
+def _process(alive=True, exitcode=None):
+    return Mock(is_alive=Mock(return_value=alive), exitcode=exitcode, pid=1)
+
+
+class TestSupervisor(TestCase):
+    def setUp(self):
+        self.supervisor = serve.Supervisor(_settings(server_workers=1))
+        self.novos = []
+        self.supervisor._spawn = lambda sockets: self.novos.append(_process()) or self.novos[-1]
+        self.supervisor.processes = [_process(alive=False, exitcode=1)]
+        self.supervisor._started = [0]
+        self.supervisor._failures = [0]
+        self.supervisor._restart_at = [0]
+
+    def test_worker_que_cai_ao_subir_espera_cada_vez_mais(self):
+        agora = 1.0
+        esperas = []
+        for _ in range(3):
+            self.supervisor.check_workers([], agora)
+            esperas.append(self.supervisor._restart_at[0] - agora)
+            agora = self.supervisor._restart_at[0]
+            self.supervisor.check_workers([], agora)
+            self.supervisor.processes[0].is_alive.return_value = False
+            self.supervisor.processes[0].exitcode = 1
+
+        self.assertEqual(esperas, [0.5, 1, 2])
+        self.assertEqual(len(self.novos), 3)
+
+    def test_reciclagem_ou_worker_estavel_reinicia_na_hora(self):
+        self.supervisor._failures = [4]
+        self.supervisor.processes = [_process(alive=False, exitcode=0)]
+
+        self.supervisor.check_workers([], 5.0)
+        self.assertEqual(len(self.novos), 1)
+
+        self.supervisor._failures = [4]
+        self.supervisor.processes = [_process(alive=False, exitcode=1)]
+        self.supervisor.check_workers([], 100.0)
+        self.assertEqual(len(self.novos), 2)
+        self.assertEqual(self.supervisor._failures, [0])